@@ -0,0 +1,172 @@
+# encoding: utf-8
+
+"""
+Headless benchmarks of inventory scanning, version parsing and resolution
+
+Generates synthetic `__pypackages__` trees of the given sizes, imports the
+plugin with stubbed `sublime` modules and times each operation. Results
+are written as JSON, so runs can be compared to track regressions:
+
+    python benchmarks/run.py --sizes 100,1000,10000 --output results.json
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+
+sys.path.insert(0, BENCHMARKS)
+
+import stubs
+import synthetic
+
+
+def measure(function, repeat, setup=None):
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+
+    times.sort()
+    return {
+        "best": times[0],
+        "median": times[len(times) // 2],
+        "mean": sum(times) / len(times),
+        "repeat": repeat,
+    }
+
+def load_plugin(project):
+    """
+    Import the plugin as a package with stubbed `sublime` modules
+    """
+    window = stubs.install(project)
+    sys.path.insert(0, os.path.dirname(ROOT))
+    plugin = importlib.import_module(os.path.basename(ROOT) + ".pypackages")
+    lib = sys.modules[os.path.basename(ROOT) + ".lib"]
+    return plugin, lib, window
+
+def operations(plugin, lib, window, lib_path, dists):
+    """
+    Return `(name, function, setup)` of every benchmarked operation
+    """
+    pkg_resources = lib.metadata.load_pkg_resources()
+    inventory = lib.inventory
+    python = plugin.python_version()
+    versions = [version for _, version in dists]
+    names = [name for name, _ in dists]
+    freeze = plugin.PypackagesFreezeCommand(window)
+    freeze_file = os.path.join(window.project, "requirements.txt")
+
+    def clear_caches():
+        pkg_resources.clear_caches()
+        lib.metadata.clear_caches()
+
+    def cold():
+        clear_caches()
+        with inventory._lock:
+            inventory._inventories.clear()
+        try:
+            os.remove(inventory.Inventory(lib_path).index_path)
+        except OSError:
+            pass
+
+    def indexed():
+        clear_caches()
+        with inventory._lock:
+            inventory._inventories.clear()
+
+    def warm():
+        inventory.get(lib_path, python).refresh()
+
+    def check():
+        graph = lib.depgraph.DependencyGraph(lib_path, plugin.python_interpreter().markers)
+        graph.update(inventory.get(lib_path, python).refresh()).check()
+
+    def resolve():
+        working_set = pkg_resources.WorkingSet([lib_path])
+        working_set.resolve(pkg_resources.parse_requirements(names[:len(names) // 10 or 1]))
+
+    return [
+        ("scan_cold", warm, cold),
+        ("scan_indexed", warm, indexed),
+        ("scan_warm", warm, None),
+        ("list", lambda: plugin.pkg_list(lib_path), warm),
+        ("environment_scan", lambda: pkg_resources.Environment([lib_path]), clear_caches),
+        ("find_on_path", lambda: list(pkg_resources.find_distributions(lib_path)), clear_caches),
+        ("parse_version", lambda: [lib.metadata.parse_version(v) for v in versions], clear_caches),
+        ("sort", lambda: sorted(versions, key=lib.metadata.parse_version), clear_caches),
+        ("freeze", lambda: freeze._freeze_thread(freeze_file), warm),
+        ("resolve", resolve, clear_caches),
+        ("check", check, clear_caches),
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--sizes", default="100,1000,10000",
+                        help="comma separated numbers of distributions")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--egg-ratio", type=float, default=0.2,
+                        help="share of .egg-info distributions")
+    parser.add_argument("--only", help="comma separated operations to run")
+    parser.add_argument("--output", help="write the results to this file")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="pypackages-benchmark-")
+    project = os.path.join(root, "project")
+    os.makedirs(project)
+    plugin, lib, window = load_plugin(project)
+    python = plugin.python_version()
+    only = set(args.only.split(",")) if args.only else None
+
+    results = []
+    try:
+        for size in [int(size) for size in args.sizes.split(",")]:
+            pypackages = os.path.join(project, "__pypackages__")
+            shutil.rmtree(pypackages, ignore_errors=True)
+            lib_path = os.path.join(pypackages, python, "lib")
+
+            started = time.perf_counter()
+            dists = synthetic.generate(lib_path, size, python, args.egg_ratio)
+            sys.stderr.write("Generated {} distributions in {:.1f} s\n".format(
+                size, time.perf_counter() - started
+            ))
+
+            for name, function, setup in operations(plugin, lib, window, lib_path, dists):
+                if only and name not in only:
+                    continue
+                result = measure(function, args.repeat, setup)
+                result.update(operation=name, size=size)
+                results.append(result)
+                sys.stderr.write("{:>6} {:<18} {:>10.2f} ms\n".format(
+                    size, name, result["best"] * 1000
+                ))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    report = json.dumps({
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "egg_ratio": args.egg_ratio,
+        "results": results,
+    }, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# encoding: utf-8
+
+"""
+Minimal `sublime` and `sublime_plugin` modules
+
+They provide just enough of the API for the plugin to be imported and its
+module-level functions and commands to run headless.
+"""
+
+import os
+import sys
+import tempfile
+import types
+
+
+class Settings(dict):
+
+    def add_on_change(self, key, callback):
+        pass
+
+    def clear_on_change(self, key):
+        pass
+
+    def set(self, key, value):
+        self[key] = value
+
+
+class View(object):
+
+    def __init__(self):
+        self._settings = Settings()
+        self.status = {}
+
+    def id(self):
+        return id(self)
+
+    def settings(self):
+        return self._settings
+
+    def set_status(self, key, value):
+        self.status[key] = value
+
+    def erase_status(self, key):
+        self.status.pop(key, None)
+
+    def window(self):
+        return None
+
+    def run_command(self, command, args=None):
+        pass
+
+    def __getattr__(self, name):
+        # set_name, set_scratch, assign_syntax, ...
+        return lambda *args, **kwds: None
+
+
+class Window(object):
+
+    def __init__(self, project):
+        self.project = project
+        self.view = View()
+
+    def id(self):
+        return id(self)
+
+    def active_view(self):
+        return self.view
+
+    def views(self):
+        return [self.view]
+
+    def extract_variables(self):
+        return {"project_path": self.project}
+
+    def project_file_name(self):
+        return os.path.join(self.project, "benchmark.sublime-project")
+
+    def create_output_panel(self, name):
+        return View()
+
+    def new_file(self):
+        return View()
+
+    def __getattr__(self, name):
+        # run_command, show_quick_panel, show_input_panel, ...
+        return lambda *args, **kwds: None
+
+
+class WindowCommand(object):
+
+    def __init__(self, window):
+        self.window = window
+
+
+class TextCommand(object):
+
+    def __init__(self, view):
+        self.view = view
+
+
+class EventListener(object):
+    pass
+
+
+def install(project, settings=None):
+    """
+    Register the stub modules and return the active `Window`
+    """
+    window = Window(project)
+    plugin_settings = Settings({
+        "python_executable": dict.fromkeys(("linux", "osx", "windows"), sys.executable),
+        "watch_packages": False,
+        "wheel_cache": False,
+        "output_panel": False,
+    })
+    plugin_settings.update(settings or {})
+
+    sublime = types.ModuleType("sublime")
+    sublime.load_settings = lambda name: plugin_settings
+    sublime.platform = lambda: {"win32": "windows", "darwin": "osx"}.get(sys.platform, "linux")
+    sublime.status_message = lambda message: None
+    sublime.set_timeout = lambda callback, delay=0: None
+    sublime.set_timeout_async = lambda callback, delay=0: None
+    sublime.cache_path = lambda: os.path.join(tempfile.gettempdir(), "pypackages-benchmark")
+    sublime.expand_variables = lambda value, variables: value
+    sublime.active_window = lambda: window
+    sublime.windows = lambda: [window]
+    sublime.ok_cancel_dialog = lambda message, ok="": True
+    sublime.message_dialog = lambda message: None
+
+    sublime_plugin = types.ModuleType("sublime_plugin")
+    sublime_plugin.WindowCommand = WindowCommand
+    sublime_plugin.TextCommand = TextCommand
+    sublime_plugin.EventListener = EventListener
+
+    sys.modules["sublime"] = sublime
+    sys.modules["sublime_plugin"] = sublime_plugin
+    return window
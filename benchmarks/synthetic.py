@@ -0,0 +1,140 @@
+# encoding: utf-8
+
+"""
+Synthetic `__pypackages__` lib directories
+
+Every distribution gets a package directory and either a `.dist-info`
+(METADATA, WHEEL, RECORD, top_level.txt) or an `.egg-info` (PKG-INFO,
+requires.txt) entry. Requirements only point to distributions generated
+later, so the requirement graph is acyclic and every requirement is
+satisfied by the installed version.
+"""
+
+import os
+import random
+
+
+WORDS = (
+    "async", "cache", "click", "core", "crypto", "data", "http", "json", "lint",
+    "log", "math", "net", "parse", "plot", "proto", "schema", "sql", "test",
+    "text", "time", "toml", "type", "util", "web", "xml", "yaml",
+)
+
+CLASSIFIERS = (
+    "Development Status :: 5 - Production/Stable",
+    "Intended Audience :: Developers",
+    "License :: OSI Approved :: MIT License",
+    "Operating System :: OS Independent",
+    "Programming Language :: Python :: 3",
+    "Topic :: Software Development :: Libraries",
+)
+
+DESCRIPTION = (
+    "A synthetic distribution generated for benchmarking.\n\n"
+    "Usage\n=====\n\n"
+) + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 40
+
+
+def _version(rng):
+    version = "{}.{}.{}".format(rng.randint(0, 9), rng.randint(0, 30), rng.randint(0, 20))
+    suffix = rng.random()
+    if suffix < 0.05:
+        version += "rc{}".format(rng.randint(1, 3))
+    elif suffix < 0.1:
+        version += ".post{}".format(rng.randint(1, 3))
+    return version
+
+def _requirements(rng, dists, index):
+    requirements = []
+    candidates = dists[index + 1:index + 200]
+    for name, version in rng.sample(candidates, min(len(candidates), rng.randint(0, 4))):
+        specifier = rng.choice(["", ">={}".format(version), "=={}".format(version), "<99"])
+        marker = rng.choice([None, None, None, 'python_version >= "3"', 'extra == "test"'])
+        requirements.append((name, specifier, marker))
+    return requirements
+
+def _dist_info(lib_path, name, version, python, requirements):
+    path = os.path.join(lib_path, "{}-{}.dist-info".format(name, version))
+    os.mkdir(path)
+
+    headers = [
+        "Metadata-Version: 2.1",
+        "Name: {}".format(name),
+        "Version: {}".format(version),
+        "Summary: Synthetic {} distribution".format(name),
+        "Home-page: https://example.com/{}".format(name),
+        "Author: Benchmark",
+        "License: MIT",
+        "Requires-Python: >=3.3",
+    ]
+    headers += ["Classifier: {}".format(classifier) for classifier in CLASSIFIERS]
+    headers += ["Provides-Extra: test"]
+    for requirement, specifier, marker in requirements:
+        headers.append("Requires-Dist: {}{}{}".format(
+            requirement, specifier, "; " + marker if marker else ""
+        ))
+    with open(os.path.join(path, "METADATA"), "w") as stream:
+        stream.write("\n".join(headers) + "\n\n" + DESCRIPTION)
+
+    with open(os.path.join(path, "WHEEL"), "w") as stream:
+        stream.write("Wheel-Version: 1.0\nRoot-Is-Purelib: true\nTag: py3-none-any\n")
+    with open(os.path.join(path, "top_level.txt"), "w") as stream:
+        stream.write(name + "\n")
+    with open(os.path.join(path, "RECORD"), "w") as stream:
+        for filename in ("METADATA", "WHEEL", "top_level.txt", "RECORD"):
+            stream.write("{}/{},,\n".format(os.path.basename(path), filename))
+        stream.write("{}/__init__.py,,\n".format(name))
+
+def _egg_info(lib_path, name, version, python, requirements):
+    path = os.path.join(lib_path, "{}-{}-py{}.egg-info".format(name, version, python))
+    os.mkdir(path)
+
+    with open(os.path.join(path, "PKG-INFO"), "w") as stream:
+        stream.write("\n".join([
+            "Metadata-Version: 1.1",
+            "Name: {}".format(name),
+            "Version: {}".format(version),
+            "Summary: Synthetic {} distribution".format(name),
+            "License: MIT",
+        ] + ["Classifier: {}".format(classifier) for classifier in CLASSIFIERS]))
+        stream.write("\nDescription: " + DESCRIPTION.replace("\n", "\n        ") + "\n")
+
+    base = [(r, s) for r, s, marker in requirements if marker is None]
+    extra = [(r, s) for r, s, marker in requirements if marker == 'extra == "test"']
+    with open(os.path.join(path, "requires.txt"), "w") as stream:
+        for requirement, specifier in base:
+            stream.write(requirement + specifier + "\n")
+        if extra:
+            stream.write("\n[test]\n")
+            for requirement, specifier in extra:
+                stream.write(requirement + specifier + "\n")
+    with open(os.path.join(path, "top_level.txt"), "w") as stream:
+        stream.write(name + "\n")
+
+def generate(lib_path, count, python, egg_ratio=0.2, seed=0):
+    """
+    Create `count` distributions in `lib_path`, return `(name, version)`s
+
+    Args:
+        python (str): The `X.Y` version egg-info entries are tagged with
+        egg_ratio (float): Share of distributions with `.egg-info` metadata
+        seed (int): Seed of the random generator, trees are reproducible
+    """
+    rng = random.Random(seed)
+    os.makedirs(lib_path)
+
+    dists = [
+        ("{}-{}{}".format(rng.choice(WORDS), rng.choice(WORDS), index), _version(rng))
+        for index in range(count)
+    ]
+    for index, (name, version) in enumerate(dists):
+        requirements = _requirements(rng, dists, index)
+        if rng.random() < egg_ratio:
+            _egg_info(lib_path, name.replace("-", "_"), version, python, requirements)
+        else:
+            _dist_info(lib_path, name.replace("-", "_"), version, python, requirements)
+
+        package = os.path.join(lib_path, name.replace("-", "_"))
+        os.mkdir(package)
+        open(os.path.join(package, "__init__.py"), "w").close()
+    return dists
@@ -0,0 +1,13 @@
+# encoding: utf-8
+
+"""
+`python -m lib`, see `cli`
+"""
+
+import sys
+
+from .cli import main
+
+
+if __name__ == "__main__":
+    sys.exit(main())
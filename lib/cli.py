@@ -0,0 +1,307 @@
+# encoding: utf-8
+
+"""
+Command line front end
+
+Manages the `__pypackages__` directory of a project without Sublime Text,
+using the same inventory, installer and sync engine as the plugin:
+
+    python -m lib --project DIR install requests
+    python -m lib --project DIR --jobs 8 sync pypackages.lock
+    python -m lib --project DIR --json list
+
+Run it from the PyPackages directory, or as `python -m PyPackages.lib` from
+the Sublime Text `Packages` directory.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from . import core
+from . import installer
+from . import interpreter
+from . import inventory
+from . import lockfile
+from . import process
+from . import sync
+from . import uninstall
+from .wheel_cache import WheelCache
+
+
+class CliError(Exception):
+    pass
+
+
+class Context(object):
+    """
+    The project and interpreter a command operates on
+
+    Attributes:
+        project_path (str): The project directory, used as working directory
+        pypackages_path (str): The `__pypackages__` directory
+        interpreter (interpreter.Interpreter): The probed Python
+        lib_path (str): The `__pypackages__/X.Y/lib` directory
+        env (dict): Environment with the lib path, pip runs in
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.project_path = os.path.abspath(args.project)
+        self.pypackages_path = core.pypackages_path(
+            os.path.abspath(args.root) if args.root else self.project_path
+        )
+        try:
+            self.interpreter = interpreter.probe(args.python)
+        except interpreter.ProbeError as error:
+            raise CliError(str(error).strip())
+        self.lib_path = core.lib_path(self.pypackages_path, self.interpreter.version)
+        self.env = core.environment(self.lib_path, self.interpreter.executable)
+
+    def path(self, filename):
+        return os.path.join(self.project_path, filename)
+
+    def dists(self):
+        return inventory.get(self.lib_path, self.interpreter.version).refresh()
+
+    def progress(self, message):
+        if self.args.verbose:
+            sys.stderr.write(message + "\n")
+
+    def _on_line(self, stream, line):
+        sys.stderr.write(line + "\n")
+
+    def pip(self, args, quiet=False):
+        return core.run_pip(
+            self.interpreter.executable,
+            args,
+            env=self.env,
+            cwd=self.project_path,
+            on_line=self._on_line if self.args.verbose else None,
+            limits=process.Limits(timeout=self.args.timeout),
+        )
+
+    def index_args(self):
+        args = []
+        if self.args.index_url:
+            args += ["--index-url", self.args.index_url]
+        for link in self.args.find_links:
+            args += ["--find-links", link]
+        if self.args.no_index:
+            args += ["--no-index"]
+        return args
+
+    def engine(self, upgrade=False):
+        return installer.ParallelInstaller(
+            self.pip,
+            self.lib_path,
+            python=self.interpreter.executable,
+            jobs=self.args.jobs,
+            upgrade=upgrade,
+            on_progress=self.progress,
+            cache=WheelCache(self.args.wheel_cache) if self.args.wheel_cache else None,
+            index_args=self.index_args(),
+            version=self.interpreter.version,
+        )
+
+
+def _names(dists):
+    return ["{}-{}".format(*dist) for dist in dists]
+
+def _dist_json(dist):
+    return {"name": dist.project_name, "version": dist.version}
+
+def install(context):
+    args = context.args
+    if args.lock:
+        try:
+            lock = core.load_lock(context.path(args.lock), context.interpreter.version)
+        except lockfile.LockError as error:
+            raise CliError(str(error))
+        installed, skipped = context.engine().install_locked(
+            lockfile.missing(lock, context.dists()), lockfile.top_level(lock)
+        )
+    else:
+        requirements = list(args.packages)
+        for filename in args.requirement:
+            requirements += ["-r", context.path(filename)]
+        if not requirements:
+            raise CliError("Nothing to install")
+        installed, skipped = context.engine(args.upgrade).install(requirements)
+
+    if args.json:
+        return {"installed": _names(installed), "skipped": _names(skipped)}
+
+    lines = ["{} already exists. Upgrade to replace it.".format(name) for name, _ in skipped]
+    if installed:
+        lines.append("Successfully installed {}".format(" ".join(_names(installed))))
+    return lines
+
+def list_packages(context):
+    dists = context.dists()
+    if context.args.json:
+        return [_dist_json(dist) for dist in dists]
+    return core.package_list(dists)
+
+def freeze(context):
+    dists = context.dists()
+    if not context.args.output:
+        packages = core.package_list(dists)
+    else:
+        packages = core.freeze(dists, context.path(context.args.output))
+
+    if context.args.json:
+        return {"output": context.args.output, "packages": packages}
+    if context.args.output:
+        return ["Froze {} packages to {}".format(len(packages), context.args.output)]
+    return packages
+
+def sync_packages(context):
+    filename = context.args.file
+    if not filename:
+        filename = "requirements.txt"
+        if os.path.exists(context.path(lockfile.LOCK_FILENAME)):
+            filename = lockfile.LOCK_FILENAME
+    path = context.path(filename)
+
+    try:
+        plan = core.sync_plan(
+            context.lib_path, path, context.dists(),
+            context.interpreter.version, context.interpreter.markers,
+        )
+    except (lockfile.LockError, sync.SyncError) as error:
+        raise CliError(str(error))
+
+    replaced = []
+    if context.args.dry_run:
+        removed, replaced = plan.remove, plan.replace
+        installed = [
+            requirement if isinstance(requirement, str)
+            else "{}=={}".format(requirement["name"], requirement["version"])
+            for requirement in plan.install
+        ]
+    else:
+        removed, installed = core.apply_plan(
+            plan, context.engine(), locked=core.is_lock(path),
+            on_progress=context.progress,
+        )
+        installed = _names(installed)
+
+    if context.args.json:
+        result = {
+            "file": filename,
+            "removed": [_dist_json(dist) for dist in removed],
+            "installed": installed,
+        }
+        if context.args.dry_run:
+            result["replaced"] = [_dist_json(dist) for dist in replaced]
+        return result
+    if not removed and not installed:
+        return ["Already in sync with {}".format(filename)]
+
+    template = "Would {} {}" if context.args.dry_run else "Successfully {}ed {}"
+    lines = []
+    if removed:
+        lines.append(template.format("uninstall", " ".join(
+            "{}-{}".format(dist.project_name, dist.version) for dist in removed
+        )))
+    if replaced:
+        lines.append(template.format("replace", " ".join(
+            "{}-{}".format(dist.project_name, dist.version) for dist in replaced
+        )))
+    if installed:
+        lines.append(template.format("install", " ".join(installed)))
+    return lines
+
+def env_export(context):
+    env = core.environment(context.lib_path, context.interpreter.executable, {
+        "PATH": os.environ.get("PATH", ""),
+        "PYTHONPATH": os.environ.get("PYTHONPATH", ""),
+    })
+    if context.args.json:
+        return env
+
+    template = "set {}={}" if os.name == "nt" else "export {}={}"
+    return [
+        template.format(key, value if os.name == "nt" else _quote(value))
+        for key, value in sorted(env.items())
+    ]
+
+def _quote(value):
+    return "'{}'".format(value.replace("'", "'\\''"))
+
+COMMANDS = {
+    "install": install,
+    "list": list_packages,
+    "freeze": freeze,
+    "sync": sync_packages,
+    "env-export": env_export,
+}
+
+def parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m lib",
+        description="Manage the __pypackages__ directory of a project",
+    )
+    parser.add_argument("--project", default=".",
+                        help="project directory (default: current directory)")
+    parser.add_argument("--root",
+                        help="directory containing __pypackages__ (default: project)")
+    parser.add_argument("--python", default=sys.executable,
+                        help="interpreter to install packages for")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="number of packages built and unpacked concurrently")
+    parser.add_argument("--json", action="store_true",
+                        help="print the result as JSON")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="print pip output and progress to stderr")
+    parser.add_argument("--index-url")
+    parser.add_argument("--find-links", action="append", default=[])
+    parser.add_argument("--no-index", action="store_true")
+    parser.add_argument("--wheel-cache", metavar="DIR",
+                        help="share downloaded and built wheels in DIR")
+    parser.add_argument("--timeout", type=int, default=0,
+                        help="seconds after which pip is stopped (0: no limit)")
+
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+
+    command = commands.add_parser("install", help="install packages")
+    command.add_argument("packages", nargs="*")
+    command.add_argument("-r", "--requirement", action="append", default=[],
+                         metavar="FILE", help="install from a requirements file")
+    command.add_argument("-U", "--upgrade", action="store_true")
+    command.add_argument("--lock", metavar="FILE",
+                         help="install the missing packages of a lock file")
+
+    commands.add_parser("list", help="list installed packages")
+
+    command = commands.add_parser("freeze", help="print or write pinned requirements")
+    command.add_argument("-o", "--output", metavar="FILE")
+
+    command = commands.add_parser(
+        "sync", help="install and remove packages to match a requirements or lock file"
+    )
+    command.add_argument("file", nargs="?",
+                         help="default: pypackages.lock if present, else requirements.txt")
+    command.add_argument("-n", "--dry-run", action="store_true",
+                         help="only print the changes")
+
+    commands.add_parser("env-export", help="print the environment of the project")
+    return parser
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    try:
+        result = COMMANDS[args.command](Context(args))
+    except (CliError, installer.InstallError, uninstall.UninstallError) as error:
+        sys.stderr.write("error: {}\n".format(error))
+        return 1
+
+    if args.json:
+        print(json.dumps(result, indent=2, sort_keys=True))
+    else:
+        for line in result:
+            print(line)
+    return 0
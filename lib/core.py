@@ -0,0 +1,186 @@
+# encoding: utf-8
+
+"""
+The `__pypackages__` layout and package operations without Sublime Text
+
+Everything here only depends on the other `lib` modules, so the plugin
+commands and the command line front end (`python -m lib`) share the same
+paths, environment, listing, freeze and sync logic.
+"""
+
+import os
+import shutil
+import tempfile
+
+from . import installer
+from . import lockfile
+from . import process
+from . import sync
+from . import uninstall
+
+
+def pypackages_path(root):
+    return os.path.join(root, "__pypackages__")
+
+def lib_path(pypackages_path, version):
+    """
+    Return the lib directory of the Python `version` (`X.Y`)
+    """
+    return os.path.join(pypackages_path, version, "lib")
+
+def executable_dir(python):
+    path = shutil.which(python)
+    return os.path.dirname(path if path else python)
+
+def environment(lib_path, python, env=None):
+    """
+    Return `env` with the lib path and the interpreter directory prepended
+
+    `PYPACKAGESPATH` is set to `lib_path`, `.` and `lib_path` are put in
+    front of `PYTHONPATH` and the directory of `python` in front of `PATH`.
+    `env` is changed in place; without one, a copy of `os.environ` is used.
+    """
+    if env is None:
+        env = dict(os.environ)
+
+    path = env.get("PATH", "")
+    pythonpath = env.get("PYTHONPATH", "")
+    env["PYPACKAGESPATH"] = lib_path
+    pypackages = os.pathsep.join([".", lib_path])
+
+    if not pythonpath.startswith(pypackages):
+        env["PYTHONPATH"] = os.pathsep.join(
+            [pypackages, pythonpath]
+        )
+
+    python_path = executable_dir(python)
+    if not path.startswith(python_path):
+        # Adds an additional pathsep to make the change trackable
+        env["PATH"] = os.pathsep.join(
+            [python_path, "", path]
+        )
+
+    return env
+
+def run_pip(python, args, env=None, cwd=None, on_line=None, job=None, limits=None):
+    """
+    Run `python -m pip` with `args` and return a `process.Result`
+    """
+    return process.run(
+        [python, "-m", "pip"] + args,
+        env=env,
+        cwd=cwd,
+        shell=os.name == "nt",
+        on_line=on_line,
+        job=job,
+        limits=limits,
+    )
+
+def package_list(dists):
+    return ["{}=={}".format(dist.project_name, dist.version) for dist in dists]
+
+def freeze(dists, path):
+    """
+    Write the pinned `dists` to the requirements file `path`
+    """
+    packages = package_list(dists)
+    with open(path, "w") as target:
+        for package in packages:
+            print(package, file=target)
+    return packages
+
+def load_lock(path, version):
+    """
+    Return the lock file `path`, if it was locked for the Python `version`
+    """
+    lock = lockfile.load(path)
+    if lock.get("python") not in (None, version):
+        raise lockfile.LockError("{} was locked for Python {}, not {}".format(
+            os.path.basename(path), lock["python"], version
+        ))
+    return lock
+
+def is_lock(path):
+    return path.endswith(".lock")
+
+def sync_plan(lib_path, path, dists, version=None, environment=None):
+    """
+    Return the `sync.Plan` which brings `dists` in line with `path`
+
+    `path` is a lock file if it ends with `.lock`, else a requirements file
+    whose markers are evaluated in the marker `environment`.
+    """
+    if is_lock(path):
+        return sync.lock_plan(load_lock(path, version), dists)
+    return sync.requirements_plan(
+        lib_path, sync.read_requirements(path), dists, environment
+    )
+
+def _install_constrained(plan, engine, tmp_dir, on_progress):
+    attempts = [plan.constraints]
+    if plan.fallback != plan.constraints:
+        attempts.append(plan.fallback)
+
+    constraints = os.path.join(tmp_dir, "constraints.txt")
+    for attempt, lines in enumerate(attempts, 1):
+        with open(constraints, "w") as output:
+            output.write("\n".join(lines) + "\n")
+        try:
+            installed, _ = engine.install(
+                ["-c", constraints] + plan.install, replace_changed=True
+            )
+            return installed
+        except installer.InstallError:
+            if attempt == len(attempts):
+                raise
+            on_progress("Resolving again without the installed versions")
+
+def apply_plan(plan, engine, locked=False, on_progress=None):
+    """
+    Remove and install the packages of `plan` with a `ParallelInstaller`
+
+    The requirements are installed against `plan.constraints` first and
+    against `plan.fallback` if that fails to resolve. Returns the removed
+    distributions and the installed `(name, version)` pairs. Raises `uninstall.UninstallError` or `installer.InstallError`.
+    If the install fails, the removed distributions are restored. The
+    `plan.requested` packages are marked as installed on request, whether
+    they were installed now or kept.
+    """
+    on_progress = on_progress or (lambda message: None)
+
+    # Removals and installs may share directories, so they run one after
+    # the other, each of them in parallel. Removed files are kept next to
+    # the lib directory until the install succeeded
+    backup = None
+    if plan.remove:
+        on_progress("Removing {} packages".format(len(plan.remove)))
+        backup = tempfile.mkdtemp(
+            prefix=".pypackages-backup-", dir=os.path.dirname(engine.lib_path)
+        )
+        try:
+            uninstall.uninstall(
+                engine.lib_path, [dist.entry for dist in plan.remove], backup=backup
+            )
+        except uninstall.UninstallError:
+            shutil.rmtree(backup, ignore_errors=True)
+            raise
+
+    installed = []
+    tmp_dir = tempfile.mkdtemp(prefix="pypackages-")
+    try:
+        if locked and plan.install:
+            installed, _ = engine.install_locked(plan.install)
+        elif plan.install:
+            installed = _install_constrained(plan, engine, tmp_dir, on_progress)
+    except Exception:
+        if backup is not None:
+            on_progress("Restoring {} packages".format(len(plan.remove)))
+            uninstall.restore(engine.lib_path, backup)
+        raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if backup is not None:
+            shutil.rmtree(backup, ignore_errors=True)
+
+    installer.mark_requested(engine.lib_path, plan.requested, engine.version)
+    return list(plan.remove), installed
@@ -0,0 +1,241 @@
+# encoding: utf-8
+
+"""
+Dependency graph of the distributions in a lib directory
+
+The requirements of every distribution are parsed once and their markers
+evaluated against the interpreter's marker environment. Parsed entries are
+kept until the distribution's inventory signature changes, and specifier
+checks are memoized per version, so checking the whole environment or
+looking up reverse dependencies is a walk over in-memory adjacency lists.
+"""
+
+import collections
+import os
+import re
+import threading
+
+from . import lockfile
+from . import markers
+from . import metadata
+from .installer import canonical_name
+
+
+EXTRA = re.compile(r"""\bextra\s*==\s*["']([^"']+)["']""")
+
+Problem = collections.namedtuple(
+    "Problem", ["project_name", "version", "requirement", "installed"]
+)
+
+Edge = collections.namedtuple("Edge", ["source", "target", "requirement"])
+
+_graphs = {}
+_lock = threading.Lock()
+
+
+def get(lib_path, environment=None):
+    """
+    Return the shared `DependencyGraph` of `lib_path`
+    """
+    environment = environment or {}
+    key = (lib_path, tuple(sorted(environment.items())))
+    with _lock:
+        graph = _graphs.get(key)
+        if graph is None:
+            graph = _graphs[key] = DependencyGraph(lib_path, environment)
+    return graph
+
+def requirement_string(requirement):
+    extras = "[{}]".format(",".join(requirement["extras"])) if requirement["extras"] else ""
+    return requirement["name"] + extras + (requirement["specifier"] or "")
+
+
+class DependencyGraph(object):
+    """
+    Requirements between the distributions of a lib directory
+
+    Attributes:
+        lib_path (str): The `__pypackages__/X.Y/lib` directory
+        environment (dict): Marker environment of the interpreter
+        dists (dict): Installed distributions by canonical name
+    """
+
+    def __init__(self, lib_path, environment=None):
+        self.lib_path = lib_path
+        self.environment = environment or {}
+        self.dists = {}
+        self._nodes = {}
+        self._satisfied = {}
+        self._edges = None
+        self._by_source = {}
+        self._by_target = {}
+        self._lock = threading.Lock()
+
+    def update(self, dists):
+        """
+        Sync the graph with `dists`, re-parsing changed distributions only
+
+        Args:
+            dists (list): Distributions as returned by `Inventory.refresh`
+        """
+        with self._lock:
+            nodes = {}
+            for dist in dists:
+                node = self._nodes.get(dist.entry)
+                if node is None or node[0] != dist.signature:
+                    node = (dist.signature, self._parse(dist))
+                nodes[dist.entry] = node
+
+            self._nodes = nodes
+            self.dists = dict(
+                (canonical_name(dist.project_name), dist) for dist in dists
+            )
+            self._edges = None
+        return self
+
+    def _marker(self, marker, extra=""):
+        try:
+            return markers.evaluate(marker, self.environment, extra)
+        except markers.MarkerError:
+            # Rather report a dependency too many than miss one
+            return True
+
+    def _parse(self, dist):
+        # Active requirements by extra, the base requirements under None
+        requirements = {None: []}
+        for line in metadata.requires(self.lib_path, dist.entry):
+            try:
+                requirement = lockfile.parse_requirement(line)
+            except lockfile.LockError:
+                continue
+
+            marker = requirement["marker"]
+            extras = EXTRA.findall(marker) if marker else []
+            if not extras and (marker is None or self._marker(marker)):
+                requirements[None].append(requirement)
+            for extra in extras:
+                if self._marker(marker, extra):
+                    requirements.setdefault(canonical_name(extra), []).append(requirement)
+        return requirements
+
+    def _requirements(self, name, extra=None):
+        dist = self.dists.get(name)
+        if dist is None:
+            return []
+        return self._nodes[dist.entry][1].get(extra, [])
+
+    def satisfies(self, version, requirement):
+        specifier = requirement["specifier"]
+        if not specifier:
+            return True
+
+        key = (specifier, version)
+        result = self._satisfied.get(key)
+        if result is None:
+            try:
+                result = markers.version_matches(version, specifier)
+            except markers.MarkerError:
+                # Report an invalid specifier as a conflict
+                result = False
+            self._satisfied[key] = result
+        return result
+
+    def edges(self):
+        """
+        Return all active requirement edges, including requested extras
+        """
+        with self._lock:
+            if self._edges is not None:
+                return self._edges
+
+            edges = []
+            queue = collections.deque((name, None) for name in sorted(self.dists))
+            seen = set(queue)
+            while queue:
+                name, extra = queue.popleft()
+                for requirement in self._requirements(name, extra):
+                    edges.append(Edge(name, requirement["name"], requirement))
+                    for requested in requirement["extras"]:
+                        node = (requirement["name"], canonical_name(requested))
+                        if node not in seen:
+                            seen.add(node)
+                            queue.append(node)
+
+            self._edges = edges
+            self._by_source, self._by_target = {}, {}
+            for edge in edges:
+                self._by_source.setdefault(edge.source, []).append(edge)
+                self._by_target.setdefault(edge.target, []).append(edge)
+            return edges
+
+    def check(self):
+        """
+        Return a `Problem` for every missing or conflicting requirement
+
+        `Problem.installed` is the installed version of a conflicting
+        requirement and None for a missing one.
+        """
+        problems = []
+        for edge in self.edges():
+            dist = self.dists[edge.source]
+            target = self.dists.get(edge.target)
+            if target is None:
+                installed = None
+            elif self.satisfies(target.version, edge.requirement):
+                continue
+            else:
+                installed = target.version
+            problems.append(Problem(
+                dist.project_name, dist.version,
+                requirement_string(edge.requirement), installed,
+            ))
+        return problems
+
+    def dependencies(self, name):
+        """
+        Return the canonical names of the installed direct dependencies
+        """
+        self.edges()
+        return sorted(set(
+            edge.target for edge in self._by_source.get(canonical_name(name), [])
+            if edge.target in self.dists
+        ))
+
+    def reverse(self, name):
+        """
+        Return the `Edge`s of all installed packages which require `name`
+        """
+        self.edges()
+        return list(self._by_target.get(canonical_name(name), []))
+
+    def requested(self, name):
+        """
+        Whether `name` was installed on request rather than as a dependency
+        """
+        dist = self.dists.get(canonical_name(name))
+        return dist is not None and os.path.exists(
+            os.path.join(self.lib_path, dist.entry, "REQUESTED")
+        )
+
+    def orphans(self, names):
+        """
+        Return the dependencies which are only required by `names`
+
+        Dependencies are followed transitively. Packages which were
+        installed on request are never considered orphans.
+        """
+        removed = set(canonical_name(name) for name in names)
+        queue = collections.deque()
+        for name in removed:
+            queue.extend(self.dependencies(name))
+
+        orphans = []
+        while queue:
+            name = queue.popleft()
+            if name in removed or self.requested(name):
+                continue
+            if all(edge.source in removed for edge in self.reverse(name)):
+                removed.add(name)
+                orphans.append(name)
+                queue.extend(self.dependencies(name))
+        return sorted(orphans)
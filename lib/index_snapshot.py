@@ -0,0 +1,164 @@
+# encoding: utf-8
+
+"""
+Offline snapshot of a package index
+
+A snapshot is either a simple-index mirror directory (one `<project>/`
+directory per project, holding the distribution files or an `index.html`
+linking to them) or a JSON file mapping project names to a version or a
+list of versions. Versions are read lazily and kept in memory until the
+snapshot changes on disk, so finding outdated packages needs no network.
+"""
+
+import json
+import os
+import re
+import threading
+
+from . import wheel
+from .installer import canonical_name
+from .metadata import parse_version
+
+
+SDIST_EXTENSIONS = (".tar.gz", ".tar.bz2", ".tar.xz", ".tgz", ".zip")
+
+LINK_TEXT = re.compile(r"<a\s[^>]*>([^<]+)</a>", re.IGNORECASE)
+
+_snapshots = {}
+_lock = threading.Lock()
+
+
+def get(path):
+    """
+    Return the shared `IndexSnapshot` of `path`
+    """
+    key = os.path.normcase(os.path.abspath(path))
+    with _lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is None:
+            snapshot = _snapshots[key] = IndexSnapshot(path)
+    return snapshot
+
+def file_version(project, filename):
+    """
+    Return the version of a distribution filename of `project`, if any
+    """
+    if filename.endswith(".whl"):
+        try:
+            name, version, _ = wheel.parse_filename(filename)
+        except wheel.WheelError:
+            return None
+        return version if canonical_name(name) == project else None
+
+    for ext in SDIST_EXTENSIONS:
+        if filename.endswith(ext):
+            stem = filename[:-len(ext)]
+            break
+    else:
+        return None
+
+    # Project names may contain dashes, so match the name by its length
+    for index, char in enumerate(stem):
+        if char == "-" and canonical_name(stem[:index]) == project:
+            return stem[index + 1:] or None
+    return None
+
+def is_prerelease(parsed):
+    return any(part.startswith("*") and part < "*final" for part in parsed)
+
+
+class IndexSnapshot(object):
+    """
+    Project versions of a local index snapshot
+
+    Attributes:
+        path (str): The mirror directory or JSON file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._json = None
+        self._projects = {}
+        self._lock = threading.Lock()
+
+    def _json_versions(self):
+        mtime = os.stat(self.path).st_mtime
+        if self._json is None or self._json[0] != mtime:
+            with open(self.path, encoding="utf-8") as snapshot:
+                data = json.load(snapshot)
+            projects = {}
+            for name, versions in data.items():
+                if not isinstance(versions, list):
+                    versions = [versions]
+                projects[canonical_name(name)] = [str(version) for version in versions]
+            self._json = (mtime, projects)
+        return self._json[1]
+
+    def _directory_versions(self, project):
+        project_path = os.path.join(self.path, project)
+        try:
+            mtime = os.stat(project_path).st_mtime
+        except OSError:
+            return []
+
+        cached = self._projects.get(project)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        filenames = os.listdir(project_path)
+        if "index.html" in filenames:
+            with open(os.path.join(project_path, "index.html"), encoding="utf-8",
+                      errors="replace") as index:
+                filenames = LINK_TEXT.findall(index.read())
+
+        versions = set()
+        for filename in filenames:
+            version = file_version(project, filename.strip())
+            if version:
+                versions.add(version)
+
+        self._projects[project] = (mtime, sorted(versions))
+        return self._projects[project][1]
+
+    def versions(self, names):
+        """
+        Return a dict mapping the canonical form of `names` to their versions
+        """
+        projects = [canonical_name(name) for name in names]
+        with self._lock:
+            if os.path.isdir(self.path):
+                return dict(
+                    (project, self._directory_versions(project)) for project in projects
+                )
+
+            available = self._json_versions()
+            return dict((project, available.get(project, [])) for project in projects)
+
+    def outdated(self, dists, prereleases=False):
+        """
+        Return `(dist, latest_version)` of all `dists` with a newer version
+
+        Args:
+            dists (list): Distributions as returned by `Inventory.refresh`
+            prereleases (bool): Whether pre-releases count as newer versions
+        """
+        available = self.versions([dist.project_name for dist in dists])
+
+        outdated = []
+        for dist in dists:
+            candidates = [
+                (parse_version(version), version)
+                for version in available[canonical_name(dist.project_name)]
+            ]
+            if not prereleases:
+                candidates = [
+                    candidate for candidate in candidates
+                    if not is_prerelease(candidate[0])
+                ]
+            if not candidates:
+                continue
+
+            latest = max(candidates)
+            if latest[0] > parse_version(dist.version):
+                outdated.append((dist, latest[1]))
+        return outdated
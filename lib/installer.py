@@ -0,0 +1,385 @@
+# encoding: utf-8
+
+"""
+Parallel install engine
+
+The requirement set is resolved and downloaded by a single `pip download`
+run. Source distributions are then built into wheels and all wheels are
+unpacked into the lib directory concurrently by a bounded worker pool.
+With a `WheelCache`, requirements are first looked up in the cache without
+touching any index, and every downloaded or built wheel is added to it.
+Locked package sets skip resolution altogether.
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from . import inventory
+from . import markers
+from . import uninstall
+from . import wheel
+from .wheel_cache import sha256
+
+
+class InstallError(Exception):
+    pass
+
+
+def canonical_name(name):
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+def requested_names(args):
+    """
+    Return the canonical names of the requirements in the `pip install` args
+
+    Requirements files (`-r`) are read, constraints files (`-c`) and other
+    options are skipped.
+    """
+    # sync needs canonical_name from this module
+    from . import sync
+
+    names, files = set(), []
+    args = iter(args)
+    for arg in args:
+        if arg in ("-r", "--requirement"):
+            files.append(next(args, None))
+        elif arg.startswith("--requirement="):
+            files.append(arg.split("=", 1)[1])
+        elif arg.startswith("-r"):
+            files.append(arg[2:])
+        elif arg in ("-c", "--constraint"):
+            next(args, None)
+        elif not arg.startswith("-"):
+            names.add(canonical_name(re.split(r"[^A-Za-z0-9._-]", arg, 1)[0]))
+
+    for path in filter(None, files):
+        try:
+            requirements = sync.read_requirements(path, strict=False)
+        except sync.SyncError:
+            continue
+        names.update(requirement["name"] for requirement in requirements)
+    return names
+
+def mark_requested(lib_path, names, version=None):
+    """
+    Mark the installed distributions in `names` as installed on request
+
+    Like pip, a `REQUESTED` file is created in their `.dist-info` directory.
+    """
+    names = set(canonical_name(name) for name in names)
+    for dist in inventory.get(lib_path, version).refresh():
+        if canonical_name(dist.project_name) not in names:
+            continue
+        dist_info = os.path.join(lib_path, dist.entry)
+        if dist.entry.endswith(".dist-info") and os.path.isdir(dist_info):
+            open(os.path.join(dist_info, "REQUESTED"), "w").close()
+
+
+class ParallelInstaller(object):
+    """
+    Installs a requirement set into a lib directory using a worker pool
+
+    Attributes:
+        pip (callable): Runs pip with a list of arguments and returns a
+            `process.Result`. Accepts `quiet=True` for attempts which are
+            expected to fail
+        lib_path (str): The `__pypackages__/X.Y/lib` directory
+        python (str): Interpreter used for script shebangs
+        jobs (int): Maximum number of concurrent builds/unpacks
+        upgrade (bool): Replace distributions which are already installed
+        on_progress (callable): Called with a status message per step
+        cache (WheelCache): Shared wheel store, if any
+        index_args (list): Index options passed to pip (`--index-url`, ...)
+        store (UnpackedStore): Link wheels from this store instead of
+            unpacking them into the lib directory
+        version (str): The Python version (`X.Y`) of the lib directory, so
+            the installer shares the inventory of the other users of it
+    """
+
+    def __init__(self, pip, lib_path, python="python", jobs=4, upgrade=False,
+            on_progress=None, cache=None, index_args=(), store=None, version=None):
+        self.pip = pip
+        self.lib_path = lib_path
+        self.python = python
+        self.jobs = max(1, jobs)
+        self.upgrade = upgrade
+        self.on_progress = on_progress or (lambda message: None)
+        self.cache = cache
+        self.index_args = list(index_args)
+        self.store = store
+        self.version = version
+        self._lock = threading.Lock()
+        self._done = 0
+
+    def install(self, args, replace_changed=False):
+        """
+        Install the requirements `args` (as passed to `pip install`)
+
+        Returns a tuple of installed and skipped `(name, version)` pairs.
+        With `replace_changed`, installed distributions are replaced if the
+        resolved version differs, even without `upgrade`.
+        """
+        tmp_dir = tempfile.mkdtemp(prefix="pypackages-")
+        try:
+            downloads = self._download(args, os.path.join(tmp_dir, "download"))
+            wheels = self._build(downloads, os.path.join(tmp_dir, "wheels"))
+            if self.cache:
+                wheels = [self.cache.add(path) for path in wheels]
+            requested = requested_names(args)
+            installed, skipped = self._unpack(wheels, replace_changed, requested)
+            mark_requested(self.lib_path, requested, self.version)
+            return installed, skipped
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def install_locked(self, packages, requested=()):
+        """
+        Install the locked `packages` (see `lockfile`) without resolving
+
+        Wheels are taken from the cache where possible. Only the remaining
+        ones are fetched, each pinned and without dependencies. The packages
+        named in `requested` are marked as installed on request.
+        """
+        tmp_dir = tempfile.mkdtemp(prefix="pypackages-")
+        try:
+            wheels, fetch = [], []
+            for package in packages:
+                path = None
+                if self.cache and package.get("wheel"):
+                    path = self.cache.get(package["wheel"])
+                if path and package.get("sha256") not in (None, sha256(path)):
+                    path = None
+                if path:
+                    wheels.append(path)
+                else:
+                    fetch.append(package)
+
+            if fetch:
+                downloads = self._fetch(fetch, os.path.join(tmp_dir, "download"))
+                self._verify(fetch, downloads)
+                built = self._build(downloads, os.path.join(tmp_dir, "wheels"))
+                if self.cache:
+                    built = [self.cache.add(path) for path in built]
+                wheels += built
+
+            installed, skipped = self._unpack(wheels, replace_changed=True)
+            mark_requested(self.lib_path, requested, self.version)
+            return installed, skipped
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _fetch(self, packages, dest):
+        self.on_progress("Fetching {} locked packages".format(len(packages)))
+        os.makedirs(dest)
+
+        # Packages locked by wheel must not be fetched as sdist and built
+        for binary in (True, False):
+            pins = [
+                "{}=={}".format(package["name"], package["version"])
+                for package in packages if bool(package.get("wheel")) == binary
+            ]
+            if pins:
+                returncode, _, stderr = self.pip(
+                    ["download", "--no-deps", "--dest", dest]
+                    + (["--only-binary=:all:"] if binary else [])
+                    + (self.cache.find_links() if self.cache else [])
+                    + self.index_args
+                    + pins
+                )
+                if returncode != 0:
+                    raise InstallError(stderr.decode() or "Failed to fetch locked packages")
+
+        downloads = self._listing(dest)
+        if len(downloads) < len(packages):
+            raise InstallError("Failed to fetch locked packages")
+        return downloads
+
+    @staticmethod
+    def _verify(packages, downloads):
+        # A hashed package must have been fetched as a wheel with that hash,
+        # whatever file pip picked
+        fetched = {}
+        for path in downloads:
+            if path.endswith(".whl"):
+                name = canonical_name(os.path.basename(path).split("-", 1)[0])
+                fetched.setdefault(name, []).append(path)
+
+        for package in packages:
+            expected = package.get("sha256")
+            if not expected:
+                continue
+            digests = [sha256(path) for path in fetched.get(package["name"], [])]
+            if expected not in digests:
+                raise InstallError("Hash mismatch for {}, expected {} with sha256 {}".format(
+                    package["name"], package["wheel"] or "a wheel", expected
+                ))
+
+    def _progress(self, action, name, total):
+        with self._lock:
+            self._done += 1
+            done = self._done
+        self.on_progress("{} {} ({}/{})".format(action, name, done, total))
+
+    def _map(self, func, items):
+        self._done = 0
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            return list(executor.map(func, items))
+
+    @staticmethod
+    def _listing(directory):
+        return [os.path.join(directory, name) for name in sorted(os.listdir(directory))]
+
+    def _download(self, args, dest):
+        self.on_progress("Resolving requirements")
+        os.makedirs(dest)
+
+        download_args = ["download", "--dest", dest]
+        if self.cache:
+            download_args += self.cache.find_links()
+            if not self.upgrade:
+                returncode, stdout, _ = self.pip(
+                    download_args + ["--no-index"] + args, quiet=True
+                )
+                if returncode == 0 and b"Successfully downloaded" in stdout:
+                    return self._listing(dest)
+                shutil.rmtree(dest)
+                os.makedirs(dest)
+
+        returncode, _, stderr = self.pip(download_args + self.index_args + args)
+        if returncode != 0:
+            raise InstallError(stderr.decode() or "pip download failed")
+
+        downloads = self._listing(dest)
+        if not downloads:
+            raise InstallError(stderr.decode() or "Nothing to install")
+        return downloads
+
+    def _build(self, downloads, dest):
+        os.makedirs(dest)
+        sdists = [path for path in downloads if not path.endswith(".whl")]
+        wheels = [path for path in downloads if path.endswith(".whl")]
+
+        def build(sdist):
+            build_dir = os.path.join(dest, os.path.basename(sdist))
+            returncode, _, stderr = self.pip(
+                ["wheel", "--no-deps", "--wheel-dir", build_dir, sdist]
+            )
+            built = [
+                os.path.join(build_dir, name) for name in os.listdir(build_dir)
+                if name.endswith(".whl")
+            ] if os.path.isdir(build_dir) and returncode == 0 else []
+            if not built:
+                raise InstallError("Failed to build {}: {}".format(
+                    os.path.basename(sdist), stderr.decode()
+                ))
+            self._progress("Built", os.path.basename(sdist), len(sdists))
+            return built[0]
+
+        return wheels + self._map(build, sdists)
+
+    def _remove(self, entries):
+        if not entries:
+            return
+        try:
+            uninstall.uninstall(self.lib_path, entries, jobs=self.jobs)
+        except uninstall.UninstallError:
+            # Entries without a file list only lose their metadata directory
+            for entry in entries:
+                try:
+                    uninstall.uninstall(self.lib_path, [entry], jobs=self.jobs)
+                except uninstall.UninstallError:
+                    shutil.rmtree(os.path.join(self.lib_path, entry), ignore_errors=True)
+
+    @staticmethod
+    def _required(wheels):
+        # lockfile needs canonical_name from this module
+        from . import lockfile
+
+        specifiers = {}
+        for path in wheels:
+            try:
+                lines = wheel.requires(path)
+            except (wheel.WheelError, zipfile.BadZipFile, OSError, IOError) as error:
+                raise InstallError("Failed to read {}: {}".format(os.path.basename(path), error))
+            for line in lines:
+                try:
+                    requirement = lockfile.parse_requirement(line)
+                except lockfile.LockError:
+                    continue
+                # Markers are not evaluated, a dependency rather gets upgraded
+                specifiers.setdefault(requirement["name"], []).append(requirement["specifier"])
+        return specifiers
+
+    @staticmethod
+    def _satisfies(version, specifiers):
+        try:
+            return all(
+                markers.version_matches(version, specifier)
+                for specifier in specifiers if specifier
+            )
+        except ValueError:
+            return False
+
+    def _unpack(self, wheels, replace_changed=False, requested=()):
+        """
+        Unpack `wheels` and return the installed and skipped pairs
+
+        With `upgrade`, the `requested` distributions are replaced. Other
+        distributions are only replaced if their installed version does not
+        satisfy the requirements of the resolved wheels, like pip's default
+        `only-if-needed` upgrade strategy.
+        """
+        required = self._required(wheels) if self.upgrade else {}
+        installed_dists = {
+            canonical_name(dist.project_name): dist
+            for dist in inventory.get(self.lib_path, self.version).refresh()
+        }
+
+        pending, replaced, skipped = [], [], []
+        for path in wheels:
+            try:
+                name, version, _ = wheel.parse_filename(path)
+            except wheel.WheelError as error:
+                raise InstallError(str(error))
+            key = canonical_name(name)
+            dist = installed_dists.get(key)
+            if dist is None:
+                pending.append(path)
+                continue
+
+            replace = replace_changed and dist.version != version
+            if self.upgrade:
+                replace = replace or key in requested or not self._satisfies(
+                    dist.version, required.get(key, [])
+                )
+            if replace:
+                pending.append(path)
+                replaced.append(dist.entry)
+            else:
+                skipped.append((dist.project_name, dist.version))
+
+        # Pruning emptied directories must not race the unpacking of other
+        # wheels into the same namespace directories
+        self._remove(replaced)
+
+        def unpack(path):
+            name, version, _ = wheel.parse_filename(path)
+            try:
+                if self.store:
+                    self.store.materialize(path, self.lib_path, self.python)
+                else:
+                    wheel.unpack(path, self.lib_path, self.python)
+            except (wheel.WheelError, zipfile.BadZipFile, OSError, IOError) as error:
+                raise InstallError("Failed to install {}: {}".format(
+                    os.path.basename(path), error
+                ))
+            self._progress("Installed", name, len(pending))
+            return name, version
+
+        os.makedirs(self.lib_path, exist_ok=True)
+        return self._map(unpack, pending), skipped
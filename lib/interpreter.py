@@ -0,0 +1,103 @@
+# encoding: utf-8
+
+"""
+Cached interpreter probing
+
+A single subprocess reports everything PyPackages needs to know about the
+configured interpreter. Results are cached by the resolved executable path
+and its mtime/inode, so replacing the interpreter invalidates its entry.
+"""
+
+import collections
+import json
+import os
+import shutil
+import subprocess
+import threading
+
+from . import markers
+from . import perf
+
+
+PROBE_SCRIPT = markers.ENVIRONMENT_SCRIPT + """
+import json, sysconfig
+soabi = (sysconfig.get_config_var("SOABI") or "").split("-")
+if soabi[0] == "cpython" and len(soabi) > 1:
+    abi = "cp" + soabi[1]
+elif soabi[0]:
+    abi = "_".join(soabi[:2]).replace(".", "_")
+else:
+    abi = "cp{}{}".format(*sys.version_info[:2])
+print(json.dumps({
+    "version": "{}.{}".format(*sys.version_info[:2]),
+    "full_version": platform.python_version(),
+    "implementation": platform.python_implementation(),
+    "abi": abi,
+    "platform": sysconfig.get_platform(),
+    "markers": marker_environment(),
+}))
+"""
+
+Interpreter = collections.namedtuple(
+    "Interpreter",
+    [
+        "executable", "version", "full_version", "implementation", "abi", "platform",
+        "markers",
+    ],
+)
+
+_cache = {}
+_lock = threading.Lock()
+
+
+class ProbeError(Exception):
+    pass
+
+
+def resolve(python):
+    path = shutil.which(python)
+    return os.path.realpath(path) if path else python
+
+def cache_key(python):
+    path = resolve(python)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return path, None, None
+    return path, stat.st_mtime, stat.st_ino
+
+def probe(python):
+    """
+    Return the `Interpreter` for `python`, running it only on a cache miss
+    """
+    key = cache_key(python)
+
+    with _lock:
+        info = _cache.get(key)
+    if info is not None:
+        return info
+
+    # No shell: cmd.exe would cut the script off at its first newline
+    try:
+        with perf.span("probe", key[0]):
+            stdout, stderr = subprocess.Popen(
+                [key[0], "-c", PROBE_SCRIPT],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            ).communicate()
+    except OSError as error:
+        raise ProbeError("Could not run {}: {}".format(python, error))
+
+    try:
+        data = json.loads(stdout.decode())
+    except ValueError:
+        raise ProbeError(stderr.decode() or "Could not probe {}".format(python))
+
+    info = Interpreter(executable=key[0], **data)
+    with _lock:
+        _cache[key] = info
+    return info
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
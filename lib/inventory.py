@@ -0,0 +1,193 @@
+# encoding: utf-8
+
+"""
+Incremental inventory of the distributions in a `__pypackages__` lib path
+
+The inventory is persisted next to the lib directory. Each metadata entry is
+recorded with the mtime and size of its directory and metadata file, so a
+refresh only re-parses entries that pip (or anyone else) has touched.
+Entries are kept as compact `Dist` records, and the sorted listing is only
+rebuilt when an entry changed.
+"""
+
+import json
+import os
+import threading
+
+from . import metadata
+from . import perf
+
+
+INDEX_FILENAME = ".pypackages-index.json"
+INDEX_VERSION = 1
+
+_inventories = {}
+_lock = threading.Lock()
+
+
+def get(lib_path, python=None):
+    """
+    Return the shared `Inventory` of `lib_path`
+    """
+    key = (os.path.normcase(os.path.abspath(lib_path)), python)
+    with _lock:
+        inventory = _inventories.get(key)
+        if inventory is None:
+            inventory = _inventories[key] = Inventory(lib_path, python)
+    return inventory
+
+def signature(path, ext):
+    stat = os.stat(path)
+    signature = [stat.st_mtime, stat.st_size]
+    if os.path.isdir(path):
+        try:
+            stat = os.stat(metadata.metadata_path(path, ext))
+            signature += [stat.st_mtime, stat.st_size]
+        except OSError:
+            signature += [None, None]
+    return signature
+
+
+class Dist(object):
+    """
+    Compact record of an installed distribution
+
+    Attributes:
+        project_name (str): The distribution name
+        version (str): The installed version, None if unknown
+        py_version (str): The Python version of an egg, if any
+        signature (list): Stat signature of the metadata entry
+        entry (str): The `.dist-info`/`.egg-info` name in the lib directory
+        sort_key (str): Listing order, computed once
+    """
+
+    __slots__ = (
+        "project_name", "version", "py_version", "signature", "entry", "sort_key"
+    )
+
+    def __init__(self, project_name, version, py_version, signature, entry):
+        self.project_name = project_name
+        self.version = version
+        self.py_version = py_version
+        self.signature = signature
+        self.entry = entry
+        self.sort_key = project_name.lower()
+
+    def __repr__(self):
+        return "Dist({!r}, {!r})".format(self.project_name, self.version)
+
+    def to_json(self):
+        return {
+            "project_name": self.project_name,
+            "version": self.version,
+            "py_version": self.py_version,
+            "signature": self.signature,
+        }
+
+
+class Inventory(object):
+    """
+    Distributions found in a lib path, kept in sync with an on-disk index
+
+    Attributes:
+        lib_path (str): The `__pypackages__/X.Y/lib` directory
+        python (str): Only list distributions built for this Python version
+        index_path (str): The file the index is persisted to
+    """
+
+    def __init__(self, lib_path, python=None):
+        self.lib_path = lib_path
+        self.python = python
+        self.index_path = os.path.join(os.path.dirname(lib_path), INDEX_FILENAME)
+        self._entries = None
+        self._dists = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.index_path) as index:
+                data = json.load(index)
+        except (OSError, IOError, ValueError):
+            return {}
+
+        if data.get("version") != INDEX_VERSION:
+            return {}
+        try:
+            return dict(
+                (entry, Dist(entry=entry, **record))
+                for entry, record in data.get("entries", {}).items()
+            )
+        except TypeError:
+            return {}
+
+    def _save(self):
+        entries = dict((entry, dist.to_json()) for entry, dist in self._entries.items())
+        data = {"version": INDEX_VERSION, "entries": entries}
+        tmp_path = self.index_path + ".tmp"
+        try:
+            with open(tmp_path, "w") as index:
+                json.dump(data, index)
+            os.replace(tmp_path, self.index_path)
+        except (OSError, IOError):
+            pass
+
+    def refresh(self):
+        """
+        Re-parse changed metadata entries and return the distributions
+        """
+        with self._lock, perf.span("scan", self.lib_path):
+            if self._entries is None:
+                self._entries = self._load()
+
+            try:
+                listing = os.listdir(self.lib_path)
+            except OSError:
+                listing = []
+
+            entries = {}
+            changed = False
+            for entry in listing:
+                ext = metadata.metadata_ext(entry)
+                if not ext:
+                    continue
+
+                try:
+                    stat = signature(os.path.join(self.lib_path, entry), ext)
+                except OSError:
+                    continue
+
+                dist = self._entries.get(entry)
+                if dist is None or dist.signature != stat:
+                    dist = Dist(
+                        signature=stat, entry=entry, **metadata.read(self.lib_path, entry)
+                    )
+                    changed = True
+                entries[entry] = dist
+
+            if changed or len(entries) != len(self._entries):
+                self._entries = entries
+                self._dists = None
+                self._save()
+
+            if self._dists is None:
+                self._dists = self._distributions()
+            return list(self._dists)
+
+    def cached(self):
+        """
+        Return the distributions of the last refresh without touching the
+        disk, or None if the lib path was not scanned yet
+        """
+        with self._lock:
+            if self._dists is None:
+                return None
+            return list(self._dists)
+
+    def _distributions(self):
+        dists = [
+            dist for dist in self._entries.values()
+            if dist.version is not None
+            and (not self.python or dist.py_version in (None, self.python))
+        ]
+        dists.sort(key=lambda dist: dist.sort_key)
+        return dists
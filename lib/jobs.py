@@ -0,0 +1,211 @@
+# encoding: utf-8
+
+"""
+Per-project job queues
+
+Jobs which change the packages of a project (install, uninstall, sync)
+run one after the other in submission order, read-only jobs (list,
+outdated, freeze) run right away next to them. Submitting a job equal to a
+queued one returns the queued job instead. A running job is cancelled by
+terminating the process trees of the subprocesses it started.
+"""
+
+import collections
+import threading
+import time
+
+from . import process
+
+
+_queues = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def get(project):
+    """
+    Return the shared `JobQueue` of the project at `project`
+    """
+    with _lock:
+        queue = _queues.get(project)
+        if queue is None:
+            queue = _queues[project] = JobQueue(project)
+    return queue
+
+def cancel_all():
+    """
+    Cancel the running and queued jobs of all projects
+    """
+    with _lock:
+        queues = list(_queues.values())
+    for queue in queues:
+        queue.cancel(pending=True)
+
+def current():
+    """
+    Return the job running in the current thread, if any
+    """
+    return getattr(_local, "job", None)
+
+
+class Job(object):
+    """
+    A queued or running call of `target(*args)`
+
+    Attributes:
+        key (tuple): Jobs with equal keys are merged while queued
+        target (callable): The function to run
+        args (tuple): The arguments of `target`
+        mutating (bool): Whether the job changes the packages of the project
+        merged (int): How many submissions were merged into this job
+        cancelled (bool): Whether the job was cancelled
+        started (float): Monotonic time the job started running at
+        cpu_time (float): CPU seconds used by the job's finished subprocesses
+        max_rss (int): Peak resident memory of these subprocesses in bytes
+    """
+
+    def __init__(self, key, target, args=(), mutating=True):
+        self.key = key
+        self.target = target
+        self.args = args
+        self.mutating = mutating
+        self.merged = 0
+        self.cancelled = False
+        self.started = None
+        self.cpu_time = 0.0
+        self.max_rss = 0
+        self._pids = set()
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    def is_alive(self):
+        return not self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def attach(self, pid):
+        """
+        Register a subprocess, which is killed if the job is cancelled
+        """
+        with self._lock:
+            if not self.cancelled:
+                self._pids.add(pid)
+                return
+        process.kill_tree(pid)
+
+    def detach(self, pid):
+        with self._lock:
+            self._pids.discard(pid)
+
+    def add_usage(self, usage):
+        """
+        Account the `process.Usage` of a finished subprocess
+        """
+        with self._lock:
+            self.cpu_time += usage.cpu_time
+            self.max_rss = max(self.max_rss, usage.max_rss)
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            pids = list(self._pids)
+            self._pids.clear()
+        for pid in pids:
+            process.kill_tree(pid)
+
+
+class JobQueue(object):
+    """
+    Jobs of a single project
+
+    Attributes:
+        project (str): The project directory
+    """
+
+    def __init__(self, project):
+        self.project = project
+        self._pending = collections.deque()
+        self._running = []
+        self._active = None
+        self._lock = threading.Lock()
+
+    def submit(self, target, args=(), mutating=True, key=None):
+        """
+        Queue `target(*args)` and return its `Job`
+
+        If an equal job is queued, or an equal read-only job is running,
+        that job is returned instead and its `merged` count increased.
+        """
+        if key is None:
+            key = (getattr(target, "__qualname__", repr(target)), repr(args))
+
+        with self._lock:
+            candidates = list(self._pending)
+            if not mutating:
+                candidates += [job for job in self._running if not job.mutating]
+            for job in candidates:
+                if job.key == key and job.mutating == mutating:
+                    job.merged += 1
+                    return job
+
+            job = Job(key, target, tuple(args), mutating)
+            if not mutating:
+                self._start(job)
+            else:
+                self._pending.append(job)
+                if self._active is None:
+                    self._start(self._pending.popleft())
+        return job
+
+    def depth(self):
+        """
+        Return the number of queued jobs which did not start yet
+        """
+        with self._lock:
+            return len(self._pending)
+
+    def active(self):
+        """
+        Return the running mutating job, if any
+        """
+        with self._lock:
+            return self._active
+
+    def cancel(self, pending=False):
+        """
+        Cancel the running jobs, and the queued ones if `pending` is set
+        """
+        with self._lock:
+            cancelled = list(self._running)
+            if pending:
+                for job in self._pending:
+                    job.cancelled = True
+                    job._done.set()
+                self._pending.clear()
+        for job in cancelled:
+            job.cancel()
+        return cancelled
+
+    def _start(self, job):
+        self._running.append(job)
+        if job.mutating:
+            self._active = job
+        thread = threading.Thread(target=self._run, args=[job])
+        thread.daemon = True
+        thread.start()
+
+    def _run(self, job):
+        _local.job = job
+        job.started = time.monotonic()
+        try:
+            job.target(*job.args)
+        finally:
+            _local.job = None
+            with self._lock:
+                self._running.remove(job)
+                if job.mutating:
+                    self._active = None
+                    if self._pending:
+                        self._start(self._pending.popleft())
+            job._done.set()
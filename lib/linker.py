@@ -0,0 +1,170 @@
+# encoding: utf-8
+
+"""
+Link-based installs from a shared store of unpacked wheels
+
+Every wheel is unpacked once into the store, keyed by its sha256 so that
+a wheel rebuilt under the same name is unpacked again. Installing it into
+a project then only creates links to the stored files: reflinks where the
+filesystem supports copy-on-write clones, otherwise hardlinks, and plain
+copies as a fallback. Files in a lib directory are always replaced by
+unlinking them first, so a shared inode is never written through.
+"""
+
+import errno
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+from . import wheel
+from .wheel_cache import sha256
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import ctypes
+    import ctypes.util
+except ImportError:
+    ctypes = None
+
+
+# ioctl request of FICLONE from <linux/fs.h>
+FICLONE = 0x40049409
+
+LINK_MODES = ("auto", "reflink", "hardlink", "copy")
+
+_lock = threading.Lock()
+_clonefile = None
+_digests = {}
+
+
+def _macos_clonefile():
+    global _clonefile
+    if _clonefile is None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        _clonefile = libc.clonefile
+        _clonefile.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int]
+    return _clonefile
+
+def reflink(source, dest):
+    if sys.platform.startswith("linux") and fcntl:
+        with open(source, "rb") as src, open(dest, "wb") as dst:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            except (IOError, OSError):
+                dst.close()
+                os.unlink(dest)
+                raise
+        shutil.copystat(source, dest)
+    elif sys.platform == "darwin" and ctypes:
+        if _macos_clonefile()(os.fsencode(source), os.fsencode(dest), 0):
+            raise OSError(ctypes.get_errno(), "clonefile failed", dest)
+    else:
+        raise OSError(errno.ENOTSUP, "Reflinks are not supported", dest)
+
+def link_file(source, dest, mode="auto"):
+    """
+    Materialize `source` at `dest` and return the method that was used
+    """
+    if os.path.lexists(dest):
+        os.unlink(dest)
+
+    methods = {
+        "auto": ("reflink", "hardlink"),
+        "reflink": ("reflink",),
+        "hardlink": ("hardlink",),
+    }.get(mode, ())
+
+    for method in methods:
+        try:
+            if method == "reflink":
+                reflink(source, dest)
+            else:
+                os.link(source, dest)
+            return method
+        except (IOError, OSError, AttributeError):
+            continue
+
+    shutil.copy2(source, dest)
+    return "copy"
+
+
+class UnpackedStore(object):
+    """
+    Wheels unpacked once and linked into any number of lib directories
+
+    Attributes:
+        path (str): Directory containing the unpacked wheels
+        mode (str): One of `LINK_MODES`
+    """
+
+    def __init__(self, path, mode="auto"):
+        self.path = path
+        self.mode = mode
+
+    @staticmethod
+    def _digest(wheel_path):
+        # A wheel rebuilt under the same name must not reuse the old entry
+        stat = os.stat(wheel_path)
+        key = (os.path.abspath(wheel_path), stat.st_mtime, stat.st_size)
+        with _lock:
+            digest = _digests.get(key)
+        if digest is None:
+            digest = sha256(wheel_path)
+            with _lock:
+                _digests[key] = digest
+        return digest
+
+    def _entry(self, wheel_path, python):
+        # Script shebangs depend on the interpreter, so it is part of the key
+        digest = hashlib.sha1(python.encode("utf-8")).hexdigest()[:8]
+        name = os.path.basename(wheel_path)[:-len(".whl")]
+        return os.path.join(self.path, "{}-{}-{}".format(
+            name, self._digest(wheel_path)[:16], digest
+        ))
+
+    def unpacked(self, wheel_path, python):
+        """
+        Return the store directory of `wheel_path`, unpacking it if needed
+        """
+        entry = self._entry(wheel_path, python)
+        if os.path.isdir(entry):
+            return entry
+
+        os.makedirs(self.path, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=".unpack-", dir=self.path)
+        try:
+            wheel.unpack(wheel_path, tmp_dir, python)
+            with _lock:
+                try:
+                    os.rename(tmp_dir, entry)
+                except OSError:
+                    # Another process unpacked the same wheel meanwhile
+                    if not os.path.isdir(entry):
+                        raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return entry
+
+    def materialize(self, wheel_path, target, python="python"):
+        """
+        Link the files of `wheel_path` into `target` and return their paths
+        """
+        source = self.unpacked(wheel_path, python)
+
+        installed = []
+        for root, _, files in os.walk(source):
+            for name in files:
+                path = os.path.join(root, name)
+                relpath = os.path.relpath(path, source)
+                dest = os.path.join(target, relpath)
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                link_file(path, dest, self.mode)
+                installed.append(relpath.replace(os.sep, "/"))
+        return installed
@@ -0,0 +1,139 @@
+# encoding: utf-8
+
+"""
+Lock files of the exact set of installed distributions
+
+Besides name and version, every locked package records the wheel it was
+installed from, the sha256 of that wheel and its requirements with their
+markers. The sha256 is only known for wheels in the wheel cache; packages
+locked without it are not hash-pinned. Installing from a lock file needs no
+resolver: only the listed wheels which are not installed yet are fetched,
+checked against their sha256 and unpacked or linked.
+"""
+
+import json
+import os
+import re
+
+from . import metadata
+from .installer import canonical_name
+
+
+LOCK_FILENAME = "pypackages.lock"
+LOCK_VERSION = 1
+
+REQUIREMENT = re.compile(
+    r"^\s*(?P<name>[A-Za-z0-9][A-Za-z0-9._-]*)\s*(?P<extras>\[[^\]]*\])?"
+    r"\s*\(?(?P<specifier>[^;()]*)\)?\s*(;\s*(?P<marker>.*))?$"
+)
+
+
+class LockError(Exception):
+    pass
+
+
+def parse_requirement(requirement):
+    """
+    Return a dict with name, extras, specifier and marker of a requirement
+    """
+    match = REQUIREMENT.match(requirement)
+    if not match:
+        raise LockError("Invalid requirement: {}".format(requirement))
+    extras = (match.group("extras") or "[]")[1:-1]
+    return {
+        "name": canonical_name(match.group("name")),
+        "extras": [extra.strip() for extra in extras.split(",") if extra.strip()],
+        "specifier": match.group("specifier").replace(" ", "") or None,
+        "marker": (match.group("marker") or "").strip() or None,
+    }
+
+def wheel_filename(lib_path, entry):
+    """
+    Return the filename of the wheel a `.dist-info` entry was installed from
+    """
+    if metadata.metadata_ext(entry) != ".dist-info":
+        return None
+
+    tags = metadata.read_headers(os.path.join(lib_path, entry, "WHEEL"), "Tag")
+    if not tags:
+        return None
+
+    parts = [[], [], []]
+    for tag in tags:
+        for values, value in zip(parts, tag.split("-")):
+            if value not in values:
+                values.append(value)
+
+    name, version = entry[:-len(".dist-info")].split("-", 1)
+    return "{}-{}-{}.whl".format(
+        name, version, "-".join(".".join(values) for values in parts)
+    )
+
+def create(lib_path, dists, python=None, cache=None):
+    """
+    Return the lock of the distributions `dists` installed in `lib_path`
+
+    Args:
+        dists (list): Distributions as returned by `Inventory.refresh`
+        python (str): The Python version the distributions were built for
+        cache (WheelCache): Used to look up the sha256 of the wheels
+    """
+    packages = []
+    for dist in dists:
+        filename = wheel_filename(lib_path, dist.entry)
+        packages.append({
+            "name": canonical_name(dist.project_name),
+            "version": dist.version,
+            "wheel": filename,
+            "sha256": cache.digest(filename) if cache and filename else None,
+            "dependencies": [
+                parse_requirement(requirement)
+                for requirement in metadata.requires(lib_path, dist.entry)
+            ],
+        })
+
+    return {"version": LOCK_VERSION, "python": python, "packages": packages}
+
+def save(lock, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as output:
+        json.dump(lock, output, indent=2, sort_keys=True)
+        output.write("\n")
+    os.replace(tmp_path, path)
+
+def load(path):
+    try:
+        with open(path) as stream:
+            lock = json.load(stream)
+    except (OSError, IOError, ValueError) as error:
+        raise LockError("Could not read {}: {}".format(path, error))
+
+    if not isinstance(lock, dict) or lock.get("version") != LOCK_VERSION:
+        raise LockError("Unsupported lock file format: {}".format(path))
+    return lock
+
+def missing(lock, dists):
+    """
+    Return the locked packages which are not installed in their version
+    """
+    installed = dict(
+        (canonical_name(dist.project_name), dist.version) for dist in dists
+    )
+    return [
+        package for package in lock["packages"]
+        if installed.get(package["name"]) != package["version"]
+    ]
+
+def top_level(lock):
+    """
+    Return the names of the locked packages no other locked package requires
+    """
+    required = set(
+        dependency["name"]
+        for package in lock["packages"]
+        for dependency in package.get("dependencies", [])
+        if dependency["name"] != package["name"]
+    )
+    return [
+        package["name"] for package in lock["packages"] if package["name"] not in required
+    ]
@@ -0,0 +1,281 @@
+# encoding: utf-8
+
+"""
+Environment marker and version specifier evaluation
+
+A small evaluator for the markers of `Requires-Dist` headers, used instead
+of `pkg_resources.evaluate_marker`, which depends on modules that current
+Python versions no longer ship. Markers are evaluated against the
+environment reported by the interpreter probe, not the one Sublime Text
+runs in. Version specifiers (`>=1.0,<2`, `~=1.4`, `==1.0.*`) are checked
+with the same PEP 440 comparisons, which the bundled `pkg_resources` does
+not fully support. Parsed markers and specifiers are cached.
+
+The environment is built by `ENVIRONMENT_SCRIPT`, which the probe runs in
+the configured interpreter, and which `default_environment` runs in this
+one.
+"""
+
+import re
+import threading
+
+from .metadata import parse_version
+
+
+TOKEN = re.compile(r"""
+    \s*(
+        \(|\)|"[^"]*"|'[^']*'|===|==|!=|<=|>=|~=|<|>
+        |not\s+in\b|in\b|and\b|or\b
+        |[A-Za-z_][A-Za-z0-9_.]*
+    )
+""", re.VERBOSE)
+
+OPERATORS = ("===", "==", "!=", "<=", ">=", "~=", "<", ">", "in", "not in")
+
+VERSION = re.compile(r"^\d+(\.\d+)*(\.\*)?$")
+
+RELEASE = re.compile(r"^\s*v?(?:\d+!)?(\d+(?:\.\d+)*)")
+
+CLAUSE = re.compile(r"^\s*(===|==|!=|<=|>=|~=|<|>)\s*([^\s,]+)\s*$")
+
+ENVIRONMENT_SCRIPT = """
+import os, platform, sys
+def marker_environment():
+    implementation = getattr(sys, "implementation", None)
+    if implementation:
+        info = implementation.version
+        implementation_version = "{}.{}.{}".format(*info[:3])
+        if info[3] != "final":
+            implementation_version += info[3][0] + str(info[4])
+    return {
+        "implementation_name": implementation.name if implementation
+            else platform.python_implementation().lower(),
+        "implementation_version": implementation_version if implementation else "0",
+        "os_name": os.name,
+        "platform_machine": platform.machine(),
+        "platform_python_implementation": platform.python_implementation(),
+        "platform_release": platform.release(),
+        "platform_system": platform.system(),
+        "platform_version": platform.version(),
+        "python_full_version": platform.python_version(),
+        "python_version": "{}.{}".format(*sys.version_info[:2]),
+        "sys_platform": sys.platform,
+    }
+"""
+
+_script = {}
+exec(ENVIRONMENT_SCRIPT, _script)
+
+_parsed = {}
+_specifiers = {}
+_lock = threading.Lock()
+
+
+class MarkerError(ValueError):
+    pass
+
+
+def _tokenize(marker):
+    tokens, position = [], 0
+    marker = marker.rstrip()
+    while position < len(marker):
+        match = TOKEN.match(marker, position)
+        if not match:
+            raise MarkerError("Invalid marker: {}".format(marker))
+        tokens.append(re.sub(r"\s+", " ", match.group(1)))
+        position = match.end()
+    return tokens
+
+
+class _Parser(object):
+
+    def __init__(self, marker):
+        self.marker = marker
+        self.tokens = _tokenize(marker)
+        self.position = 0
+
+    def _peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def _next(self):
+        token = self._peek()
+        if token is None:
+            raise MarkerError("Unexpected end of marker: {}".format(self.marker))
+        self.position += 1
+        return token
+
+    def parse(self):
+        tree = self._or()
+        if self._peek() is not None:
+            raise MarkerError("Unexpected {!r} in marker: {}".format(self._peek(), self.marker))
+        return tree
+
+    def _or(self):
+        tree = self._and()
+        while self._peek() == "or":
+            self._next()
+            tree = ("or", tree, self._and())
+        return tree
+
+    def _and(self):
+        tree = self._atom()
+        while self._peek() == "and":
+            self._next()
+            tree = ("and", tree, self._atom())
+        return tree
+
+    def _atom(self):
+        if self._peek() == "(":
+            self._next()
+            tree = self._or()
+            if self._next() != ")":
+                raise MarkerError("Unbalanced parentheses in marker: {}".format(self.marker))
+            return tree
+
+        lhs, op, rhs = self._value(), self._next(), self._value()
+        if op not in OPERATORS:
+            raise MarkerError("Invalid operator {!r} in marker: {}".format(op, self.marker))
+        return ("compare", lhs, op, rhs)
+
+    def _value(self):
+        token = self._next()
+        if token[0] in "\"'":
+            return ("literal", token[1:-1])
+        if token in ("(", ")", "and", "or") or token in OPERATORS:
+            raise MarkerError("Unexpected {!r} in marker: {}".format(token, self.marker))
+        return ("variable", token)
+
+
+def parse(marker):
+    """
+    Return the parsed form of `marker`, raising `MarkerError` if invalid
+    """
+    with _lock:
+        tree = _parsed.get(marker)
+    if tree is None:
+        tree = _Parser(marker).parse()
+        with _lock:
+            _parsed[marker] = tree
+    return tree
+
+def _release(version):
+    match = RELEASE.match(version)
+    return [int(part) for part in match.group(1).split(".")] if match else []
+
+def _has_prefix(version, prefix):
+    release = _release(version)
+    release += [0] * (len(prefix) - len(release))
+    return release[:len(prefix)] == prefix
+
+def _compare_versions(lhs, op, rhs):
+    if rhs.endswith(".*"):
+        matches = _has_prefix(lhs, _release(rhs[:-2]))
+        if op in ("==", "!="):
+            return matches == (op == "==")
+        return None
+    if op == "~=":
+        return (
+            _has_prefix(lhs, _release(rhs)[:-1])
+            and parse_version(lhs) >= parse_version(rhs)
+        )
+
+    lhs, rhs = parse_version(lhs), parse_version(rhs)
+    return {
+        "==": lhs == rhs, "!=": lhs != rhs,
+        "<": lhs < rhs, "<=": lhs <= rhs,
+        ">": lhs > rhs, ">=": lhs >= rhs,
+    }.get(op)
+
+def _compare(lhs, op, rhs):
+    if op == "in":
+        return lhs in rhs
+    if op == "not in":
+        return lhs not in rhs
+    if op == "===":
+        return lhs == rhs
+    if VERSION.match(lhs) and VERSION.match(rhs):
+        result = _compare_versions(lhs, op, rhs)
+        if result is not None:
+            return result
+    return {
+        "==": lhs == rhs, "!=": lhs != rhs,
+        "<": lhs < rhs, "<=": lhs <= rhs,
+        ">": lhs > rhs, ">=": lhs >= rhs,
+    }.get(op, False)
+
+def _value(node, environment):
+    kind, value = node
+    if kind == "literal":
+        return value
+    if value not in environment:
+        raise MarkerError("Unknown marker variable: {}".format(value))
+    return environment[value]
+
+def _evaluate(tree, environment):
+    if tree[0] == "or":
+        return _evaluate(tree[1], environment) or _evaluate(tree[2], environment)
+    if tree[0] == "and":
+        return _evaluate(tree[1], environment) and _evaluate(tree[2], environment)
+
+    _, lhs, op, rhs = tree
+    lhs, rhs = _value(lhs, environment), _value(rhs, environment)
+    if ("variable", "extra") in (tree[1], tree[3]):
+        lhs, rhs = [re.sub(r"[-_.]+", "-", value).lower() for value in (lhs, rhs)]
+    return _compare(lhs, op, rhs)
+
+def parse_specifier(specifier):
+    """
+    Return the `(operator, version)` clauses of a version specifier
+
+    Raises `MarkerError` if the specifier is not valid PEP 440.
+    """
+    with _lock:
+        clauses = _specifiers.get(specifier)
+    if clauses is None:
+        clauses = []
+        for clause in specifier.split(","):
+            match = CLAUSE.match(clause)
+            if not match:
+                raise MarkerError("Invalid specifier: {}".format(specifier))
+            op, version = match.groups()
+            wildcard = version.endswith(".*")
+            if op != "===" and (
+                not RELEASE.match(version)
+                or (wildcard and op not in ("==", "!="))
+                or (op == "~=" and len(_release(version)) < 2)
+            ):
+                raise MarkerError("Invalid specifier: {}".format(specifier))
+            clauses.append((op, version))
+        with _lock:
+            _specifiers[specifier] = clauses
+    return clauses
+
+def version_matches(version, specifier):
+    """
+    Return whether `version` is matched by the version `specifier`
+
+    Pre-releases match like any other version, as for installed packages.
+    """
+    for op, rhs in parse_specifier(specifier):
+        if op == "===":
+            matches = version == rhs
+        else:
+            matches = _compare_versions(version, op, rhs)
+        if not matches:
+            return False
+    return True
+
+def default_environment():
+    """
+    Return the marker environment of the running interpreter
+    """
+    return _script["marker_environment"]()
+
+def evaluate(marker, environment, extra=""):
+    """
+    Evaluate `marker` against the marker `environment` of an interpreter
+    """
+    environment = dict(environment, extra=extra or "")
+    return _evaluate(parse(marker), environment)
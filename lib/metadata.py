@@ -0,0 +1,245 @@
+# encoding: utf-8
+
+"""
+Lightweight distribution metadata reader
+
+Reads name and version of installed distributions the same way
+`pkg_resources.find_on_path` does, without importing `pkg_resources` and
+building its master working set, and compares versions with the same
+`parse_version`. Features that need the full API should call
+`load_pkg_resources()`.
+
+Metadata files are only read up to the end of their header block, so long
+descriptions are never loaded.
+"""
+
+import functools
+import os
+import re
+import sys
+
+
+EGG_NAME = re.compile(
+    r"(?P<name>[^-]+)"
+    r"( -(?P<ver>[^-]+) (-py(?P<pyver>[^-]+) (-(?P<plat>.+))? )? )?",
+    re.VERBOSE | re.IGNORECASE
+).match
+
+METADATA_FILES = {
+    ".dist-info": "METADATA",
+    ".egg-info": "PKG-INFO",
+}
+
+HEADER_FIELDS = ("name", "version", "requires-dist", "provides-extra", "requires-python")
+
+VERSION_COMPONENT = re.compile(r"(\d+ | [a-z]+ | \.| -)", re.VERBOSE)
+VERSION_REPLACE = {"pre": "c", "preview": "c", "-": "final-", "rc": "c", "dev": "@"}
+
+# Upper bound of the header block, the description follows it
+MAX_HEADER_SIZE = 256 * 1024
+
+
+def load_pkg_resources():
+    from . import pkg_resources
+    return pkg_resources
+
+@functools.lru_cache(maxsize=4096)
+def safe_name(name):
+    return re.sub("[^A-Za-z0-9.]+", "-", name)
+
+@functools.lru_cache(maxsize=4096)
+def safe_version(version):
+    return re.sub("[^A-Za-z0-9.]+", "-", version.replace(" ", "."))
+
+@functools.lru_cache(maxsize=4096)
+def _parse_version_parts(version):
+    parts = []
+    for part in VERSION_COMPONENT.split(version):
+        part = VERSION_REPLACE.get(part, part)
+        if not part or part == ".":
+            continue
+        if part[:1] in "0123456789":
+            # Pad for numeric comparison
+            parts.append(part.zfill(8))
+        else:
+            parts.append("*" + part)
+
+    # Pre-releases sort before the final release
+    parts.append("*final")
+    return tuple(parts)
+
+@functools.lru_cache(maxsize=4096)
+def parse_version(version):
+    """
+    Return a chronologically sortable key of `version`
+
+    This is the legacy `pkg_resources.parse_version`, which the vendored
+    `pkg_resources` re-exports: numeric parts are padded, trailing zeros
+    dropped (`2.4.0 == 2.4`), and `pre`, `preview` and `rc` sort as `c`,
+    before the final release, with `dev` before any other pre-release.
+    """
+    parts = []
+    for part in _parse_version_parts(version.lower()):
+        if part.startswith("*"):
+            # Remove "-" before a pre-release tag
+            if part < "*final":
+                while parts and parts[-1] == "*final-":
+                    parts.pop()
+            # Remove trailing zeros from each series of numeric parts
+            while parts and parts[-1] == "00000000":
+                parts.pop()
+        parts.append(part)
+    return tuple(parts)
+
+MEMOIZED = (safe_name, safe_version, _parse_version_parts, parse_version)
+
+def clear_caches():
+    for function in MEMOIZED:
+        function.cache_clear()
+
+def cache_stats():
+    """
+    Return the `CacheInfo` of the memoized parsers by name
+
+    `pkg_resources` is only included once something has imported it.
+    """
+    stats = dict((function.__name__, function.cache_info()) for function in MEMOIZED)
+    pkg_resources = sys.modules.get(__name__.rsplit(".", 1)[0] + ".pkg_resources")
+    if pkg_resources is not None:
+        stats.update(
+            ("pkg_resources." + name, info)
+            for name, info in pkg_resources.cache_stats().items()
+        )
+    return stats
+
+def metadata_ext(entry):
+    lower = entry.lower()
+    for ext in METADATA_FILES:
+        if lower.endswith(ext):
+            return ext
+    return None
+
+def metadata_path(path, ext):
+    """
+    Return the file holding the headers of the metadata entry `path`
+    """
+    if os.path.isdir(path):
+        return os.path.join(path, METADATA_FILES[ext])
+    return path
+
+def parse_headers(lines, fields=None):
+    """
+    Return the values of the header block of `lines` by lowercase field name
+
+    Parsing stops at the first blank line. Only `fields` are collected if
+    given, and folded continuation lines are joined to their field.
+    """
+    headers = {}
+    values = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            break
+        if line[0] in " \t":
+            if values:
+                values[-1] += " " + line.strip()
+            continue
+
+        name, _, value = line.partition(":")
+        name = name.strip().lower()
+        if fields is None or name in fields:
+            values = headers.setdefault(name, [])
+            values.append(value.strip())
+        else:
+            values = None
+    return headers
+
+def _header_lines(metadata):
+    size = 0
+    for line in metadata:
+        size += len(line)
+        if size > MAX_HEADER_SIZE:
+            return
+        yield line.decode("utf-8", "replace")
+
+def read_metadata(path, fields=None):
+    """
+    Return the header block of a metadata file, see `parse_headers`
+    """
+    try:
+        with open(path, "rb", buffering=8192) as metadata:
+            return parse_headers(_header_lines(metadata), fields)
+    except (OSError, IOError):
+        return {}
+
+def read_headers(path, name):
+    """
+    Return all values of the header `name` of a metadata file
+    """
+    return read_metadata(path, (name.lower(),)).get(name.lower(), [])
+
+def read_header(path, name):
+    values = read_headers(path, name)
+    return values[0] if values else None
+
+def _egg_requires(path):
+    requires, marker = [], None
+    try:
+        with open(path, encoding="utf-8", errors="replace") as stream:
+            lines = stream.read().splitlines()
+    except (OSError, IOError):
+        return requires
+
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("["):
+            extra, _, condition = line.strip("[]").partition(":")
+            markers = []
+            if condition:
+                markers.append("({})".format(condition) if extra else condition)
+            if extra:
+                markers.append('extra == "{}"'.format(extra))
+            marker = " and ".join(markers) or None
+            continue
+        requires.append("{}; {}".format(line, marker) if marker else line)
+    return requires
+
+def requires(lib_path, entry):
+    """
+    Return the requirements of a metadata entry, including their markers
+    """
+    path = os.path.join(lib_path, entry)
+    ext = metadata_ext(entry)
+    if ext == ".egg-info":
+        if os.path.isdir(path):
+            return _egg_requires(os.path.join(path, "requires.txt"))
+        return []
+    return read_headers(metadata_path(path, ext), "Requires-Dist")
+
+def read(lib_path, entry):
+    """
+    Return project name, version and Python version of a metadata entry
+
+    Args:
+        lib_path (str): The directory containing the entry
+        entry (str): The `.dist-info`/`.egg-info` file or directory name
+    """
+    basename, ext = os.path.splitext(entry)
+    ext = ext.lower()
+
+    project_name, version, py_version = None, None, None
+    match = EGG_NAME(basename)
+    if match:
+        project_name, version, py_version = match.group("name", "ver", "pyver")
+
+    if version is None:
+        path = metadata_path(os.path.join(lib_path, entry), ext)
+        version = read_header(path, "Version")
+
+    return {
+        "project_name": safe_name(project_name or "Unknown"),
+        "version": safe_version(version) if version is not None else None,
+        "py_version": py_version,
+    }
@@ -0,0 +1,110 @@
+# encoding: utf-8
+
+"""
+Performance spans
+
+The phases of a command (interpreter probe, path resolution, subprocess
+spawn, pip runtime, metadata scan, quick panel display) are timed with a
+monotonic clock. The most recent spans are kept in a ring buffer, from
+which per-phase percentiles are computed or a JSON lines trace is written.
+"""
+
+import collections
+import contextlib
+import json
+import math
+import threading
+import time
+
+
+CAPACITY = 4096
+
+Span = collections.namedtuple("Span", ["phase", "timestamp", "duration", "detail"])
+
+Summary = collections.namedtuple(
+    "Summary", ["phase", "count", "p50", "p90", "p99", "max", "total"]
+)
+
+_spans = collections.deque(maxlen=CAPACITY)
+_lock = threading.Lock()
+
+
+def record(phase, started, detail=None):
+    """
+    Record a span of `phase` which started at the monotonic time `started`
+    """
+    duration = time.monotonic() - started
+    with _lock:
+        _spans.append(Span(phase, time.time() - duration, duration, detail))
+    return duration
+
+@contextlib.contextmanager
+def span(phase, detail=None):
+    """
+    Record the duration of the `with` block as a span of `phase`
+    """
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        record(phase, started, detail)
+
+def spans():
+    with _lock:
+        return list(_spans)
+
+def clear():
+    with _lock:
+        _spans.clear()
+
+def percentile(values, fraction):
+    """
+    Return the nearest-rank percentile of the sorted `values`
+    """
+    if not values:
+        return None
+    index = int(math.ceil(fraction * len(values))) - 1
+    return values[max(0, min(len(values) - 1, index))]
+
+def summary():
+    """
+    Return a `Summary` of the recorded durations of every phase
+    """
+    durations = collections.defaultdict(list)
+    for recorded in spans():
+        durations[recorded.phase].append(recorded.duration)
+
+    summaries = []
+    for phase, values in sorted(durations.items()):
+        values.sort()
+        summaries.append(Summary(
+            phase, len(values),
+            percentile(values, 0.5), percentile(values, 0.9), percentile(values, 0.99),
+            values[-1], sum(values),
+        ))
+    return summaries
+
+def report():
+    """
+    Return the summary as a text table with milliseconds
+    """
+    lines = ["{:<12} {:>6} {:>10} {:>10} {:>10} {:>10} {:>10}".format(
+        "Phase", "Count", "p50 ms", "p90 ms", "p99 ms", "max ms", "total s"
+    )]
+    for phase in summary():
+        lines.append("{:<12} {:>6} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.2f}".format(
+            phase.phase, phase.count,
+            phase.p50 * 1000, phase.p90 * 1000, phase.p99 * 1000, phase.max * 1000,
+            phase.total,
+        ))
+    return "\n".join(lines) + "\n"
+
+def export(path):
+    """
+    Write the recorded spans to `path` as JSON lines and return their number
+    """
+    recorded = spans()
+    with open(path, "w") as trace:
+        for item in recorded:
+            trace.write(json.dumps(item._asdict(), sort_keys=True) + "\n")
+    return len(recorded)
@@ -0,0 +1,431 @@
+# encoding: utf-8
+
+"""
+Long-lived pip worker processes
+
+Workers are kept per interpreter and import pip's internals up front. A
+pip run takes an idle worker or starts a new one, so concurrent runs (like
+the builds of the parallel installer) each get a worker of their own, up to
+the size of the pool. Workers beyond the first are stopped once they have
+been idle for a while. Requests are sent as JSON lines over its stdin. On
+POSIX the worker forks a fresh child for every request, so each pip run
+starts with pip already imported but with clean global state. Elsewhere pip
+runs inside the worker itself. Output is streamed back line by line.
+"""
+
+import collections
+import json
+import os
+import subprocess
+import threading
+import time
+
+from . import perf
+from . import process
+
+
+WORKER_SOURCE = r'''
+import json, os, select, shutil, subprocess, sys, traceback
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    from pip._internal.cli.main import main as pip_main
+except ImportError:
+    try:
+        from pip._internal import main as pip_main
+    except ImportError:
+        from pip import main as pip_main
+
+protocol = sys.stdout
+
+def send(message):
+    protocol.write(json.dumps(message) + "\n")
+    protocol.flush()
+
+def prepare(request):
+    if request.get("cwd"):
+        os.chdir(request["cwd"])
+    if request.get("env") is not None:
+        os.environ.clear()
+        os.environ.update(request["env"])
+        pythonpath = request["env"].get("PYTHONPATH", "")
+        sys.path[:0] = [path for path in pythonpath.split(os.pathsep) if path]
+
+def apply_limits(limits):
+    if limits.get("nice", 0) > 0:
+        os.nice(limits["nice"])
+    if limits.get("memory") and resource is not None and sys.platform.startswith("linux"):
+        resource.setrlimit(resource.RLIMIT_AS, (limits["memory"], limits["memory"]))
+    if limits.get("ionice") and shutil.which("ionice"):
+        subprocess.call(
+            ["ionice", "-c", "2", "-n", "7", "-p", str(os.getpid())],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+
+def call_pip(args):
+    try:
+        code = pip_main(args)
+    except SystemExit as error:
+        code = error.code
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    if code is None:
+        return 0
+    return code if isinstance(code, int) else 1
+
+def run_forked(request):
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    protocol.flush()
+    pid = os.fork()
+    if pid == 0:
+        # A session of its own lets cancelling kill the whole pip run
+        os.setsid()
+        os.close(out_r)
+        os.close(err_r)
+        os.dup2(os.open(os.devnull, os.O_RDONLY), 0)
+        os.dup2(out_w, 1)
+        os.dup2(err_w, 2)
+        apply_limits(request.get("limits") or {})
+        prepare(request)
+        code = call_pip(request["args"])
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+    os.close(out_w)
+    os.close(err_w)
+    send({"pid": pid})
+    streams = {out_r: ["stdout", b""], err_r: ["stderr", b""]}
+    while streams:
+        ready = select.select(list(streams), [], [])[0]
+        for fd in ready:
+            data = os.read(fd, 65536)
+            name, buf = streams[fd]
+            lines = (buf + data).split(b"\n")
+            if not data:
+                if buf:
+                    send({"stream": name, "line": buf.decode("utf-8", "replace")})
+                os.close(fd)
+                del streams[fd]
+                continue
+            for line in lines[:-1]:
+                send({"stream": name, "line": line.decode("utf-8", "replace")})
+            streams[fd][1] = lines[-1]
+
+    _, status, rusage = os.wait4(pid, 0)
+    if os.WIFSIGNALED(status):
+        code = -os.WTERMSIG(status)
+    else:
+        code = os.WEXITSTATUS(status)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    scale = 1 if sys.platform == "darwin" else 1024
+    send({
+        "returncode": code,
+        "usage": [rusage.ru_utime + rusage.ru_stime, rusage.ru_maxrss * scale],
+    })
+
+class LineWriter(object):
+    encoding = "utf-8"
+
+    def __init__(self, name):
+        self.name = name
+        self.buffer = ""
+
+    def write(self, text):
+        lines = (self.buffer + text).split("\n")
+        for line in lines[:-1]:
+            send({"stream": self.name, "line": line})
+        self.buffer = lines[-1]
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+def run_inline(request):
+    cwd, env, path = os.getcwd(), dict(os.environ), list(sys.path)
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = LineWriter("stdout"), LineWriter("stderr")
+    try:
+        prepare(request)
+        code = call_pip(request["args"])
+    finally:
+        for writer in (sys.stdout, sys.stderr):
+            if writer.buffer:
+                writer.write("\n")
+        sys.stdout, sys.stderr = stdout, stderr
+        os.chdir(cwd)
+        os.environ.clear()
+        os.environ.update(env)
+        sys.path[:] = path
+    send({"returncode": code})
+
+send({"ready": True})
+for line in iter(sys.stdin.readline, ""):
+    request = json.loads(line)
+    if hasattr(os, "fork"):
+        run_forked(request)
+    else:
+        run_inline(request)
+'''
+
+IDLE_TIMEOUT = 300
+
+_workers = {}
+_lock = threading.Lock()
+
+
+class WorkerError(Exception):
+    pass
+
+
+def get(python, size=1):
+    """
+    Return the `WorkerPool` of the interpreter `python`
+
+    The pool runs at most `size` workers at a time.
+    """
+    with _lock:
+        pool = _workers.get(python)
+        if pool is None:
+            pool = _workers[python] = WorkerPool(python)
+        pool.size = max(1, size)
+    return pool
+
+def shutdown():
+    with _lock:
+        pools = list(_workers.values())
+        _workers.clear()
+    for pool in pools:
+        pool.close()
+
+
+class WorkerPool(object):
+    """
+    The pip workers of one interpreter
+
+    Attributes:
+        python (str): The interpreter running the workers
+        size (int): Maximum number of workers, further runs wait for one
+        idle_timeout (float): Seconds after which idle workers beyond the
+            most recently used one are stopped
+    """
+
+    def __init__(self, python, size=1, idle_timeout=IDLE_TIMEOUT):
+        self.python = python
+        self.size = max(1, size)
+        self.idle_timeout = idle_timeout
+        self._idle = []
+        self._count = 0
+        self._closed = False
+        self._reaper = None
+        self._lock = threading.Condition()
+
+    def _acquire(self):
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise WorkerError("pip workers of {} were shut down".format(self.python))
+                if self._idle:
+                    return self._idle.pop()
+                if self._count < self.size:
+                    self._count += 1
+                    break
+                self._lock.wait()
+        return PipWorker(self.python)
+
+    def _release(self, worker):
+        # Checked under the same lock as in `close`, so a worker which
+        # finishes while the pool is closed is never left running
+        with self._lock:
+            if not self._closed:
+                worker.idle_since = time.monotonic()
+                self._idle.append(worker)
+                self._lock.notify()
+                self._schedule_reap()
+                return
+            self._count -= 1
+        worker.close()
+
+    def _schedule_reap(self):
+        if self._reaper is None and len(self._idle) > 1:
+            self._reaper = threading.Timer(self.idle_timeout, self._reap)
+            self._reaper.daemon = True
+            self._reaper.start()
+
+    def _reap(self):
+        now = time.monotonic()
+        with self._lock:
+            self._reaper = None
+            # The most recently used worker is last and always kept
+            expired = [
+                worker for worker in self._idle[:-1]
+                if now - worker.idle_since >= self.idle_timeout
+            ]
+            self._idle = [worker for worker in self._idle if worker not in expired]
+            self._count -= len(expired)
+            if not self._closed:
+                self._schedule_reap()
+        for worker in expired:
+            worker.close()
+
+    def close(self):
+        """
+        Stop the idle workers and let busy ones stop after their pip run
+
+        Does not wait for a running pip, so settings can change while a long
+        install is in progress.
+        """
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._count -= len(idle)
+            self._lock.notify_all()
+            if self._reaper is not None:
+                self._reaper.cancel()
+                self._reaper = None
+        for worker in idle:
+            worker.close()
+
+    def run(self, args, **kwds):
+        """
+        Run pip with `args` in an idle worker and return a `process.Result`
+
+        Waits for a worker if all of them are busy. Takes the keyword
+        arguments of `PipWorker.run`.
+        """
+        worker = self._acquire()
+        try:
+            return worker.run(args, **kwds)
+        finally:
+            self._release(worker)
+
+
+class PipWorker(object):
+    """
+    A pip worker process of one interpreter, running one pip at a time
+
+    Attributes:
+        python (str): The interpreter running the worker
+    """
+
+    def __init__(self, python):
+        self.python = python
+        self.pid = None
+        self.idle_since = None
+        self._proc = None
+
+    def _send(self, message):
+        self._proc.stdin.write((json.dumps(message) + "\n").encode("utf-8"))
+        self._proc.stdin.flush()
+
+    def _receive(self):
+        line = self._proc.stdout.readline()
+        if not line:
+            return None
+        return json.loads(line.decode("utf-8"))
+
+    def _start(self):
+        with perf.span("spawn", "pip worker"):
+            self._proc = subprocess.Popen(
+                [self.python, "-u", "-c", WORKER_SOURCE],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+            message = self._receive()
+        if not message or not message.get("ready"):
+            self.close()
+            raise WorkerError("pip worker of {} failed to start".format(self.python))
+
+    def close(self):
+        if self._proc is not None:
+            try:
+                self._proc.stdin.close()
+                self._proc.wait()
+            except (OSError, IOError):
+                pass
+            self._proc = None
+
+    def run(self, args, env=None, cwd=None, on_line=None,
+            max_lines=process.MAX_LINES, job=None, limits=None):
+        """
+        Run pip with `args` and return a `process.Result`
+
+        Cancelling `job` or exceeding the timeout of `limits` kills the
+        forked pip run, or the whole worker where pip runs inside of it.
+        Priority and memory limits only apply to forked runs.
+        """
+        limits = limits or process.Limits()
+        # A failing callback must not leave the response half read
+        on_line = process.guarded(on_line)
+        tails = {
+            "stdout": collections.deque(maxlen=max_lines),
+            "stderr": collections.deque(maxlen=max_lines),
+        }
+
+        if self._proc is None or self._proc.poll() is not None:
+            self._start()
+
+        timeout = process.Timeout(limits.timeout, lambda: self.pid)
+        try:
+            if not hasattr(os, "fork"):
+                self.pid = self._proc.pid
+                if job is not None:
+                    job.attach(self.pid)
+            self._send({
+                "args": args,
+                "env": dict(env if env is not None else os.environ),
+                "cwd": cwd,
+                "limits": {
+                    "nice": limits.nice,
+                    "ionice": limits.ionice,
+                    "memory": limits.memory,
+                },
+            })
+            while True:
+                message = self._receive()
+                if message is None:
+                    raise WorkerError("pip worker of {} died".format(self.python))
+                if "pid" in message:
+                    self.pid = message["pid"]
+                    if job is not None:
+                        job.attach(self.pid)
+                elif "stream" in message:
+                    line = message["line"]
+                    tails[message["stream"]].append(line.encode("utf-8") + b"\n")
+                    if on_line:
+                        on_line(message["stream"], line)
+                elif "returncode" in message:
+                    returncode = message["returncode"]
+                    if job is not None and message.get("usage"):
+                        job.add_usage(process.Usage(*message["usage"]))
+                    break
+        except (OSError, IOError, ValueError) as error:
+            self.close()
+            if not timeout.expired:
+                raise WorkerError(str(error))
+            returncode = -1
+        except WorkerError:
+            self.close()
+            if not timeout.expired:
+                raise
+            returncode = -1
+        finally:
+            timeout.cancel()
+            if job is not None and self.pid is not None:
+                job.detach(self.pid)
+            self.pid = None
+
+        if timeout.expired:
+            tails["stderr"].append(timeout.message())
+        return process.Result(
+            returncode, b"".join(tails["stdout"]), b"".join(tails["stderr"])
+        )
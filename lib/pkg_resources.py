@@ -18,19 +18,27 @@ import sys
 import os
 import time
 import re
-import imp
-import zipfile
 import zipimport
 import warnings
 import stat
 import functools
 import pkgutil
 import token
-import symbol
 import operator
 import platform
+import types
+import collections
 from pkgutil import get_importer
 
+from . import metadata as _metadata
+
+# The import lock lives in ``_imp`` since Python 3.3, which avoids importing
+# the deprecated ``imp`` module (removed in Python 3.12)
+try:
+    import _imp as imp_lock
+except ImportError:
+    import imp as imp_lock
+
 try:
     from urlparse import urlparse, urlunparse
 except ImportError:
@@ -68,15 +76,10 @@ from os.path import isdir, split
 
 # Avoid try/except due to potential problems with delayed import mechanisms.
 if sys.version_info >= (3, 3) and sys.implementation.name == "cpython":
-    import importlib._bootstrap as importlib_bootstrap
+    import importlib.machinery as importlib_bootstrap
 else:
     importlib_bootstrap = None
 
-try:
-    import parser
-except ImportError:
-    pass
-
 def _bypass_ensure_directory(name, mode=0x1FF):  # 0777
     # Sandbox-bypassing version of ensure_directory()
     if not WRITE_SUPPORT:
@@ -592,13 +595,14 @@ class WorkingSet(object):
         it.
         """
 
-        requirements = list(requirements)[::-1]  # set up the stack
+        # set up the queue
+        requirements = collections.deque(list(requirements)[::-1])
         processed = {}  # set of processed requirements
         best = {}  # key -> dist
         to_activate = []
 
         while requirements:
-            req = requirements.pop(0)   # process dependencies breadth-first
+            req = requirements.popleft()   # process dependencies breadth-first
             if req in processed:
                 # Ignore cyclic or redundant dependencies
                 continue
@@ -1130,6 +1134,26 @@ def get_default_cache():
             "Please set the PYTHON_EGG_CACHE enviroment variable"
         )
 
+# Bounded caches of the string parsers below. They are called over and
+# over with the same strings while sorting, comparing and resolving
+_MEMO_SIZE = 4096
+_memoized = []
+
+def _memoize(function):
+    function = functools.lru_cache(maxsize=_MEMO_SIZE)(function)
+    _memoized.append(function)
+    return function
+
+def cache_stats():
+    """Return the ``CacheInfo`` of every memoized parser by name"""
+    return dict((function.__name__, function.cache_info()) for function in _memoized)
+
+def clear_caches():
+    for function in _memoized:
+        function.cache_clear()
+
+
+@_memoize
 def safe_name(name):
     """Convert an arbitrary string to a standard distribution name
 
@@ -1138,6 +1162,7 @@ def safe_name(name):
     return re.sub('[^A-Za-z0-9.]+', '-', name)
 
 
+@_memoize
 def safe_version(version):
     """Convert an arbitrary string to a standard version string
 
@@ -1243,6 +1268,7 @@ class MarkerEvaluation(object):
 
     @classmethod
     def get_op(cls, op):
+        import symbol
         ops = {
             symbol.test: cls.test,
             symbol.and_test: cls.and_test,
@@ -1266,8 +1292,13 @@ class MarkerEvaluation(object):
 
         This implementation uses the 'parser' module, which is not implemented on
         Jython and has been superseded by the 'ast' module in Python 2.6 and
-        later.
+        later. The less-complete _markerlib implementation is used if the
+        'parser' module is not available.
         """
+        try:
+            import parser
+        except ImportError:
+            return cls._markerlib_evaluate(text)
         return cls.interpret(parser.expr(text).totuple(1)[1])
 
     @classmethod
@@ -1291,11 +1322,6 @@ class MarkerEvaluation(object):
             raise SyntaxError(e.args[0])
         return result
 
-    if 'parser' not in globals():
-        # Fall back to less-complete _markerlib implementation if 'parser' module
-        # is not available.
-        evaluate_marker = _markerlib_evaluate
-
     @classmethod
     def interpret(cls, nodelist):
         while len(nodelist)==2: nodelist = nodelist[1]
@@ -1513,6 +1539,7 @@ def build_zipmanifest(path):
                zipinfo.date_time[4] << 5 | (zipinfo.date_time[5] // 2)
       * [7] - zipinfo.CRC
     """
+    import zipfile
     zipinfo = dict()
     zfile = zipfile.ZipFile(path)
     #Got ZipFile has not __exit__ on python 3.1
@@ -1839,7 +1866,8 @@ def find_on_path(importer, path_item, only=False):
                         for item in find_distributions(os.path.join(path_item,line.rstrip())):
                             yield item
                         break
-register_finder(pkgutil.ImpImporter,find_on_path)
+if hasattr(pkgutil, 'ImpImporter'):
+    register_finder(pkgutil.ImpImporter,find_on_path)
 
 if importlib_bootstrap is not None:
     register_finder(importlib_bootstrap.FileFinder, find_on_path)
@@ -1876,7 +1904,7 @@ def _handle_ns(packageName, path_item):
         return None
     module = sys.modules.get(packageName)
     if module is None:
-        module = sys.modules[packageName] = imp.new_module(packageName)
+        module = sys.modules[packageName] = types.ModuleType(packageName)
         module.__path__ = []
         _set_parent_ns(packageName)
     elif not hasattr(module,'__path__'):
@@ -1895,7 +1923,7 @@ def _handle_ns(packageName, path_item):
 def declare_namespace(packageName):
     """Declare that package 'packageName' is a namespace package"""
 
-    imp.acquire_lock()
+    imp_lock.acquire_lock()
     try:
         if packageName in _namespace_packages:
             return
@@ -1922,17 +1950,17 @@ def declare_namespace(packageName):
             _handle_ns(packageName, path_item)
 
     finally:
-        imp.release_lock()
+        imp_lock.release_lock()
 
 def fixup_namespace_packages(path_item, parent=None):
     """Ensure that previously-declared namespace packages include path_item"""
-    imp.acquire_lock()
+    imp_lock.acquire_lock()
     try:
         for package in _namespace_packages.get(parent,()):
             subpath = _handle_ns(package, path_item)
             if subpath: fixup_namespace_packages(subpath,package)
     finally:
-        imp.release_lock()
+        imp_lock.release_lock()
 
 def file_ns_handler(importer, path_item, packageName, module):
     """Compute an ns-package subpath for a filesystem or zipfile importer"""
@@ -2004,62 +2032,9 @@ EGG_NAME = re.compile(
     re.VERBOSE | re.IGNORECASE
 ).match
 
-component_re = re.compile(r'(\d+ | [a-z]+ | \.| -)', re.VERBOSE)
-replace = {'pre':'c', 'preview':'c','-':'final-','rc':'c','dev':'@'}.get
-
-def _parse_version_parts(s):
-    for part in component_re.split(s):
-        part = replace(part,part)
-        if not part or part=='.':
-            continue
-        if part[:1] in '0123456789':
-            yield part.zfill(8)    # pad for numeric comparison
-        else:
-            yield '*'+part
-
-    yield '*final'  # ensure that alpha/beta/candidate are before final
-
-def parse_version(s):
-    """Convert a version string to a chronologically-sortable key
-
-    This is a rough cross between distutils' StrictVersion and LooseVersion;
-    if you give it versions that would work with StrictVersion, then it behaves
-    the same; otherwise it acts like a slightly-smarter LooseVersion. It is
-    *possible* to create pathological version coding schemes that will fool
-    this parser, but they should be very rare in practice.
-
-    The returned value will be a tuple of strings.  Numeric portions of the
-    version are padded to 8 digits so they will compare numerically, but
-    without relying on how numbers compare relative to strings.  Dots are
-    dropped, but dashes are retained.  Trailing zeros between alpha segments
-    or dashes are suppressed, so that e.g. "2.4.0" is considered the same as
-    "2.4". Alphanumeric parts are lower-cased.
-
-    The algorithm assumes that strings like "-" and any alpha string that
-    alphabetically follows "final"  represents a "patch level".  So, "2.4-1"
-    is assumed to be a branch or patch of "2.4", and therefore "2.4.1" is
-    considered newer than "2.4-1", which in turn is newer than "2.4".
-
-    Strings like "a", "b", "c", "alpha", "beta", "candidate" and so on (that
-    come before "final" alphabetically) are assumed to be pre-release versions,
-    so that the version "2.4" is considered newer than "2.4a1".
-
-    Finally, to handle miscellaneous cases, the strings "pre", "preview", and
-    "rc" are treated as if they were "c", i.e. as though they were release
-    candidates, and therefore are not as new as a version string that does not
-    contain them, and "dev" is replaced with an '@' so that it sorts lower than
-    than any other pre-release tag.
-    """
-    parts = []
-    for part in _parse_version_parts(s.lower()):
-        if part.startswith('*'):
-            if part<'*final':   # remove '-' before a prerelease tag
-                while parts and parts[-1]=='*final-': parts.pop()
-            # remove trailing zeros from each series of numeric parts
-            while parts and parts[-1]=='00000000':
-                parts.pop()
-        parts.append(part)
-    return tuple(parts)
+# Version parsing lives in `metadata`, which does not need this module
+_parse_version_parts = _metadata._parse_version_parts
+parse_version = _metadata.parse_version
 class EntryPoint(object):
     """Object representing an advertised importable object"""
 
@@ -2258,14 +2233,13 @@ class Distribution(object):
         try:
             return self._version
         except AttributeError:
-            for line in self._get_metadata(self.PKG_INFO):
-                if line.lower().startswith('version:'):
-                    self._version = safe_version(line.split(':',1)[1].strip())
-                    return self._version
-            else:
-                raise ValueError(
-                    "Missing 'Version:' header and/or %s file" % self.PKG_INFO, self
-                )
+            headers = _metadata_headers(self, ('version',))
+            if headers.get('version'):
+                self._version = safe_version(headers['version'][0])
+                return self._version
+            raise ValueError(
+                "Missing 'Version:' header and/or %s file" % self.PKG_INFO, self
+            )
 
     @property
     def _dep_map(self):
@@ -2461,6 +2435,26 @@ class Distribution(object):
         return [dep for dep in self._dep_map if dep]
 
 
+def _metadata_headers(dist, fields=None):
+    """Return the header block of the PKG-INFO/METADATA file of `dist`
+
+    Files on disk are only read up to the end of their headers, the content
+    of other providers is parsed without its body.
+    """
+    provider = dist._provider
+    if isinstance(provider, FileMetadata):
+        return _metadata.read_metadata(provider.path, fields)
+    if isinstance(provider, DefaultProvider) and provider.egg_info:
+        path = os.path.join(provider.egg_info, dist.PKG_INFO)
+        if os.path.isfile(path):
+            return _metadata.read_metadata(path, fields)
+    if not dist.has_metadata(dist.PKG_INFO):
+        return {}
+    return _metadata.parse_headers(
+        dist.get_metadata(dist.PKG_INFO).splitlines(), fields
+    )
+
+
 class DistInfoDistribution(Distribution):
     """Wrap an actual or potential sys.path entry w/metadata, .dist-info style"""
     PKG_INFO = 'METADATA'
@@ -2472,8 +2466,12 @@ class DistInfoDistribution(Distribution):
         try:
             return self._pkg_info
         except AttributeError:
-            from email.parser import Parser
-            self._pkg_info = Parser().parsestr(self.get_metadata(self.PKG_INFO))
+            from email.message import Message
+            self._pkg_info = Message()
+            headers = _metadata_headers(self, _metadata.HEADER_FIELDS)
+            for name, values in headers.items():
+                for value in values:
+                    self._pkg_info[name] = value
             return self._pkg_info
 
     @property
@@ -2498,7 +2496,20 @@ class DistInfoDistribution(Distribution):
 
     def _compute_dependencies(self):
         """Recompute this distribution's dependencies."""
-        from _markerlib import compile as compile_marker
+        # _markerlib is gone from current Pythons, use the bundled evaluator
+        from . import markers
+        environment = markers.default_environment()
+
+        def compile_marker(mark):
+            def marker_fn(override):
+                if not mark:
+                    return True
+                try:
+                    return markers.evaluate(mark, environment, override.get("extra"))
+                except markers.MarkerError:
+                    return True
+            return marker_fn
+
         dm = self.__dep_map = {None: []}
 
         reqs = []
@@ -2551,8 +2562,19 @@ def parse_requirements(strs):
     `strs` must be an instance of ``basestring``, or a (possibly-nested)
     iterable thereof.
     """
+    if not isinstance(strs, basestring):
+        strs = tuple(yield_lines(strs))
+
+    # Only the parsed fields are cached, every caller gets new objects
+    for project_name, specs, extras in _parse_requirement_fields(strs):
+        yield Requirement(project_name, list(specs), list(extras))
+
+
+@_memoize
+def _parse_requirement_fields(strs):
     # create a steppable iterator, so we can handle \-continuations
     lines = iter(yield_lines(strs))
+    requirements = []
 
     def scan_list(ITEM,TERMINATOR,line,p,groups,item_name):
 
@@ -2603,8 +2625,10 @@ def parse_requirements(strs):
             )
 
         line, p, specs = scan_list(VERSION,LINE_END,line,p,(1,2),"version spec")
-        specs = [(op,safe_version(val)) for op,val in specs]
-        yield Requirement(project_name, specs, extras)
+        specs = tuple((op,safe_version(val)) for op,val in specs)
+        requirements.append((project_name, specs, tuple(extras)))
+
+    return tuple(requirements)
 
 
 def _sort_dists(dists):
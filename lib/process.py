@@ -0,0 +1,276 @@
+# encoding: utf-8
+
+"""
+Subprocess runner which streams output line by line
+
+stdout and stderr are read by background threads as the process writes
+them. Each line is passed to a callback right away, while only a bounded
+tail of each stream is kept in memory. Processes can run with a lower CPU
+and I/O priority, a memory cap and a wall-clock timeout, and their CPU
+time and peak memory are collected when they exit.
+"""
+
+import collections
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import traceback
+
+from . import perf
+
+
+MAX_LINES = 2000
+
+PROGRESS_PATTERNS = [
+    (re.compile(r"^Collecting (\S+)"), "Collecting {}"),
+    (re.compile(r"^\s*Downloading (\S+)"), "Downloading {}"),
+    (re.compile(r"^\s*Using cached (\S+)"), "Using cached {}"),
+    (re.compile(r"^\s*Building wheel for (\S+)"), "Building {}"),
+    (re.compile(r"^Building wheels for collected packages: (.+)"), "Building {}"),
+    (re.compile(r"^Installing collected packages: (.+)"), "Installing {}"),
+    (re.compile(r"^\s*Found existing installation: (\S+)"), "Removing {}"),
+    (re.compile(r"^Successfully (\w+)"), "Successfully {}"),
+]
+
+KILL_DELAY = 5
+
+BELOW_NORMAL_PRIORITY_CLASS = 0x00004000
+
+Result = collections.namedtuple("Result", ["returncode", "stdout", "stderr"])
+
+Limits = collections.namedtuple("Limits", ["timeout", "nice", "ionice", "memory"])
+Limits.__new__.__defaults__ = (None, 0, False, None)
+
+Usage = collections.namedtuple("Usage", ["cpu_time", "max_rss"])
+
+_commands = {}
+
+
+def progress_message(line):
+    """
+    Return a short status message for a line of pip output, if any
+    """
+    for pattern, message in PROGRESS_PATTERNS:
+        match = pattern.match(line)
+        if match:
+            return message.format(match.group(1).strip())
+    return None
+
+def guarded(on_line):
+    """
+    Return `on_line` wrapped, so an exception in it stops further calls
+    instead of the caller
+    """
+    if on_line is None:
+        return None
+    failed = []
+
+    def call(name, line):
+        if failed:
+            return
+        try:
+            on_line(name, line)
+        except Exception:
+            failed.append(True)
+            traceback.print_exc()
+    return call
+
+def _read(stream, name, tail, on_line):
+    for line in iter(stream.readline, b""):
+        tail.append(line)
+        if on_line:
+            on_line(name, line.decode("utf-8", "replace").rstrip("\r\n"))
+    stream.close()
+
+def kill_tree(pid, sig=signal.SIGTERM):
+    """
+    Terminate the process `pid` together with all processes it started
+    """
+    try:
+        if os.name == "nt":
+            subprocess.call(
+                ["taskkill", "/F", "/T", "/PID", str(pid)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        else:
+            # Processes are started in their own session, see `run`
+            os.killpg(pid, sig)
+    except OSError:
+        try:
+            os.kill(pid, sig)
+        except OSError:
+            pass
+
+def usage(rusage):
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    scale = 1 if sys.platform == "darwin" else 1024
+    return Usage(rusage.ru_utime + rusage.ru_stime, rusage.ru_maxrss * scale)
+
+def _command(name, linux_only=False):
+    if name not in _commands:
+        available = not linux_only or sys.platform.startswith("linux")
+        _commands[name] = available and shutil.which(name) or ""
+    return _commands[name]
+
+def memory_limit_supported():
+    """
+    Whether `Limits.memory` can be applied, which needs `prlimit` on Linux
+    """
+    return bool(_command("prlimit", linux_only=True))
+
+def _popen_args(cmd, limits):
+    kwds = {}
+    if os.name == "nt":
+        if limits.nice > 0:
+            kwds["creationflags"] = BELOW_NORMAL_PRIORITY_CLASS
+        return cmd, kwds
+    if not isinstance(cmd, list):
+        return cmd, kwds
+
+    # Limits are applied by wrapping the command, as `preexec_fn` is not
+    # safe while other threads are running
+    if limits.memory and _command("prlimit", linux_only=True):
+        cmd = [_command("prlimit"), "--as={}".format(limits.memory), "--"] + cmd
+    if limits.nice > 0 and _command("nice"):
+        cmd = [_command("nice"), "-n", str(limits.nice)] + cmd
+    if limits.ionice and _command("ionice", linux_only=True):
+        # Best effort class at its lowest priority, so builds never starve
+        cmd = [_command("ionice"), "-c", "2", "-n", "7"] + cmd
+    return cmd, kwds
+
+def _wait(proc):
+    if not hasattr(os, "wait4"):
+        return proc.wait(), None
+
+    while True:
+        try:
+            _, status, rusage = os.wait4(proc.pid, 0)
+            break
+        except InterruptedError:
+            continue
+
+    if os.WIFSIGNALED(status):
+        proc.returncode = -os.WTERMSIG(status)
+    else:
+        proc.returncode = os.WEXITSTATUS(status)
+    return proc.returncode, usage(rusage)
+
+def run(cmd, env=None, cwd=None, shell=False, on_line=None, max_lines=MAX_LINES,
+        job=None, limits=None):
+    """
+    Run `cmd` and return a `Result` with the tails of stdout and stderr
+
+    Args:
+        on_line (callable): Called with `("stdout"|"stderr", line)` for
+            every line as soon as it is read
+        max_lines (int): Number of trailing lines kept per stream
+        job (jobs.Job): Kills the process when the job is cancelled and
+            accounts its resource usage
+        limits (Limits): Priority, memory cap and timeout of the process
+    """
+    limits = limits or Limits()
+    # The readers must keep draining the pipes whatever the callback does
+    on_line = guarded(on_line)
+    cmd, kwds = _popen_args(cmd, limits)
+    with perf.span("spawn", cmd[0] if isinstance(cmd, list) else cmd):
+        proc = subprocess.Popen(
+            cmd,
+            env=env,
+            cwd=cwd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            shell=shell,
+            start_new_session=os.name != "nt",
+            **kwds
+        )
+    if job is not None:
+        job.attach(proc.pid)
+    timeout = Timeout(limits.timeout, proc.pid)
+
+    tails = {
+        "stdout": collections.deque(maxlen=max_lines),
+        "stderr": collections.deque(maxlen=max_lines),
+    }
+    readers = [
+        threading.Thread(
+            target=_read, args=[getattr(proc, name), name, tails[name], on_line]
+        )
+        for name in ("stdout", "stderr")
+    ]
+    for reader in readers:
+        reader.daemon = True
+        reader.start()
+
+    try:
+        returncode, used = _wait(proc)
+    finally:
+        timeout.cancel()
+        if job is not None:
+            job.detach(proc.pid)
+    for reader in readers:
+        reader.join()
+
+    if job is not None and used is not None:
+        job.add_usage(used)
+    if timeout.expired:
+        tails["stderr"].append(timeout.message())
+
+    return Result(
+        returncode, b"".join(tails["stdout"]), b"".join(tails["stderr"])
+    )
+
+
+class Timeout(object):
+    """
+    Terminates a process tree once `seconds` have passed
+
+    The tree is killed if it is still running `KILL_DELAY` seconds after
+    it was asked to terminate.
+
+    Attributes:
+        seconds (float): The timeout, None or 0 for none
+        pid (int): The process, or a callable returning it when it expires
+    """
+
+    def __init__(self, seconds, pid):
+        self.seconds = seconds
+        self.expired = False
+        self._pid = pid
+        self._timers = []
+        self._cancelled = False
+        self._lock = threading.Lock()
+        if seconds:
+            self._schedule(seconds, signal.SIGTERM)
+
+    def _schedule(self, seconds, sig):
+        with self._lock:
+            if self._cancelled:
+                return
+            timer = threading.Timer(seconds, self._expire, [sig])
+            timer.daemon = True
+            self._timers.append(timer)
+            timer.start()
+
+    def _expire(self, sig):
+        if self._cancelled:
+            return
+        self.expired = True
+        pid = self._pid() if callable(self._pid) else self._pid
+        if pid:
+            kill_tree(pid, sig)
+        if sig == signal.SIGTERM:
+            self._schedule(KILL_DELAY, getattr(signal, "SIGKILL", signal.SIGTERM))
+
+    def cancel(self):
+        with self._lock:
+            self._cancelled = True
+            for timer in self._timers:
+                timer.cancel()
+
+    def message(self):
+        return "ERROR: Timed out after {} seconds\n".format(self.seconds).encode()
@@ -0,0 +1,185 @@
+# encoding: utf-8
+
+"""
+Diff between a desired package set and the contents of a lib directory
+
+The desired set is a requirements file or a lock file. A plan lists only
+the requirements which are not satisfied yet and the distributions which
+are no longer wanted, so applying it leaves everything else untouched.
+"""
+
+import collections
+import os
+
+from . import lockfile
+from . import markers
+from . import metadata
+from .installer import canonical_name
+
+
+Plan = collections.namedtuple(
+    "Plan", ["install", "remove", "replace", "constraints", "fallback", "requested"]
+)
+
+
+class SyncError(Exception):
+    pass
+
+
+def read_requirements(path, strict=True):
+    """
+    Return the parsed requirements of a requirements file
+
+    Nested requirements files (`-r`) are followed. Any other option, URL or
+    editable requirement can not be diffed and raises `SyncError`, or is
+    skipped if not `strict`.
+    """
+    try:
+        with open(path, encoding="utf-8") as stream:
+            lines = stream.read().splitlines()
+    except (OSError, IOError) as error:
+        raise SyncError("Could not read {}: {}".format(path, error))
+
+    requirements = []
+    for line in lines:
+        line = line.split(" #", 1)[0].strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith(("-r ", "--requirement ")):
+            nested = line.split(None, 1)[1]
+            requirements += read_requirements(
+                os.path.join(os.path.dirname(path), nested), strict
+            )
+            continue
+        if line.startswith("-") or "://" in line:
+            if not strict:
+                continue
+            raise SyncError("Can not sync requirement: {}".format(line))
+
+        try:
+            requirement = lockfile.parse_requirement(line)
+        except lockfile.LockError as error:
+            if not strict:
+                continue
+            raise SyncError(str(error))
+        requirement["line"] = line
+        requirements.append(requirement)
+    return requirements
+
+def satisfies(version, requirement):
+    if not requirement["specifier"]:
+        return True
+    return markers.version_matches(version, requirement["specifier"])
+
+def applies(requirement, environment):
+    """
+    Return whether the marker of `requirement` holds in `environment`
+    """
+    if not requirement["marker"] or environment is None:
+        return True
+    try:
+        return markers.evaluate(requirement["marker"], environment)
+    except markers.MarkerError:
+        # Rather keep a requirement too many than miss one
+        return True
+
+def _installed(dists):
+    return dict((canonical_name(dist.project_name), dist) for dist in dists)
+
+def _closure(lib_path, installed, names):
+    # Everything the wanted packages depend on is kept as well. Markers are
+    # not evaluated here, so the closure may keep a little too much
+    keep = set()
+    queue = collections.deque(name for name in names if name in installed)
+    while queue:
+        name = queue.popleft()
+        if name in keep:
+            continue
+        keep.add(name)
+        for requirement in metadata.requires(lib_path, installed[name].entry):
+            try:
+                dependency = lockfile.parse_requirement(requirement)["name"]
+            except lockfile.LockError:
+                continue
+            if dependency in installed and dependency not in keep:
+                queue.append(dependency)
+    return keep
+
+def requirements_plan(lib_path, requirements, dists, environment=None):
+    """
+    Return the `Plan` which brings `dists` in line with `requirements`
+
+    Requirements whose marker does not hold in the marker `environment` of
+    the interpreter are ignored.
+
+    `Plan.install` holds requirement lines to pass to the installer and
+    `Plan.replace` the installed distributions they replace. Installed
+    packages which neither are required nor are a dependency of a required
+    package are removed. `Plan.requested` names all required packages,
+    which are marked as installed on request.
+
+    `Plan.constraints` pins every kept distribution to its installed
+    version, so the new requirements are resolved against them. If they
+    need another version of a kept dependency, the install is retried with
+    `Plan.fallback`: the specifiers which the kept requirements and the
+    kept distributions put on their dependencies. Those can then be
+    replaced without breaking any kept package.
+    """
+    installed = _installed(dists)
+    requirements = [
+        requirement for requirement in requirements if applies(requirement, environment)
+    ]
+
+    install = []
+    for requirement in requirements:
+        dist = installed.get(requirement["name"])
+        try:
+            if dist is None or not satisfies(dist.version, requirement):
+                install.append(requirement["line"])
+        except ValueError as error:
+            raise SyncError("Invalid requirement {}: {}".format(requirement["line"], error))
+
+    keep = _closure(lib_path, installed, [requirement["name"] for requirement in requirements])
+    remove = [dist for name, dist in sorted(installed.items()) if name not in keep]
+
+    changed = set(lockfile.parse_requirement(line)["name"] for line in install)
+    kept = sorted(keep - changed)
+    replace = [installed[name] for name in sorted(changed) if name in installed]
+    constraints = ["{}=={}".format(name, installed[name].version) for name in kept]
+
+    fallback = [
+        requirement for requirement in requirements if requirement["name"] not in changed
+    ]
+    for name in kept:
+        for line in metadata.requires(lib_path, installed[name].entry):
+            try:
+                requirement = lockfile.parse_requirement(line)
+            except lockfile.LockError:
+                continue
+            if applies(requirement, environment):
+                fallback.append(requirement)
+    fallback = sorted(set(
+        requirement["name"] + requirement["specifier"]
+        for requirement in fallback if requirement["specifier"]
+    ))
+
+    requested = sorted(set(requirement["name"] for requirement in requirements))
+    return Plan(install, remove, replace, constraints, fallback, requested)
+
+def lock_plan(lock, dists):
+    """
+    Return the `Plan` which brings `dists` in line with a lock
+
+    `Plan.install` holds the locked packages which are missing or have
+    another version installed, `Plan.replace` the installed distributions
+    of the latter and `Plan.requested` the locked packages no other one
+    requires.
+    """
+    installed = _installed(dists)
+    locked = set(package["name"] for package in lock["packages"])
+    remove = [dist for name, dist in sorted(installed.items()) if name not in locked]
+    install = lockfile.missing(lock, dists)
+    replace = [
+        installed[package["name"]] for package in install if package["name"] in installed
+    ]
+    return Plan(install, remove, replace, [], [], lockfile.top_level(lock))
@@ -11,12 +11,14 @@ class ThreadProgress():
         message (str): The message to display next to the activity indicator
         success_message (str): The message to display once the thread is
             complete
+        queue (jobs.JobQueue): Queue whose number of waiting jobs is shown
     """
 
-    def __init__(self, thread, message="PyPackages", success_message=""):
+    def __init__(self, thread, message="PyPackages", success_message="", queue=None):
         self.thread = thread
         self.message = message
         self.success_message = success_message
+        self.queue = queue
         self.addend = 1
         self.size = 8
         self.last_view = None
@@ -45,9 +47,12 @@ class ThreadProgress():
         before = i % self.size
         after = (self.size - 1) - before
 
-        active_view.set_status("_pypackages", "{} [{}={}]".format(
-            self.message, " "*before, " "*after)
-        )
+        status = "{} [{}={}]".format(self.message, " "*before, " "*after)
+        depth = self.queue.depth() if self.queue else 0
+        if depth:
+            status += " ({} queued)".format(depth)
+
+        active_view.set_status("_pypackages", status)
         if self.last_view is None:
             self.last_view = active_view
 
@@ -0,0 +1,167 @@
+# encoding: utf-8
+
+"""
+Native uninstall engine
+
+Removes distributions from a lib directory by deleting the files listed in
+their `RECORD` (or `installed-files.txt` for `.egg-info`) in parallel and
+pruning directories which are left empty. Nothing outside the lib
+directory is ever touched. Files can be moved to a backup directory
+instead, from which `restore` puts them back.
+"""
+
+import csv
+import io
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+
+class UninstallError(Exception):
+    pass
+
+
+def _inside(lib_path, path):
+    return (path + os.sep).startswith(os.path.join(lib_path, ""))
+
+def _resolve(lib_path, base, relpath):
+    path = os.path.normpath(os.path.join(base, relpath))
+    if _inside(lib_path, path):
+        return path
+
+    # pip --target installs through a temporary prefix, so RECORD may point
+    # to e.g. "../../bin/script", which was moved into the lib directory
+    parts = [part for part in relpath.replace("\\", "/").split("/") if part != ".."]
+    path = os.path.normpath(os.path.join(lib_path, *parts))
+    if _inside(lib_path, path) and os.path.lexists(path):
+        return path
+    return None
+
+def _bytecode(path):
+    directory, filename = os.path.split(path)
+    stem, ext = os.path.splitext(filename)
+    if ext != ".py":
+        return []
+
+    cache = os.path.join(directory, "__pycache__")
+    try:
+        names = os.listdir(cache)
+    except OSError:
+        names = []
+    return [
+        os.path.join(cache, name) for name in names
+        if name.startswith(stem + ".") and name.endswith(".pyc")
+    ] + [path + "c", path + "o"]
+
+def installed_files(lib_path, entry):
+    """
+    Return the absolute paths which belong to the metadata entry `entry`
+    """
+    lib_path = os.path.abspath(lib_path)
+    metadata_dir = os.path.join(lib_path, entry)
+
+    if entry.lower().endswith(".dist-info"):
+        listing, base = os.path.join(metadata_dir, "RECORD"), lib_path
+    else:
+        listing, base = os.path.join(metadata_dir, "installed-files.txt"), metadata_dir
+
+    try:
+        with open(listing, encoding="utf-8") as stream:
+            content = stream.read()
+    except (OSError, IOError):
+        raise UninstallError("No file list found for {}".format(entry))
+
+    if listing.endswith("RECORD"):
+        relpaths = [row[0] for row in csv.reader(io.StringIO(content)) if row]
+    else:
+        relpaths = [line.strip() for line in content.splitlines() if line.strip()]
+
+    files = set()
+    for relpath in relpaths:
+        path = _resolve(lib_path, base, relpath)
+        if path is None:
+            continue
+        files.add(path)
+        files.update(_bytecode(path))
+    return files
+
+def _remove(path):
+    try:
+        os.unlink(path)
+        return path
+    except OSError:
+        return None
+
+def _move(item):
+    path, dest = item
+    try:
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.replace(path, dest)
+        return path
+    except OSError:
+        return None
+
+def _backup(lib_path, backup):
+    return lambda path: (path, os.path.join(backup, os.path.relpath(path, lib_path)))
+
+def _tree(directory):
+    for root, _, names in os.walk(directory):
+        for name in names:
+            yield os.path.join(root, name)
+
+def _prune(lib_path, directories):
+    for directory in sorted(directories, key=len, reverse=True):
+        while _inside(lib_path, directory) and directory != lib_path:
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+
+def uninstall(lib_path, entries, jobs=8, backup=None):
+    """
+    Remove the distributions of all `entries` from `lib_path`
+
+    Returns a dict mapping each entry to the sorted list of removed paths,
+    relative to `lib_path`. Raises `UninstallError` before anything is
+    removed if the file list of any entry is missing. With a `backup`
+    directory on the same file system, the files are moved there.
+    """
+    lib_path = os.path.abspath(lib_path)
+    files = dict((entry, installed_files(lib_path, entry)) for entry in entries)
+
+    paths = set()
+    for entry_files in files.values():
+        paths.update(entry_files)
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        if backup is None:
+            removed = set(path for path in executor.map(_remove, paths) if path)
+        else:
+            target = _backup(lib_path, backup)
+            removed = set(path for path in executor.map(_move, map(target, paths)) if path)
+
+    for entry in entries:
+        metadata_dir = os.path.join(lib_path, entry)
+        if os.path.isdir(metadata_dir):
+            if backup is not None:
+                for path in _tree(metadata_dir):
+                    _move(_backup(lib_path, backup)(path))
+            shutil.rmtree(metadata_dir, ignore_errors=True)
+
+    _prune(lib_path, set(os.path.dirname(path) for path in removed))
+
+    return dict(
+        (entry, sorted(
+            os.path.relpath(path, lib_path) for path in entry_files & removed
+        ))
+        for entry, entry_files in files.items()
+    )
+
+def restore(lib_path, backup):
+    """
+    Move the files of an `uninstall` with `backup` back into `lib_path`
+    """
+    lib_path = os.path.abspath(lib_path)
+    for path in _tree(backup):
+        _move((path, os.path.join(lib_path, os.path.relpath(path, backup))))
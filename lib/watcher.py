@@ -0,0 +1,231 @@
+# encoding: utf-8
+
+"""
+Change notifications for lib directories
+
+pip adds and removes distributions by creating, moving and deleting
+entries at the top level of a lib directory. On Linux these changes are
+reported by inotify (through ctypes), elsewhere the mtime of the directory
+is polled. Events are debounced, so a pip run touching hundreds of files
+results in a single callback once the directory has settled.
+"""
+
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+import traceback
+
+try:
+    import ctypes
+    import ctypes.util
+except ImportError:
+    ctypes = None
+
+
+DEBOUNCE = 0.5
+POLL_INTERVAL = 2.0
+
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+
+WATCH_MASK = (
+    IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+    | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+
+EVENT_HEADER = struct.Struct("iIII")
+
+_watchers = {}
+_lock = threading.Lock()
+_libc = None
+
+
+def _inotify():
+    global _libc
+    if ctypes is None or not sys.platform.startswith("linux"):
+        return None
+    if _libc is None:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            libc.inotify_init1.argtypes = [ctypes.c_int]
+            libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        except (OSError, AttributeError):
+            libc = False
+        _libc = libc
+    return _libc or None
+
+def watch(path, callback, on_error=None):
+    """
+    Call `callback(path)` from a background thread whenever `path` changed
+
+    Exceptions raised by `callback` are passed to `on_error`, or printed
+    with their traceback without one. Watching continues either way.
+    """
+    with _lock:
+        if path in _watchers:
+            return _watchers[path]
+        watcher = _watchers[path] = Watcher(path, callback, on_error=on_error)
+    watcher.start()
+    return watcher
+
+def watching(path):
+    with _lock:
+        return path in _watchers
+
+def unwatch(path):
+    with _lock:
+        watcher = _watchers.pop(path, None)
+    if watcher is not None:
+        watcher.stop()
+
+def stop_all():
+    with _lock:
+        watchers = list(_watchers.values())
+        _watchers.clear()
+    for watcher in watchers:
+        watcher.stop()
+
+
+class Watcher(object):
+    """
+    Background watcher of a single directory
+
+    Attributes:
+        path (str): The watched directory
+        callback (callable): Called with `path` after changes have settled
+        on_error (callable): Called with the exception if `callback` fails
+        debounce (float): Seconds without events before `callback` is called
+        poll_interval (float): Seconds between checks without inotify
+    """
+
+    def __init__(self, path, callback, debounce=DEBOUNCE, poll_interval=POLL_INTERVAL,
+                 on_error=None):
+        self.path = path
+        self.callback = callback
+        self.on_error = on_error
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _notify(self):
+        if not self._stopped.is_set():
+            try:
+                self.callback(self.path)
+            except Exception as error:
+                if self.on_error is None:
+                    traceback.print_exc()
+                else:
+                    self.on_error(error)
+
+    def _run(self):
+        libc = _inotify()
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC) if libc else -1
+        try:
+            if fd < 0:
+                self._poll()
+            else:
+                self._watch(libc, fd)
+        finally:
+            if fd >= 0:
+                os.close(fd)
+
+    def _mtime(self):
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def _poll(self):
+        mtime = self._mtime()
+        while not self._stopped.wait(self.poll_interval):
+            current = self._mtime()
+            if current == mtime:
+                continue
+
+            # Wait until the directory stops changing
+            while not self._stopped.wait(self.debounce):
+                settled = self._mtime()
+                if settled == current:
+                    break
+                current = settled
+            mtime = current
+            self._notify()
+
+    def _add_watch(self, libc, fd):
+        # The lib directory may not exist yet, wait for it
+        while not self._stopped.is_set():
+            wd = libc.inotify_add_watch(fd, os.fsencode(self.path), WATCH_MASK)
+            if wd >= 0:
+                return wd
+            if ctypes.get_errno() not in (errno.ENOENT, errno.ENOTDIR):
+                return -1
+            self._stopped.wait(self.poll_interval)
+        return -1
+
+    def _read(self, fd):
+        """
+        Read pending events and return whether the watch was removed
+        """
+        removed = False
+        try:
+            data = os.read(fd, 65536)
+        except OSError:
+            return removed
+
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size + length
+            if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                removed = True
+        return removed
+
+    def _watch(self, libc, fd):
+        while not self._stopped.is_set():
+            existed = os.path.isdir(self.path)
+            if self._add_watch(libc, fd) < 0:
+                if not self._stopped.is_set():
+                    self._poll()
+                return
+            if not existed:
+                self._notify()
+
+            removed = False
+            while not removed and not self._stopped.is_set():
+                if not select.select([fd], [], [], self.poll_interval)[0]:
+                    continue
+                removed = self._read(fd)
+
+                # Debounce: keep draining until no event arrives for a while
+                deadline = time.monotonic() + self.debounce
+                while not removed and not self._stopped.is_set():
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    if select.select([fd], [], [], timeout)[0]:
+                        removed = self._read(fd)
+                        deadline = time.monotonic() + self.debounce
+                self._notify()
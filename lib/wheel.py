@@ -0,0 +1,206 @@
+# encoding: utf-8
+
+"""
+Minimal wheel installer for `pip install --target` style layouts
+
+Unpacks a wheel into a lib directory the same way pip does for `--target`:
+`purelib`/`platlib` and `data` end up in the lib directory itself, scripts
+in its `bin` subdirectory. The RECORD file is rewritten to match. Existing
+files are unlinked before they are written, so files shared with other lib
+directories stay intact.
+"""
+
+import csv
+import io
+import os
+import re
+import shutil
+import zipfile
+
+from . import metadata
+
+
+WHEEL_NAME = re.compile(
+    r"^(?P<name>[^-]+)-(?P<version>[^-]+)(-(?P<build>\d[^-]*))?"
+    r"-(?P<pyver>[^-]+)-(?P<abi>[^-]+)-(?P<plat>[^-]+)\.whl$",
+    re.IGNORECASE
+)
+
+DATA_SCHEMES = {
+    "purelib": "",
+    "platlib": "",
+    "data": "",
+    "scripts": "bin",
+    "headers": "include",
+}
+
+SCRIPT_TEMPLATE = """#!{python}
+# -*- coding: utf-8 -*-
+import re
+import sys
+from {module} import {import_name}
+if __name__ == "__main__":
+    sys.argv[0] = re.sub(r"(-script\\.pyw|\\.exe)?$", "", sys.argv[0])
+    sys.exit({func}())
+"""
+
+
+class WheelError(Exception):
+    pass
+
+
+def parse_filename(filename):
+    """
+    Return name, version and tag of a wheel filename
+    """
+    match = WHEEL_NAME.match(os.path.basename(filename))
+    if not match:
+        raise WheelError("Invalid wheel filename: {}".format(filename))
+    tag = "-".join(match.group("pyver", "abi", "plat"))
+    return match.group("name"), match.group("version"), tag
+
+def _dist_info(members):
+    for member in members:
+        top = member.split("/", 1)[0]
+        if top.lower().endswith(".dist-info"):
+            return top
+    return None
+
+def requires(wheel_path):
+    """
+    Return the `Requires-Dist` requirements of `wheel_path`, with markers
+    """
+    with zipfile.ZipFile(wheel_path) as archive:
+        dist_info = _dist_info(archive.namelist())
+        if dist_info is None:
+            raise WheelError("No .dist-info directory in {}".format(wheel_path))
+        try:
+            stream = archive.open(dist_info + "/METADATA")
+        except KeyError:
+            return []
+        with stream:
+            # Parsing stops at the end of the header block
+            headers = metadata.parse_headers(
+                (line.decode("utf-8", "replace") for line in stream), ("requires-dist",)
+            )
+    return headers.get("requires-dist", [])
+
+def _target_path(target, path):
+    dest = os.path.normpath(os.path.join(target, path))
+    if not (dest + os.sep).startswith(os.path.normpath(target) + os.sep):
+        raise WheelError("Refusing to write outside of target: {}".format(path))
+
+    # Existing files may be hardlinks into a shared store, never write through
+    if os.path.lexists(dest):
+        os.unlink(dest)
+    return dest
+
+def _console_scripts(entry_points):
+    section = None
+    for line in entry_points.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("["):
+            section = line.strip("[]").strip()
+        elif section == "console_scripts" and "=" in line:
+            name, value = [part.strip() for part in line.split("=", 1)]
+            value = value.split("[", 1)[0].strip()
+            module, _, func = value.partition(":")
+            yield name, module.strip(), func.strip()
+
+def unpack(wheel_path, target, python="python"):
+    """
+    Install `wheel_path` into `target` and return the installed paths
+
+    Args:
+        wheel_path (str): The wheel file
+        target (str): The lib directory, e. g. `__pypackages__/X.Y/lib`
+        python (str): Interpreter used for script shebangs
+    """
+    parse_filename(wheel_path)
+    installed = []
+
+    with zipfile.ZipFile(wheel_path) as archive:
+        members = archive.namelist()
+        dist_info = _dist_info(members)
+        if dist_info is None:
+            raise WheelError("No .dist-info directory in {}".format(wheel_path))
+        data_dir = dist_info[:-len(".dist-info")] + ".data"
+
+        moved = {}
+        for member in members:
+            if member.endswith("/"):
+                continue
+
+            path = member
+            if member.startswith(data_dir + "/"):
+                parts = member.split("/", 2)
+                if len(parts) < 3 or parts[1] not in DATA_SCHEMES:
+                    continue
+                path = "/".join(
+                    part for part in (DATA_SCHEMES[parts[1]], parts[2]) if part
+                )
+                moved[member] = path
+            elif member == dist_info + "/RECORD":
+                continue
+
+            dest = _target_path(target, path)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            with archive.open(member) as source, open(dest, "wb") as output:
+                if path.startswith("bin/"):
+                    first = source.readline()
+                    if first.startswith(b"#!python"):
+                        first = "#!{}".format(python).encode() + first[8:]
+                    output.write(first)
+                shutil.copyfileobj(source, output)
+            if path.startswith("bin/"):
+                os.chmod(dest, 0o755)
+            installed.append(path)
+
+        try:
+            record = archive.read(dist_info + "/RECORD").decode("utf-8")
+        except KeyError:
+            record = ""
+        try:
+            entry_points = archive.read(
+                dist_info + "/entry_points.txt"
+            ).decode("utf-8")
+        except KeyError:
+            entry_points = ""
+
+    if os.name != "nt":
+        for script, module, func in _console_scripts(entry_points):
+            path = "bin/" + script
+            dest = _target_path(target, path)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            with open(dest, "w") as output:
+                output.write(SCRIPT_TEMPLATE.format(
+                    python=python,
+                    module=module,
+                    import_name=func.split(".")[0],
+                    func=func,
+                ))
+            os.chmod(dest, 0o755)
+            installed.append(path)
+
+    with open(_target_path(target, dist_info + "/INSTALLER"), "w") as output:
+        output.write("pypackages\n")
+    if dist_info + "/INSTALLER" not in installed:
+        installed.append(dist_info + "/INSTALLER")
+
+    rows = {}
+    for row in csv.reader(io.StringIO(record)):
+        if row:
+            rows[moved.get(row[0], row[0])] = row
+    lines = io.StringIO()
+    writer = csv.writer(lines, lineterminator="\n")
+    for path in installed:
+        row = rows.get(path, [path, "", ""])
+        writer.writerow([path] + row[1:])
+    writer.writerow([dist_info + "/RECORD", "", ""])
+    with open(_target_path(target, dist_info + "/RECORD"), "w") as output:
+        output.write(lines.getvalue())
+    installed.append(dist_info + "/RECORD")
+
+    return installed
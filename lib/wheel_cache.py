@@ -0,0 +1,136 @@
+# encoding: utf-8
+
+"""
+Wheel store shared by all projects
+
+Wheels are kept in a single flat directory, so pip can use it directly with
+`--find-links` (also together with `--no-index` when working offline). A
+manifest maps each name, version and tag to the stored file and its sha256.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+from . import wheel
+
+
+MANIFEST_FILENAME = "manifest.json"
+
+_lock = threading.Lock()
+
+
+def sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as stream:
+        for chunk in iter(lambda: stream.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class WheelCache(object):
+    """
+    Content-verified wheel store
+
+    Attributes:
+        path (str): Directory containing the wheels
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    @staticmethod
+    def key(filename):
+        name, version, tag = wheel.parse_filename(filename)
+        return "{}-{}-{}".format(name.lower().replace("-", "_"), version, tag)
+
+    def _manifest_path(self):
+        return os.path.join(self.path, MANIFEST_FILENAME)
+
+    def _load(self):
+        try:
+            with open(self._manifest_path()) as manifest:
+                return json.load(manifest)
+        except (OSError, IOError, ValueError):
+            return {}
+
+    def _save(self, manifest):
+        tmp_path = self._manifest_path() + ".tmp"
+        with open(tmp_path, "w") as output:
+            json.dump(manifest, output, indent=1, sort_keys=True)
+        os.replace(tmp_path, self._manifest_path())
+
+    def find_links(self):
+        return ["--find-links", self.path]
+
+    def names(self):
+        """
+        Return the names of all stored projects, normalized as in `key`
+        """
+        with _lock:
+            manifest = self._load()
+        return set(
+            wheel.parse_filename(entry["filename"])[0].lower().replace("-", "_")
+            for entry in manifest.values()
+        )
+
+    def digest(self, filename):
+        """
+        Return the recorded sha256 of a stored wheel, if any
+        """
+        with _lock:
+            entry = self._load().get(self.key(filename))
+        return entry["sha256"] if entry else None
+
+    def get(self, filename):
+        """
+        Return the path of a stored wheel if its content is still intact
+        """
+        with _lock:
+            entry = self._load().get(self.key(filename))
+        if entry is None:
+            return None
+
+        path = os.path.join(self.path, entry["filename"])
+        try:
+            if sha256(path) == entry["sha256"]:
+                return path
+        except (OSError, IOError):
+            pass
+        return None
+
+    def add(self, wheel_path):
+        """
+        Store `wheel_path` unless an identical wheel is already stored
+        """
+        filename = os.path.basename(wheel_path)
+        key = self.key(filename)
+        digest = sha256(wheel_path)
+
+        os.makedirs(self.path, exist_ok=True)
+        with _lock:
+            manifest = self._load()
+            entry = manifest.get(key)
+            dest = os.path.join(self.path, filename)
+            if entry and entry["sha256"] == digest and os.path.exists(dest):
+                return dest
+
+            if os.path.abspath(wheel_path) != os.path.abspath(dest):
+                tmp_path = dest + ".tmp"
+                shutil.copyfile(wheel_path, tmp_path)
+                os.replace(tmp_path, dest)
+            manifest[key] = {"filename": filename, "sha256": digest}
+            self._save(manifest)
+        return dest
+
+    def add_all(self, directory):
+        """
+        Store all wheels found in `directory`
+        """
+        added = []
+        for name in os.listdir(directory):
+            if name.endswith(".whl"):
+                added.append(self.add(os.path.join(directory, name)))
+        return added
@@ -8,125 +8,560 @@ https://www.python.org/dev/peps/pep-0582/
 # TODO: Improve usage of `status_message`
 # TODO: Improve error handling and logging
 
+import json
 import os
 import re
 import shutil
-import subprocess
+import collections
+import tempfile
 import threading
+import time
+from urllib.parse import urlparse
+from urllib.request import url2pathname
 
 import sublime
 import sublime_plugin
 
 # pylint: disable=relative-beyond-top-level
-from .lib import pkg_resources
+from .lib import core
+from .lib import depgraph
+from .lib import index_snapshot
+from .lib import installer
+from .lib import interpreter
+from .lib import inventory
+from .lib import jobs
+from .lib import lockfile
+from .lib import metadata
+from .lib import perf
+from .lib import pip_worker
+from .lib import process
+from .lib import sync
+from .lib import uninstall
+from .lib import watcher
+from .lib.linker import UnpackedStore
 from .lib.thread_progress import ThreadProgress
+from .lib.wheel_cache import WheelCache
 
 
+def plugin_loaded():
+    settings = sublime.load_settings("pypackages.sublime-settings")
+    settings.clear_on_change("pypackages")
+    settings.add_on_change("pypackages", _on_settings_changed)
+    _on_settings_changed()
+
+def plugin_unloaded():
+    sublime.load_settings("pypackages.sublime-settings").clear_on_change("pypackages")
+    jobs.cancel_all()
+    pip_worker.shutdown()
+    watcher.stop_all()
+
+_python_executable = None
+
+def _on_settings_changed():
+    global _python_executable
+
+    _settings.clear()
+    _window_states.clear()
+
+    python = python_executable()
+    if python != _python_executable:
+        _python_executable = python
+        interpreter.clear_cache()
+
+    # Restart pip workers with the new settings when they are used next
+    pip_worker.shutdown()
+
+    if setting("pip_memory_limit", 0) and not process.memory_limit_supported():
+        log("pip_memory_limit is not applied, it needs prlimit on Linux")
+
+
+_settings = {}
+
+def setting(key, default=None):
+    """
+    Return a value of the PyPackages settings
+
+    Values are cached until the settings change, so reading them on hot
+    paths like `on_activated` does not call into Sublime Text.
+    """
+    # The settings may be cleared by another thread in the meantime
+    try:
+        value = _settings[key]
+    except KeyError:
+        value = _settings[key] = sublime.load_settings("pypackages.sublime-settings").get(key)
+    return default if value is None else value
+
 def log(msg):
     if not msg == "":
         print("[PyPackages] {}".format(msg))
 
 def debug_log(msg):
-    if sublime.load_settings("pypackages.sublime-settings").get("debug", False):
+    if setting("debug", False):
         if not msg == "":
             log("[DEBUG] {}".format(msg))
 
-def execute(cmd, env=None, cwd=None):
-    stdout, stderr = subprocess.Popen(
+def debug_cache_stats():
+    if setting("debug", False):
+        debug_log("Parser caches: {}".format(", ".join(
+            "{} {}/{} hits".format(name, info.hits, info.hits + info.misses)
+            for name, info in sorted(metadata.cache_stats().items())
+        )))
+
+def execute(cmd, env=None, cwd=None, on_line=None, job=None, limits=None):
+    result = process.run(
         cmd,
         env=env,
         cwd=cwd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
         shell=sublime.platform()=="windows",
-    ).communicate()
+        on_line=on_line,
+        job=job,
+        limits=limits,
+    )
 
-    debug_log("stdout: {}".format(stdout.decode()))
-    debug_log("stderr: {}".format(stderr.decode()))
+    debug_log("stdout: {}".format(result.stdout.decode()))
+    debug_log("stderr: {}".format(result.stderr.decode()))
 
-    return stdout, stderr
+    return result
 
-def pip(args, env=None, cwd=None):
+def pip(args, env=None, cwd=None, quiet=False, on_line=None, job=None):
+    """
+    Run pip with `args` and return a `process.Result`
+    """
     python = python_executable()
     pip_cmd = [python, "-m", "pip"] + args
 
     debug_log(pip_cmd)
-    stdout, stderr = execute(
-        pip_cmd,
-        env=env,
-        cwd=cwd,
-    )
-    if stderr:
+    started = time.monotonic()
+    limits = pip_limits()
+    result = None
+    if setting("pip_worker", False):
+        try:
+            worker = pip_worker.get(
+                python_interpreter().executable, setting("install_jobs", 1)
+            )
+            result = worker.run(
+                args, env=env, cwd=cwd, on_line=on_line, job=job, limits=limits
+            )
+        except pip_worker.WorkerError as error:
+            debug_log(str(error))
+
+    if result is None and job is not None and job.cancelled:
+        result = process.Result(1, b"", b"ERROR: Cancelled\n")
+    elif result is None:
+        result = execute(
+            pip_cmd,
+            env=env,
+            cwd=cwd,
+            on_line=on_line,
+            job=job,
+            limits=limits,
+        )
+    perf.record("pip", started, " ".join(args[:1]))
+    if pip_failed(result) and not quiet:
         log("Command \"{}\" failed".format(" ".join(pip_cmd)))
-        debug_log(stderr.decode())
+    if result.stderr:
+        debug_log(result.stderr.decode())
 
-    return stdout, stderr
+    return result
 
-def python_executable():
-    settings = sublime.load_settings("pypackages.sublime-settings")
-    return settings.get("python_executable").get(sublime.platform())
+def pip_limits():
+    return process.Limits(
+        timeout=setting("pip_timeout", 0),
+        nice=max(0, setting("pip_nice", 10)),
+        ionice=setting("pip_ionice", True),
+        memory=setting("pip_memory_limit", 0) * 1024 * 1024,
+    )
 
-def python_version():
-    stdout, stderr = execute(
-        [python_executable(), "--version"],
-        env=os.environ,
+def pip_failed(result):
+    """
+    Whether the pip run of the `process.Result` failed or was killed
+
+    Only the exit code counts, pip also prints notices like the one about
+    dependency conflicts as `ERROR:` lines of successful runs.
+    """
+    return result.returncode != 0
+
+def pip_index_args():
+    args = []
+    if setting("index_url"):
+        args += ["--index-url", setting("index_url")]
+    for link in setting("find_links", []):
+        args += ["--find-links", link]
+    if setting("no_index"):
+        args += ["--no-index"]
+    return args
+
+def wheel_cache():
+    if not setting("wheel_cache", True):
+        return None
+
+    return WheelCache(
+        setting("wheel_cache_path")
+        or os.path.join(sublime.cache_path(), "PyPackages", "wheels")
     )
-    if stderr:
-        raise PyPackagesError(stderr.decode())
 
-    return re.search("Python ([0-9]*\.[0-9]*)", stdout.decode()).group(1)
+def unpacked_store():
+    mode = setting("link_mode", "copy")
+    if mode == "copy":
+        return None
+
+    return UnpackedStore(
+        os.path.join(sublime.cache_path(), "PyPackages", "unpacked"), mode
+    )
+
+def local_index():
+    path = setting("index_snapshot")
+    if not path and setting("index_url", "").startswith("file://"):
+        path = url2pathname(urlparse(setting("index_url")).path)
+    if not path or not os.path.exists(path):
+        return None
+
+    return index_snapshot.get(path)
+
+def python_executable():
+    return setting("python_executable").get(sublime.platform())
+
+def python_interpreter():
+    try:
+        return interpreter.probe(python_executable())
+    except interpreter.ProbeError as error:
+        raise PyPackagesError(str(error))
+
+def python_version():
+    return python_interpreter().version
 
 def python_executable_path():
-    python = python_executable()
-    path = shutil.which(python)
-    return os.path.dirname(path if path else python)
+    return core.executable_dir(python_executable())
+
+_package_counts = {}
+
+def pkg_dists(packages_path, refresh=False):
+    """
+    Return the distributions installed in `packages_path`
+
+    A watched lib path is kept up to date by its watcher, so the last
+    listing is returned without touching the disk unless `refresh` is set.
+    """
+    packages = inventory.get(packages_path, python_version())
+    dists = None
+    if not refresh and watcher.watching(packages_path):
+        dists = packages.cached()
+    if dists is None:
+        dists = packages.refresh()
+    _package_counts[packages_path] = len(dists)
+    return dists
+
+def watch_packages(packages_path):
+    watcher.stop_all()
+    if setting("watch_packages", True):
+        watcher.watch(packages_path, _on_packages_changed, on_error=_on_watch_error)
+    threading.Thread(target=_on_packages_changed, args=(packages_path,)).start()
+
+def _on_watch_error(error):
+    log("Could not update the package list: {}".format(error))
+
+def _on_packages_changed(packages_path):
+    try:
+        dists = pkg_dists(packages_path, refresh=True)
+    except PyPackagesError as error:
+        debug_log("Could not list packages: {}".format(error))
+        return
+
+    debug_log("{} packages in {}".format(len(dists), packages_path))
+    sublime.set_timeout(update_status, 0)
+
+def status_text(packages_path):
+    count = _package_counts.get(packages_path)
+    if count is None:
+        return "__pypackages__"
+    return "__pypackages__ ({})".format(count)
+
+def update_status(view=None):
+    if not view:
+        view = sublime.active_window().active_view()
+    if not view:
+        return
+
+    packages_path = os.getenv("PYPACKAGESPATH")
+    if packages_path:
+        view.set_status("pypackages", status_text(packages_path))
+    else:
+        view.erase_status("pypackages")
+
+def pkg_graph(packages_path):
+    graph = depgraph.get(packages_path, python_interpreter().markers).update(
+        pkg_dists(packages_path)
+    )
+    debug_cache_stats()
+    return graph
 
 def pkg_list(packages_path):
-    pkg_path = pkg_resources.Environment([packages_path], python=python_version())
-
-    packages = []
-    for version in pkg_path:
-        for package in pkg_path[version]:
-            packages.append("{}=={}".format(package.project_name, package.version))
+    packages = core.package_list(pkg_dists(packages_path))
 
     if not packages:
         sublime.status_message("No packages found")
 
+    debug_cache_stats()
     return packages
 
-def project_path(window=None):
-    if not window:
-        window = sublime.active_window()
-    return window.extract_variables().get("project_path", ".")
+_outdated = {}
 
-def pypackages_path(window=None):
+def pkg_outdated(packages_path, refresh=True):
+    """
+    Return `(name, version, latest)` of all outdated packages
+
+    The last result of each lib path is cached. With `refresh=False` the
+    cached result is returned if there is one.
+    """
+    if not refresh and packages_path in _outdated:
+        return _outdated[packages_path]
+
+    snapshot = local_index()
+    if snapshot is None:
+        return None
+
+    outdated = [
+        (dist.project_name, dist.version, latest)
+        for dist, latest in snapshot.outdated(pkg_dists(packages_path))
+    ]
+    _outdated[packages_path] = outdated
+    return outdated
+
+WindowState = collections.namedtuple(
+    "WindowState", ["project_file", "project_path", "pypackages_path", "pypackages_exists"]
+)
+
+_window_states = {}
+
+def window_state(window=None):
+    """
+    Return the project paths of `window`
+
+    They are cached until the settings change or the window switches or
+    saves its project, so that switching views does not cost any I/O. As
+    the project events only exist in Sublime Text 4, a cached state is also
+    dropped when the project file of the window differs from its own.
+    """
     if not window:
         window = sublime.active_window()
 
-    pypackages_root = window.active_view().settings().get(
-        "pypackages_root", project_path(window)
-    )
-    pypackages_root = sublime.expand_variables(
-        pypackages_root, window.extract_variables()
-    )
+    state = _window_states.get(window.id())
+    if state is None or state.project_file != window.project_file_name():
+        started = time.monotonic()
+        variables = window.extract_variables()
+        project = variables.get("project_path", ".")
+
+        # Without any open view the project settings can not be read, so
+        # the state is not cached until there is one
+        view = window.active_view()
+        pypackages_root = project
+        if view is not None:
+            pypackages_root = view.settings().get("pypackages_root", project)
+        pypackages_root = sublime.expand_variables(pypackages_root, variables)
+
+        debug_log("pypackages_root: {}".format(pypackages_root))
+
+        path = core.pypackages_path(pypackages_root)
+        state = WindowState(
+            window.project_file_name(), project, path, os.path.exists(path)
+        )
+        if view is not None:
+            _window_states[window.id()] = state
+        perf.record("paths", started, project)
+    return state
 
-    debug_log("pypackages_root: {}".format(pypackages_root))
+def forget_window_state(window=None):
+    if window is None:
+        _window_states.clear()
+    else:
+        _window_states.pop(window.id(), None)
 
-    return os.path.join(pypackages_root, "__pypackages__")
+def project_path(window=None):
+    return window_state(window).project_path
+
+def pypackages_path(window=None):
+    return window_state(window).pypackages_path
 
 def pypackages_lib_path(window=None):
     if not window:
         window = sublime.active_window()
 
-    return os.path.join(pypackages_path(window), python_version(), "lib")
+    return core.lib_path(pypackages_path(window), python_version())
 
 
 class PyPackagesError(Exception):
     pass
 
 
+class OutputPanel(object):
+    name = "pypackages"
+
+    def __init__(self, window):
+        self.window = window
+        self.view = window.create_output_panel(self.name)
+
+    def show(self):
+        self.window.run_command("show_panel", {"panel": "output." + self.name})
+
+    def append(self, text):
+        sublime.set_timeout(lambda: self.view.run_command(
+            "append", {"characters": text, "force": True, "scroll_to_end": True}
+        ), 0)
+
+
+class MultiSelectPanel(object):
+    """
+    Quick panel in which several items can be marked before confirming
+
+    Attributes:
+        window (sublime.Window): The window to show the panel in
+        items (list): The item labels
+        on_done (callable): Called with the indices of the marked items
+        actions (list): Additional `(label, callback)` rows which run their
+            callback as soon as they are picked
+    """
+
+    def __init__(self, window, items, on_done, actions=()):
+        self.window = window
+        self.items = items
+        self.on_done = on_done
+        self.actions = list(actions)
+        self.marked = set()
+
+    def show(self, selected_index=0):
+        rows = ["Done ({} selected)".format(len(self.marked))]
+        rows += [label for label, _ in self.actions]
+        rows += [
+            "[{}] {}".format("x" if index in self.marked else " ", item)
+            for index, item in enumerate(self.items)
+        ]
+        self.window.show_quick_panel(rows, self._select, selected_index=selected_index)
+
+    def _select(self, index):
+        if index < 0:
+            return
+        if index == 0:
+            if self.marked:
+                self.on_done(sorted(self.marked))
+            return
+        if index <= len(self.actions):
+            self.actions[index - 1][1]()
+            return
+
+        self.marked ^= {index - len(self.actions) - 1}
+        sublime.set_timeout(lambda: self.show(index), 10)
+
+
 class PypackagesCommand(sublime_plugin.WindowCommand):
 
+    def _start(self, target, *args):
+        """
+        Queue `target(*args)` as a job changing the packages of the project
+        """
+        return self._submit(target, args, mutating=True)
+
+    def _submit(self, target, args=(), mutating=False):
+        queue = jobs.get(self._get_project_path())
+        job = queue.submit(
+            self._run_job, [target, args],
+            mutating=mutating,
+            key=(type(self).__name__, target.__name__, repr(args)),
+        )
+        if job.merged:
+            sublime.status_message("PyPackages: Already queued")
+        elif mutating:
+            job.progress = ThreadProgress(
+                job,
+                "PyPackages" if queue.active() is job else "PyPackages: Waiting",
+                queue=queue,
+            )
+        return job
+
+    def _run_job(self, target, args):
+        job = jobs.current()
+        if job.mutating:
+            self.job = job
+            self.panel = None
+            if getattr(job, "progress", None):
+                job.progress.message = "PyPackages"
+
+        try:
+            with perf.span("job", "{}.{}".format(type(self).__name__, target.__name__)):
+                target(*args)
+        finally:
+            if job.mutating:
+                self.job = None
+            if job.cancelled:
+                log("Cancelled")
+            if job.cpu_time:
+                debug_log("pip used {:.1f} s CPU time, peak memory {:.0f} MB".format(
+                    job.cpu_time, job.max_rss / 1024.0 / 1024.0
+                ))
+
+    def _panel_shown(self):
+        # Time from the start of the job to showing its quick panel
+        job = jobs.current()
+        if job is not None:
+            perf.record("quick_panel", job.started, type(self).__name__)
+
+    def _output(self, text):
+        if not getattr(self, "panel", None):
+            self.panel = OutputPanel(self.window)
+            if setting("output_panel", True):
+                self.panel.show()
+        self.panel.append(text)
+
+    def _pip(self, args, panel=True, **kwds):
+        if panel:
+            self._output("$ pip {}\n".format(" ".join(args)))
+        # Installer pool threads run outside of the job's thread
+        job = jobs.current() or getattr(self, "job", None)
+        return pip(
+            args, on_line=self._on_pip_line if panel else None, job=job, **kwds
+        )
+
+    def _on_pip_line(self, stream, line):
+        self._output(line + "\n")
+        message = process.progress_message(line)
+        if message:
+            self._on_progress(message)
+
+    def _on_progress(self, message):
+        progress = getattr(getattr(self, "job", None), "progress", None)
+        if progress:
+            progress.message = "PyPackages: {}".format(message)
+
+    def _engine(self, upgrade=False):
+        env = self._get_env()
+        cwd = self._get_project_path()
+        return installer.ParallelInstaller(
+            lambda args, quiet=False: self._pip(
+                args, env=env, cwd=cwd, quiet=quiet
+            ),
+            self._get_pypackages_lib_path(),
+            python=python_interpreter().executable,
+            jobs=setting("install_jobs", 1),
+            upgrade=upgrade,
+            on_progress=self._on_progress,
+            cache=wheel_cache(),
+            index_args=pip_index_args(),
+            store=unpacked_store(),
+            version=python_version(),
+        )
+
+    def _refresh_outdated(self):
+        # The operation may have created `__pypackages__`
+        forget_window_state(self.window)
+
+        lib_path = self._get_pypackages_lib_path()
+        pkg_dists(lib_path, refresh=True)
+        sublime.set_timeout(update_status, 0)
+        if lib_path in _outdated:
+            try:
+                pkg_outdated(lib_path)
+            except (OSError, IOError, ValueError) as error:
+                debug_log("Index snapshot: {}".format(error))
+
     def _get_project_path(self):
         return project_path(self.window)
 
@@ -137,27 +572,9 @@ class PypackagesCommand(sublime_plugin.WindowCommand):
         return pypackages_lib_path(self.window)
 
     def _get_env(self, env=None):
-        if not env:
-            env = os.environ
-
-        path = env.get("PATH", "")
-        pythonpath = env.get("PYTHONPATH", "")
-        env["PYPACKAGESPATH"] = self._get_pypackages_lib_path()
-        pypackages = os.pathsep.join([".", env["PYPACKAGESPATH"]])
-
-        if not pythonpath.startswith(pypackages):
-            env["PYTHONPATH"] = os.pathsep.join(
-                [pypackages, pythonpath]
-            )
-
-        python_path = python_executable_path()
-        if not path.startswith(python_path):
-            # Adds an additional pathsep to make the change trackable
-            env["PATH"] = os.pathsep.join(
-                [python_path, "", path]
-            )
-
-        return env
+        return core.environment(
+            self._get_pypackages_lib_path(), python_executable(), env or os.environ
+        )
 
 
 class PypackagesProjectCommand(PypackagesCommand):
@@ -165,6 +582,13 @@ class PypackagesProjectCommand(PypackagesCommand):
         return bool(self._get_project_path() and os.getenv("PYPACKAGESPATH"))
 
 
+PROJECT_COMMANDS = (
+    "close_project", "close_workspace", "open_project", "open_recent_project",
+    "open_recent_project_or_workspace", "prompt_open_project_or_workspace",
+    "prompt_select_workspace", "switch_project",
+)
+
+
 class ProjectEnvironmentListener(sublime_plugin.EventListener):
     def __init__(self, *args, **kwds):
         super(ProjectEnvironmentListener, self).__init__(*args, **kwds)
@@ -173,22 +597,37 @@ class ProjectEnvironmentListener(sublime_plugin.EventListener):
         self.pypackages = None
 
     def on_activated(self, view):
-        if os.getenv("PYPACKAGESPATH"):
-            view.set_status("pypackages", "__pypackages__")
-        else:
-            view.erase_status("pypackages")
+        update_status(view)
 
-        active_project = sublime.active_window().project_file_name()
-        if active_project == self.active_project:
+        state = window_state()
+        if state.project_file == self.active_project:
             return
         else:
-            self.active_project = active_project
-            if sublime.load_settings("pypackages.sublime-settings").get("auto_toggle"):
-                if self.active_project and os.path.exists(pypackages_path()):
+            self.active_project = state.project_file
+            if setting("auto_toggle"):
+                if self.active_project and state.pypackages_exists:
                     threading.Thread(target=self._enable_pypackages).start()
                 else:
                     threading.Thread(target=self._disable_pypackages).start()
 
+    def on_post_window_command(self, window, command, args):
+        if command in PROJECT_COMMANDS:
+            forget_window_state(window)
+
+    def on_load_project(self, window):
+        forget_window_state(window)
+
+    def on_post_save_project(self, window):
+        forget_window_state(window)
+
+    def on_pre_close_window(self, window):
+        forget_window_state(window)
+
+    def on_post_save(self, view):
+        # Project settings like `pypackages_root` may have changed
+        if (view.file_name() or "").endswith(".sublime-project"):
+            forget_window_state()
+
     def _enable_pypackages(self):
         sublime.active_window().run_command("enable_pypackages")
 
@@ -203,10 +642,11 @@ class EnablePypackagesCommand(PypackagesCommand):
                 sublime.active_window().run_command("disable_pypackages", args={"quiet": True})
 
             sublime.status_message("PyPackages enabled")
-            sublime.active_window().active_view().set_status("pypackages", "__pypackages__")
             log("Set local environment")
 
             os.environ = self._get_env()
+            update_status()
+            watch_packages(os.environ["PYPACKAGESPATH"])
 
             debug_log("PYPACKAGESPATH=\"{}\"".format(os.getenv("PYPACKAGESPATH", "")))
             debug_log("PYTHONPATH=\"{}\"".format(os.getenv("PYTHONPATH", "")))
@@ -225,11 +665,12 @@ class DisablePypackagesCommand(PypackagesCommand):
             return
 
         sublime.status_message("PyPackages disabled")
-        sublime.active_window().active_view().erase_status("pypackages")
         if not quiet:
             log("Unset local environment")
 
+        watcher.stop_all()
         del os.environ["PYPACKAGESPATH"]
+        update_status()
 
         os.environ["PYTHONPATH"] = re.sub(
             r"\.{pathsep}.*__pypackages__{sep}[0-9]+\.[0-9]+{sep}lib{pathsep}"
@@ -252,12 +693,20 @@ class DisablePypackagesCommand(PypackagesCommand):
 
 
 class PypackagesInstallCommand(PypackagesProjectCommand):
-    def run(self, upgrade=False, requirements=False):
+    def run(self, upgrade=False, requirements=False, batch=False, packages=None,
+            lock=False):
         self.upgrade = upgrade
         self.requirements = requirements
+        self.batch = batch
 
-        if upgrade:
-            threading.Thread(target=self._list).start()
+        if packages:
+            self._install(packages)
+        elif upgrade:
+            self._submit(self._list)
+        elif lock:
+            self.window.show_input_panel(
+                "Lock file:", lockfile.LOCK_FILENAME, self._install_lock, None, None
+            )
         else:
             label = "Packages"
             text = ""
@@ -270,24 +719,62 @@ class PypackagesInstallCommand(PypackagesProjectCommand):
             )
 
     def _install(self, args):
-        thread = threading.Thread(target=self._install_thread, args=[args])
-        thread.start()
-        ThreadProgress(thread)
+        self._start(self._install_thread, args, self.requirements, self.upgrade)
 
-    def _install_thread(self, args):
-        install_args = ["install", "--target", self._get_pypackages_lib_path()]
+    def _install_thread(self, args, requirements=False, upgrade=False):
+        # Queued jobs must not see the flags of later runs of the command
+        self.requirements = requirements
+        self.upgrade = upgrade
+        self._install_packages(args)
+        self._refresh_outdated()
 
+    def _install_packages(self, args):
         if self.requirements:
-            install_args += ["-r", os.path.join(self._get_project_path(), args)]
+            requirements = ["-r", os.path.join(self._get_project_path(), args)]
         else:
-            install_args += args.split()
+            requirements = args.split()
+
+        if setting("install_jobs", 1) > 1 or setting("link_mode", "copy") != "copy":
+            self._parallel_install(requirements)
+            return
+
+        install_args = ["install", "--target", self._get_pypackages_lib_path()]
 
         if self.upgrade:
             install_args += ["--upgrade"]
 
-        stdout, stderr = pip(
-            install_args, env=self._get_env(), cwd=self._get_project_path()
-        )
+        env = self._get_env()
+        cwd = self._get_project_path()
+        cache = wheel_cache()
+
+        result = None
+        if cache:
+            install_args += cache.find_links()
+            if not self.upgrade and not self._cache_miss(cache, requirements):
+                # Try to install everything from the wheel cache first
+                result = self._pip(
+                    install_args + ["--no-index"] + requirements,
+                    env=env,
+                    cwd=cwd,
+                    quiet=True,
+                    panel=False,
+                )
+                # Only a successful attempt is shown, a miss is retried below
+                if not pip_failed(result):
+                    self._output("$ pip {}\n{}".format(
+                        " ".join(install_args + ["--no-index"] + requirements),
+                        result.stdout.decode("utf-8", "replace"),
+                    ))
+            if result is None or pip_failed(result):
+                result = None
+                if self._fill_cache(cache, requirements, env, cwd):
+                    install_args += ["--no-index"]
+
+        if result is None:
+            result = self._pip(
+                install_args + pip_index_args() + requirements, env=env, cwd=cwd
+            )
+        _, stdout, stderr = result
         if stderr:
             for line in stderr.decode().split(os.linesep):
                 if "--upgrade" in line:
@@ -306,34 +793,316 @@ class PypackagesInstallCommand(PypackagesProjectCommand):
                 if "Successfully" in line:
                     log(line.strip())
 
+    @staticmethod
+    def _cache_miss(cache, requirements):
+        # Only requirements without any stored wheel are known to miss, as
+        # their dependencies are unknown until pip resolved them
+        try:
+            if requirements[:1] == ["-r"]:
+                parsed = sync.read_requirements(requirements[1])
+            else:
+                parsed = [lockfile.parse_requirement(line) for line in requirements]
+        except (sync.SyncError, lockfile.LockError):
+            return True
+        # Parsed names are canonical already, wheel filenames keep their dots
+        names = set(installer.canonical_name(name) for name in cache.names())
+        return any(requirement["name"] not in names for requirement in parsed)
+
+    def _fill_cache(self, cache, requirements, env, cwd):
+        self._on_progress("Building wheels")
+        wheel_dir = tempfile.mkdtemp(prefix="pypackages-")
+        try:
+            result = self._pip(
+                ["wheel", "--wheel-dir", wheel_dir]
+                + cache.find_links() + pip_index_args() + requirements,
+                env=env,
+                cwd=cwd,
+            )
+            cache.add_all(wheel_dir)
+        finally:
+            shutil.rmtree(wheel_dir, ignore_errors=True)
+        return not pip_failed(result)
+
+    def _parallel_install(self, requirements):
+        try:
+            installed, skipped = self._engine(self.upgrade).install(requirements)
+        except installer.InstallError as error:
+            log("Install failed")
+            debug_log(str(error))
+            return
+
+        for name, _ in skipped:
+            log("{} already exists. Upgrade to replace it.".format(name))
+        if installed:
+            log("Successfully installed {}".format(
+                " ".join("{}-{}".format(*dist) for dist in installed)
+            ))
+
+    def _install_lock(self, filename):
+        self._start(self._install_lock_thread, filename)
+
+    def _install_lock_thread(self, filename):
+        lib_path = self._get_pypackages_lib_path()
+        try:
+            lock = core.load_lock(
+                os.path.join(self._get_project_path(), filename), python_version()
+            )
+        except lockfile.LockError as error:
+            log(str(error))
+            return
+
+        missing = lockfile.missing(lock, pkg_dists(lib_path))
+        if not missing:
+            sublime.status_message("All locked packages are installed")
+            return
+
+        try:
+            installed, _ = self._engine().install_locked(missing, lockfile.top_level(lock))
+        except installer.InstallError as error:
+            log("Install failed")
+            debug_log(str(error))
+            return
+
+        log("Successfully installed {}".format(
+            " ".join("{}-{}".format(*dist) for dist in installed)
+        ))
+        self._refresh_outdated()
+
     def _upgrade(self, package_index):
         if package_index < 0:
             return
 
         package = self.packages[package_index]
-        self._install(package.split()[0])
+        self._install(package.split("==")[0])
+
+    def _upgrade_batch(self, package_indices):
+        self._install(" ".join(
+            self.packages[index].split("==")[0] for index in package_indices
+        ))
+
+    def _upgrade_outdated(self):
+        self._start(self._upgrade_outdated_thread)
+
+    def _upgrade_outdated_thread(self):
+        _, stdout, _ = self._pip(
+            ["list", "--outdated", "--format=json", "--path", self._get_pypackages_lib_path()]
+            + pip_index_args(),
+            env=self._get_env(),
+            cwd=self._get_project_path(),
+        )
+        try:
+            outdated = [package["name"] for package in json.loads(stdout.decode())]
+        except ValueError:
+            outdated = []
+
+        if outdated:
+            self._install_thread(" ".join(outdated), upgrade=True)
+        else:
+            sublime.status_message("All packages are up to date")
 
     def _list(self):
         self.packages = pkg_list(self._get_pypackages_lib_path())
-        self.window.show_quick_panel(self.packages, self._upgrade)
+        self._panel_shown()
+        if self.batch:
+            MultiSelectPanel(self.window, self.packages, self._upgrade_batch, actions=[
+                ("All outdated", self._upgrade_outdated),
+                ("All", lambda: self._upgrade_batch(range(len(self.packages)))),
+            ]).show()
+        else:
+            self.window.show_quick_panel(self.packages, self._upgrade)
+
+
+class PypackagesSyncCommand(PypackagesProjectCommand):
+    def run(self):
+        text = "requirements.txt"
+        if os.path.exists(os.path.join(self._get_project_path(), lockfile.LOCK_FILENAME)):
+            text = lockfile.LOCK_FILENAME
+
+        self.window.show_input_panel("Sync with:", text, self._sync, None, None)
+
+    def _sync(self, filename):
+        self._start(self._sync_thread, filename)
+
+    def _sync_thread(self, filename):
+        path = os.path.join(self._get_project_path(), filename)
+        lib_path = self._get_pypackages_lib_path()
+        dists = pkg_dists(lib_path)
+
+        try:
+            plan = core.sync_plan(
+                lib_path, path, dists, python_version(), python_interpreter().markers
+            )
+        except (lockfile.LockError, sync.SyncError) as error:
+            log(str(error))
+            return
+
+        if not plan.install and not plan.remove:
+            sublime.status_message("Already in sync with {}".format(filename))
+            return
+
+        try:
+            removed, installed = core.apply_plan(
+                plan,
+                self._engine(),
+                locked=core.is_lock(path),
+                on_progress=self._on_progress,
+            )
+        except (installer.InstallError, uninstall.UninstallError) as error:
+            log("Sync failed")
+            debug_log(str(error))
+            return
+
+        if removed:
+            log("Successfully uninstalled {}".format(" ".join(
+                "{}-{}".format(dist.project_name, dist.version) for dist in removed
+            )))
+        if installed:
+            log("Successfully installed {}".format(
+                " ".join("{}-{}".format(*dist) for dist in installed)
+            ))
+
+        self._refresh_outdated()
 
 
 class PypackagesListCommand(PypackagesProjectCommand):
     def run(self):
         if os.path.exists(self._get_pypackages_path()):
-            threading.Thread(target=self._list).start()
+            self._submit(self._list)
         else:
             sublime.status_message("No __pypackages__ directory")
 
     def _list(self):
         packages = pkg_list(self._get_pypackages_lib_path())
+        self._panel_shown()
         self.window.show_quick_panel(packages, None)
 
 
-class PypackagesUninstallCommand(PypackagesProjectCommand):
+class PypackagesOutdatedCommand(PypackagesProjectCommand):
+    def run(self):
+        if not os.path.exists(self._get_pypackages_path()):
+            sublime.status_message("No __pypackages__ directory")
+            return
+        if local_index() is None:
+            sublime.status_message("No index snapshot configured")
+            return
+
+        # Show the last result right away and refresh it in the background
+        lib_path = self._get_pypackages_lib_path()
+        cached = _outdated.get(lib_path)
+        if cached is not None:
+            self._show(cached)
+        self._submit(self._refresh, (lib_path, cached is None))
+
+    def _refresh(self, lib_path, show):
+        try:
+            outdated = pkg_outdated(lib_path)
+        except (OSError, IOError, ValueError) as error:
+            log("Could not read index snapshot: {}".format(error))
+            return
+        if show:
+            self._show(outdated)
+
+    def _show(self, outdated):
+        self.outdated = outdated
+        if not outdated:
+            sublime.status_message("All packages are up to date")
+            return
+
+        self._panel_shown()
+        self.window.show_quick_panel(
+            ["{}=={} (latest: {})".format(*package) for package in outdated],
+            self._upgrade,
+        )
+
+    def _upgrade(self, package_index):
+        if package_index < 0:
+            return
+
+        self.window.run_command("pypackages_install", {
+            "upgrade": True, "packages": self.outdated[package_index][0],
+        })
+
+
+class PypackagesCheckCommand(PypackagesProjectCommand):
     def run(self):
         if os.path.exists(self._get_pypackages_path()):
-            threading.Thread(target=self._list).start()
+            self._submit(self._check)
+        else:
+            sublime.status_message("No __pypackages__ directory")
+
+    def _check(self):
+        self.problems = pkg_graph(self._get_pypackages_lib_path()).check()
+        if not self.problems:
+            sublime.status_message("No broken dependencies found")
+            return
+
+        self._panel_shown()
+        self.window.show_quick_panel([
+            "{}=={} requires {} ({})".format(
+                problem.project_name, problem.version, problem.requirement,
+                "installed: " + problem.installed if problem.installed else "missing",
+            )
+            for problem in self.problems
+        ], self._fix)
+
+    def _fix(self, problem_index):
+        if problem_index < 0:
+            return
+
+        problem = self.problems[problem_index]
+        self.window.run_command("pypackages_install", {
+            "upgrade": problem.installed is not None,
+            "packages": problem.requirement,
+        })
+
+
+class PypackagesReverseDependenciesCommand(PypackagesProjectCommand):
+    def run(self):
+        if os.path.exists(self._get_pypackages_path()):
+            self._submit(self._list)
+        else:
+            sublime.status_message("No __pypackages__ directory")
+
+    def _list(self):
+        self.graph = pkg_graph(self._get_pypackages_lib_path())
+        self.names = sorted(self.graph.dists)
+        self._panel_shown()
+        self.window.show_quick_panel([
+            "{}=={}".format(
+                self.graph.dists[name].project_name, self.graph.dists[name].version
+            )
+            for name in self.names
+        ], self._show)
+
+    def _show(self, package_index):
+        if package_index < 0:
+            return
+
+        name = self.names[package_index]
+        edges = self.graph.reverse(name)
+        if not edges:
+            sublime.status_message("No installed package requires {}".format(
+                self.graph.dists[name].project_name
+            ))
+            return
+
+        rows = []
+        for edge in edges:
+            dist = self.graph.dists[edge.source]
+            rows.append("{}=={} requires {}".format(
+                dist.project_name, dist.version,
+                depgraph.requirement_string(edge.requirement),
+            ))
+        sublime.set_timeout(lambda: self.window.show_quick_panel(rows, None), 10)
+
+
+class PypackagesUninstallCommand(PypackagesProjectCommand):
+    def run(self, batch=False, orphans=False):
+        self.batch = batch
+        self.orphans = orphans
+
+        if os.path.exists(self._get_pypackages_path()):
+            self._submit(self._list)
         else:
             sublime.status_message("No __pypackages__ directory")
 
@@ -341,16 +1110,71 @@ class PypackagesUninstallCommand(PypackagesProjectCommand):
         if package_index < 0:
             return
 
-        package = self.packages[package_index]
-        thread = threading.Thread(target=self._uninstall_thread, args=[package])
-        thread.start()
-        ThreadProgress(thread)
+        self._start(self._uninstall_thread, [self.dists[package_index]], self.orphans)
 
-    def _uninstall_thread(self, package):
+    def _uninstall_batch(self, package_indices):
+        self._start(
+            self._uninstall_thread,
+            [self.dists[index] for index in package_indices],
+            self.orphans,
+        )
 
-        uninstall_args = ["uninstall", "-y", package.split()[0]]
+    def _uninstall_thread(self, dists, orphans=False):
+        graph = pkg_graph(self._get_pypackages_lib_path())
+        names = set(installer.canonical_name(dist.project_name) for dist in dists)
+
+        dependents = sorted(set(
+            edge.source for name in names for edge in graph.reverse(name)
+        ) - names)
+        if dependents and not sublime.ok_cancel_dialog(
+            "{} still required by:\n\n{}\n\nUninstall anyway?".format(
+                ", ".join(dist.project_name for dist in dists),
+                "\n".join(graph.dists[name].project_name for name in dependents),
+            ),
+            "Uninstall",
+        ):
+            return
 
-        stdout, stderr = pip(
+        if orphans:
+            unused = graph.orphans(names)
+            if unused and sublime.ok_cancel_dialog(
+                "Also remove dependencies no other package requires?\n\n{}".format(
+                    "\n".join(
+                        "{}=={}".format(graph.dists[name].project_name, graph.dists[name].version)
+                        for name in unused
+                    )
+                ),
+                "Remove",
+            ):
+                dists = dists + [graph.dists[name] for name in unused]
+
+        self._uninstall_dists(dists)
+        self._refresh_outdated()
+
+    def _uninstall_dists(self, dists):
+        lib_path = self._get_pypackages_lib_path()
+        try:
+            removed = uninstall.uninstall(lib_path, [dist.entry for dist in dists])
+        except uninstall.UninstallError as error:
+            debug_log(str(error))
+            for dist in dists:
+                self._pip_uninstall(dist)
+            return
+
+        for dist in dists:
+            paths = removed[dist.entry]
+            log("Successfully uninstalled {}-{} ({} files)".format(
+                dist.project_name, dist.version, len(paths)
+            ))
+            for path in paths:
+                self._output("Removed {}\n".format(os.path.join(lib_path, path)))
+
+    def _pip_uninstall(self, dist):
+        uninstall_args = [
+            "uninstall", "-y", "{}=={}".format(dist.project_name, dist.version)
+        ]
+
+        _, stdout, stderr = self._pip(
             uninstall_args, env=self._get_env(), cwd=self._get_project_path()
         )
         if stderr:
@@ -361,8 +1185,64 @@ class PypackagesUninstallCommand(PypackagesProjectCommand):
                     log(line.strip())
 
     def _list(self):
-        self.packages = pkg_list(self._get_pypackages_lib_path())
-        self.window.show_quick_panel(self.packages, self._uninstall)
+        self.dists = pkg_dists(self._get_pypackages_lib_path())
+        if not self.dists:
+            sublime.status_message("No packages found")
+            return
+
+        packages = [
+            "{}=={}".format(dist.project_name, dist.version) for dist in self.dists
+        ]
+        self._panel_shown()
+        if self.batch:
+            MultiSelectPanel(self.window, packages, self._uninstall_batch, actions=[
+                ("All", lambda: self._uninstall_batch(range(len(self.dists)))),
+            ]).show()
+        else:
+            self.window.show_quick_panel(packages, self._uninstall)
+
+
+class PypackagesCancelCommand(PypackagesProjectCommand):
+    def run(self):
+        if jobs.get(self._get_project_path()).cancel():
+            sublime.status_message("Cancelling...")
+        else:
+            sublime.status_message("Nothing to cancel")
+
+    def is_enabled(self):
+        return bool(
+            super(PypackagesCancelCommand, self).is_enabled()
+            and jobs.get(self._get_project_path()).active()
+        )
+
+
+class PypackagesPerformanceReportCommand(PypackagesCommand):
+    def run(self, export=False):
+        if not perf.spans():
+            sublime.status_message("No performance data recorded yet")
+            return
+
+        if export:
+            self.window.show_input_panel(
+                "Trace file:",
+                os.path.join(self._get_project_path(), "pypackages-trace.jsonl"),
+                self._export, None, None,
+            )
+            return
+
+        view = self.window.new_file()
+        view.set_name("PyPackages Performance")
+        view.set_scratch(True)
+        view.run_command("append", {"characters": perf.report()})
+        view.set_read_only(True)
+
+    def _export(self, path):
+        try:
+            count = perf.export(path)
+        except (OSError, IOError) as error:
+            log("Could not write {}: {}".format(path, error))
+            return
+        sublime.status_message("Wrote {} spans to {}".format(count, path))
 
 
 class PypackagesFreezeCommand(PypackagesProjectCommand):
@@ -375,12 +1255,44 @@ class PypackagesFreezeCommand(PypackagesProjectCommand):
             sublime.status_message("No __pypackages__ directory")
 
     def _freeze(self, filename):
+        self._submit(self._freeze_thread, (filename,))
+
+    def _freeze_thread(self, filename):
         sublime.status_message("Freezing pip packages...")
 
         target_file = os.path.join(self._get_project_path(), filename)
         debug_log("Requirements file: {}".format(target_file))
 
-        with open(target_file, "w") as target:
-            for package in pkg_list(self._get_pypackages_lib_path()):
-                debug_log(package)
-                print(package, file=target)
+        lib_path = self._get_pypackages_lib_path()
+        for package in core.freeze(pkg_dists(lib_path), target_file):
+            debug_log(package)
+
+
+class PypackagesLockCommand(PypackagesProjectCommand):
+    def run(self):
+        if os.path.exists(self._get_pypackages_path()):
+            self.window.show_input_panel(
+                "Lock file:", lockfile.LOCK_FILENAME, self._lock, None, None
+            )
+        else:
+            sublime.status_message("No __pypackages__ directory")
+
+    def _lock(self, filename):
+        self._submit(self._lock_thread, (filename,))
+
+    def _lock_thread(self, filename):
+        sublime.status_message("Locking pip packages...")
+
+        target_file = os.path.join(self._get_project_path(), filename)
+        debug_log("Lock file: {}".format(target_file))
+
+        lib_path = self._get_pypackages_lib_path()
+        lock = lockfile.create(
+            lib_path, pkg_dists(lib_path), python_version(), wheel_cache()
+        )
+        lockfile.save(lock, target_file)
+
+        unpinned = [package["name"] for package in lock["packages"] if not package["sha256"]]
+        if unpinned:
+            log("Not in the wheel cache, locked without sha256: {}".format(", ".join(unpinned)))
+        sublime.status_message("Locked {} packages".format(len(lock["packages"])))
@@ -0,0 +1,78 @@
+# encoding: utf-8
+
+import shutil
+import tempfile
+import unittest
+
+from lib import depgraph
+from lib import inventory
+
+from .util import make_dist
+
+
+ENVIRONMENT = {"python_version": "3.8", "sys_platform": "linux"}
+
+
+class TestDependencyGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.lib_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.lib_path)
+
+    def graph(self):
+        graph = depgraph.DependencyGraph(self.lib_path, ENVIRONMENT)
+        return graph.update(inventory.Inventory(self.lib_path).refresh())
+
+    def problems(self):
+        return sorted(
+            (problem[0], problem[2], problem[3]) for problem in self.graph().check()
+        )
+
+    def test_pep440_operators(self):
+        make_dist(self.lib_path, "app", "1.0", [
+            "compat (~=1.4)", "prefix (==2.0.*)", "exact (===3.0)",
+        ])
+        make_dist(self.lib_path, "compat", "1.9")
+        make_dist(self.lib_path, "prefix", "2.0.7")
+        make_dist(self.lib_path, "exact", "3.0")
+        self.assertEqual(self.problems(), [])
+
+    def test_conflicts(self):
+        make_dist(self.lib_path, "app", "1.0", [
+            "compat (~=1.4)", "prefix (==2.0.*)", "missing",
+        ])
+        make_dist(self.lib_path, "compat", "2.0")
+        make_dist(self.lib_path, "prefix", "2.1")
+        self.assertEqual(self.problems(), [
+            ("app", "compat~=1.4", "2.0"),
+            ("app", "missing", None),
+            ("app", "prefix==2.0.*", "2.1"),
+        ])
+
+    def test_invalid_specifier_is_reported(self):
+        make_dist(self.lib_path, "app", "1.0", ["dep (<1.0.*)"])
+        make_dist(self.lib_path, "dep", "0.5")
+        self.assertEqual(self.problems(), [("app", "dep<1.0.*", "0.5")])
+
+    def test_markers(self):
+        make_dist(self.lib_path, "app", "1.0", [
+            'legacy; python_version < "3"', 'tests; extra == "test"',
+        ])
+        self.assertEqual(self.problems(), [])
+
+    def test_orphans(self):
+        make_dist(self.lib_path, "app", "1.0", ["dep"])
+        make_dist(self.lib_path, "dep", "1.0", ["subdep"])
+        make_dist(self.lib_path, "subdep", "1.0")
+        make_dist(self.lib_path, "other", "1.0", ["shared"])
+        make_dist(self.lib_path, "shared", "1.0")
+        graph = self.graph()
+        self.assertEqual(graph.orphans(["app"]), ["dep", "subdep"])
+        self.assertEqual(graph.orphans(["app", "other"]), ["dep", "shared", "subdep"])
+        self.assertEqual([edge.source for edge in graph.reverse("dep")], ["app"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+# encoding: utf-8
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from lib import installer
+from lib import process
+
+from .util import make_dist
+from .util import make_wheel
+
+
+class TestRequested(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.lib_path = os.path.join(self.root, "lib")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, *lines):
+        path = os.path.join(self.root, name)
+        with open(path, "w") as stream:
+            stream.write("\n".join(lines) + "\n")
+        return path
+
+    def test_requested_names(self):
+        self.write("base.txt", "Beta>=1.0", "--index-url https://example.org/simple")
+        requirements = self.write(
+            "requirements.txt", "-r base.txt", "-e .", "gamma; python_version > '3'"
+        )
+        constraints = self.write("constraints.txt", "delta==1.0")
+
+        args = ["-c", constraints, "-r", requirements, "Alpha.Pkg[extra]>=2"]
+        self.assertEqual(installer.requested_names(args), {"alpha-pkg", "beta", "gamma"})
+
+    def test_missing_requirements_file(self):
+        args = ["-r", os.path.join(self.root, "missing.txt"), "alpha"]
+        self.assertEqual(installer.requested_names(args), {"alpha"})
+
+    def test_mark_requested(self):
+        make_dist(self.lib_path, "gamma", "1.0")
+        make_dist(self.lib_path, "beta", "2.0")
+
+        installer.mark_requested(self.lib_path, ["Gamma"])
+        self.assertTrue(os.path.exists(
+            os.path.join(self.lib_path, "gamma-1.0.dist-info", "REQUESTED")
+        ))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.lib_path, "beta-2.0.dist-info", "REQUESTED")
+        ))
+
+
+class TestUnpack(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.lib_path = os.path.join(self.root, "lib")
+        make_dist(self.lib_path, "beta", "1.0", files={
+            "beta/__init__.py": "", "beta/old.py": "",
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def engine(self, **kwds):
+        return installer.ParallelInstaller(None, self.lib_path, jobs=2, **kwds)
+
+    def wheel(self, name, version, files=None, requires=()):
+        return make_wheel(self.root, name, version, files, requires=requires)
+
+    def exists(self, *path):
+        return os.path.exists(os.path.join(self.lib_path, *path))
+
+    def test_skip_installed(self):
+        wheels = [self.wheel("beta", "2.0"), self.wheel("gamma", "1.0")]
+
+        installed, skipped = self.engine()._unpack(wheels)
+        self.assertEqual(installed, [("gamma", "1.0")])
+        self.assertEqual(skipped, [("beta", "1.0")])
+        self.assertTrue(self.exists("gamma.py"))
+        self.assertFalse(self.exists("beta-2.0.dist-info"))
+
+    def test_replace_changed(self):
+        wheels = [
+            self.wheel("beta", "2.0", {"beta/__init__.py": "x = 2\n"}),
+            self.wheel("beta_plugin", "1.0", {"beta/plugin.py": ""}),
+        ]
+
+        installed, skipped = self.engine()._unpack(wheels, replace_changed=True)
+        self.assertEqual(sorted(installed), [("beta", "2.0"), ("beta_plugin", "1.0")])
+        self.assertEqual(skipped, [])
+        self.assertFalse(self.exists("beta-1.0.dist-info"))
+        self.assertFalse(self.exists("beta", "old.py"))
+        self.assertTrue(self.exists("beta", "__init__.py"))
+        self.assertTrue(self.exists("beta", "plugin.py"))
+
+    def test_upgrade_same_version(self):
+        installed, _ = self.engine(upgrade=True)._unpack(
+            [self.wheel("beta", "1.0")], requested={"beta"}
+        )
+        self.assertEqual(installed, [("beta", "1.0")])
+        self.assertFalse(self.exists("beta", "old.py"))
+        self.assertTrue(self.exists("beta.py"))
+
+    def test_upgrade_only_if_needed(self):
+        wheels = [self.wheel("alpha", "2.0", requires=["beta>=1.0"]), self.wheel("beta", "2.0")]
+
+        installed, skipped = self.engine(upgrade=True)._unpack(wheels, requested={"alpha"})
+        self.assertEqual(installed, [("alpha", "2.0")])
+        self.assertEqual(skipped, [("beta", "1.0")])
+
+    def test_upgrade_unsatisfied_dependency(self):
+        wheels = [
+            self.wheel("alpha", "2.0", requires=['beta (>=2.0); python_version >= "3"']),
+            self.wheel("beta", "2.0"),
+        ]
+
+        installed, skipped = self.engine(upgrade=True)._unpack(wheels, requested={"alpha"})
+        self.assertEqual(sorted(installed), [("alpha", "2.0"), ("beta", "2.0")])
+        self.assertEqual(skipped, [])
+        self.assertFalse(self.exists("beta-1.0.dist-info"))
+
+    def test_unpack_errors(self):
+        outside = self.wheel("evil", "1.0", {"../evil.py": ""})
+        broken = os.path.join(self.root, "broken-1.0-py3-none-any.whl")
+        with open(broken, "w") as stream:
+            stream.write("not a zip file")
+
+        for path in (outside, broken):
+            with self.assertRaises(installer.InstallError):
+                self.engine()._unpack([path])
+
+
+class TestDownload(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_killed_download(self):
+        # A cancelled pip may leave part of the downloads behind
+        def pip(args, quiet=False):
+            make_wheel(args[args.index("--dest") + 1], "beta", "1.0")
+            return process.Result(-15, b"", b"")
+
+        engine = installer.ParallelInstaller(pip, os.path.join(self.root, "lib"))
+        with self.assertRaises(installer.InstallError):
+            engine._download(["beta", "gamma"], os.path.join(self.root, "download"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+# encoding: utf-8
+
+import sys
+import threading
+import unittest
+
+from lib import jobs
+from lib import process
+
+
+class TestJobQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = jobs.JobQueue("project")
+        self.release = threading.Event()
+        self.order = []
+
+    def tearDown(self):
+        self.release.set()
+
+    def blocking(self, name):
+        self.order.append(name)
+        self.release.wait(30)
+
+    def record(self, name):
+        self.order.append(name)
+
+    def test_mutating_jobs_are_serialized(self):
+        first = self.queue.submit(self.blocking, ["first"])
+        second = self.queue.submit(self.record, ["second"])
+
+        self.assertFalse(second.wait(0.2))
+        self.assertIs(self.queue.active(), first)
+        self.assertEqual(self.queue.depth(), 1)
+
+        self.release.set()
+        self.assertTrue(second.wait(30))
+        self.assertEqual(self.order, ["first", "second"])
+        self.assertIsNone(self.queue.active())
+
+    def test_read_only_jobs_run_right_away(self):
+        self.queue.submit(self.blocking, ["install"])
+        listing = self.queue.submit(self.record, ["list"], mutating=False)
+
+        self.assertTrue(listing.wait(30))
+        self.assertEqual(self.order, ["install", "list"])
+
+    def test_merge_queued_jobs(self):
+        self.queue.submit(self.blocking, ["install"])
+        queued = self.queue.submit(self.record, ["sync"])
+
+        self.assertIs(self.queue.submit(self.record, ["sync"]), queued)
+        self.assertIsNot(self.queue.submit(self.record, ["other"]), queued)
+        self.assertEqual(queued.merged, 1)
+        self.assertEqual(self.queue.depth(), 2)
+
+        self.release.set()
+        self.assertTrue(queued.wait(30))
+        self.assertEqual(self.order.count("sync"), 1)
+
+    def test_merge_running_read_only_job(self):
+        running = self.queue.submit(self.blocking, ["list"], mutating=False)
+        self.assertIs(self.queue.submit(self.blocking, ["list"], mutating=False), running)
+        self.assertEqual(running.merged, 1)
+
+    def test_current(self):
+        seen = []
+        job = self.queue.submit(lambda: seen.append(jobs.current()))
+        self.assertTrue(job.wait(30))
+        self.assertEqual(seen, [job])
+        self.assertIsNone(jobs.current())
+
+    def test_cancel(self):
+        started, results = threading.Event(), []
+
+        def run():
+            job = jobs.current()
+            job.attach = lambda pid, attach=job.attach: attach(pid) or started.set()
+            results.append(process.run(
+                [sys.executable, "-c", "import time; time.sleep(30)"], job=job
+            ).returncode)
+
+        job = self.queue.submit(run)
+        queued = self.queue.submit(self.record, ["queued"])
+        self.assertTrue(started.wait(30))
+
+        self.assertEqual(self.queue.cancel(pending=True), [job])
+        self.assertTrue(job.wait(30))
+        self.assertTrue(job.cancelled)
+        self.assertNotEqual(results[0], 0)
+        self.assertTrue(queued.cancelled)
+        self.assertFalse(queued.is_alive())
+        self.assertEqual(self.order, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+# encoding: utf-8
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from lib import linker
+
+from .util import make_wheel
+
+
+class TestLinkFile(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.source = os.path.join(self.root, "source.py")
+        self.dest = os.path.join(self.root, "dest.py")
+        with open(self.source, "w") as stream:
+            stream.write("x = 1\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def same_file(self):
+        return os.path.samefile(self.source, self.dest)
+
+    def test_hardlink(self):
+        self.assertEqual(linker.link_file(self.source, self.dest, "hardlink"), "hardlink")
+        self.assertTrue(self.same_file())
+
+    def test_copy(self):
+        self.assertEqual(linker.link_file(self.source, self.dest, "copy"), "copy")
+        self.assertFalse(self.same_file())
+        with open(self.dest) as stream:
+            self.assertEqual(stream.read(), "x = 1\n")
+
+    def test_auto(self):
+        # Whatever the file system supports, the content arrives
+        self.assertIn(linker.link_file(self.source, self.dest), ("reflink", "hardlink", "copy"))
+        with open(self.dest) as stream:
+            self.assertEqual(stream.read(), "x = 1\n")
+
+    def test_replaces_linked_file(self):
+        other = os.path.join(self.root, "other.py")
+        with open(other, "w") as stream:
+            stream.write("other = True\n")
+        os.link(other, self.dest)
+
+        linker.link_file(self.source, self.dest, "copy")
+        with open(other) as stream:
+            self.assertEqual(stream.read(), "other = True\n")
+
+
+class TestUnpackedStore(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.store = linker.UnpackedStore(os.path.join(self.root, "store"), "hardlink")
+        self.wheel = make_wheel(self.root, "tool", "1.0", {
+            "tool/__init__.py": "",
+            "tool-1.0.data/scripts/tool-run": "#!python\n",
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_unpacked_once_per_python(self):
+        entry = self.store.unpacked(self.wheel, "python3")
+        self.assertEqual(self.store.unpacked(self.wheel, "python3"), entry)
+        self.assertNotEqual(self.store.unpacked(self.wheel, "/usr/bin/python3"), entry)
+        self.assertEqual(len(os.listdir(self.store.path)), 2)
+
+    def test_rebuilt_wheel(self):
+        target = os.path.join(self.root, "lib")
+        self.store.materialize(self.wheel, target, "python3")
+        os.unlink(self.wheel)
+        make_wheel(self.root, "tool", "1.0", {"tool/__init__.py": "rebuilt = True\n"})
+
+        self.store.materialize(self.wheel, target, "python3")
+        with open(os.path.join(target, "tool", "__init__.py")) as stream:
+            self.assertEqual(stream.read(), "rebuilt = True\n")
+        self.assertEqual(len(os.listdir(self.store.path)), 2)
+
+    def test_materialize(self):
+        targets = [os.path.join(self.root, name, "lib") for name in ("one", "two")]
+        for target in targets:
+            installed = self.store.materialize(self.wheel, target, "python3")
+
+        self.assertIn("tool/__init__.py", installed)
+        self.assertIn("bin/tool-run", installed)
+        self.assertIn("tool-1.0.dist-info/RECORD", installed)
+        self.assertTrue(os.path.samefile(
+            os.path.join(targets[0], "tool", "__init__.py"),
+            os.path.join(targets[1], "tool", "__init__.py"),
+        ))
+        with open(os.path.join(targets[1], "bin", "tool-run")) as stream:
+            self.assertEqual(stream.read(), "#!python3\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+# encoding: utf-8
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from lib import installer
+from lib import inventory
+from lib import lockfile
+from lib.wheel_cache import sha256
+
+from .util import make_dist
+
+
+class DigestCache(object):
+
+    def __init__(self, digests):
+        self.digests = digests
+
+    def digest(self, filename):
+        return self.digests.get(filename)
+
+
+class TestParseRequirement(unittest.TestCase):
+
+    def test_full(self):
+        self.assertEqual(lockfile.parse_requirement(
+            'Foo.Bar[Socks, test] (>=1.0, <2) ; python_version < "3.8"'
+        ), {
+            "name": "foo-bar",
+            "extras": ["Socks", "test"],
+            "specifier": ">=1.0,<2",
+            "marker": 'python_version < "3.8"',
+        })
+
+    def test_name_only(self):
+        self.assertEqual(lockfile.parse_requirement("six"), {
+            "name": "six", "extras": [], "specifier": None, "marker": None,
+        })
+
+    def test_invalid(self):
+        with self.assertRaises(lockfile.LockError):
+            lockfile.parse_requirement("-e .")
+
+
+class TestLock(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.lib_path = os.path.join(self.directory, "lib")
+        os.makedirs(self.lib_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def dists(self):
+        return inventory.Inventory(self.lib_path).refresh()
+
+    def add_wheel_tags(self, entry, *tags):
+        with open(os.path.join(self.lib_path, entry, "WHEEL"), "w") as stream:
+            stream.write("Wheel-Version: 1.0\n")
+            for tag in tags:
+                stream.write("Tag: {}\n".format(tag))
+
+    def test_wheel_filename(self):
+        entry = make_dist(self.lib_path, "six", "1.16.0")
+        self.add_wheel_tags(entry, "py2-none-any", "py3-none-any")
+        self.assertEqual(
+            lockfile.wheel_filename(self.lib_path, entry), "six-1.16.0-py2.py3-none-any.whl"
+        )
+
+    def test_round_trip(self):
+        entry = make_dist(self.lib_path, "app", "1.0", ['six; python_version >= "3"'])
+        self.add_wheel_tags(entry, "py3-none-any")
+        make_dist(self.lib_path, "six", "1.16.0")
+
+        cache = DigestCache({"app-1.0-py3-none-any.whl": "ab" * 32})
+        lock = lockfile.create(self.lib_path, self.dists(), "3.8", cache)
+        path = os.path.join(self.directory, lockfile.LOCK_FILENAME)
+        lockfile.save(lock, path)
+
+        self.assertEqual(lockfile.load(path), lock)
+        self.assertEqual(lock["python"], "3.8")
+        app, six = lock["packages"]
+        self.assertEqual(app["wheel"], "app-1.0-py3-none-any.whl")
+        self.assertEqual(app["sha256"], "ab" * 32)
+        self.assertEqual(app["dependencies"][0]["marker"], 'python_version >= "3"')
+        self.assertEqual((six["wheel"], six["sha256"]), (None, None))
+
+    def test_missing(self):
+        make_dist(self.lib_path, "app", "1.0")
+        make_dist(self.lib_path, "six", "1.15.0")
+        lock = {"packages": [
+            {"name": "app", "version": "1.0"},
+            {"name": "six", "version": "1.16.0"},
+            {"name": "idna", "version": "3.4"},
+        ]}
+        self.assertEqual(
+            [package["name"] for package in lockfile.missing(lock, self.dists())],
+            ["six", "idna"],
+        )
+
+    def test_top_level(self):
+        lock = {"packages": [
+            {"name": "app", "dependencies": [{"name": "six"}, {"name": "idna"}]},
+            {"name": "six", "dependencies": []},
+            {"name": "idna", "dependencies": [{"name": "idna"}]},
+            {"name": "tool", "dependencies": [{"name": "six"}]},
+        ]}
+        self.assertEqual(lockfile.top_level(lock), ["app", "tool"])
+
+    def test_load_errors(self):
+        path = os.path.join(self.directory, lockfile.LOCK_FILENAME)
+        with self.assertRaises(lockfile.LockError):
+            lockfile.load(path)
+        with open(path, "w") as stream:
+            stream.write('{"version": 99, "packages": []}')
+        with self.assertRaises(lockfile.LockError):
+            lockfile.load(path)
+
+
+class TestVerify(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def download(self, filename, content):
+        path = os.path.join(self.directory, filename)
+        with open(path, "wb") as stream:
+            stream.write(content)
+        return path
+
+    def test_matching_hash(self):
+        path = self.download("Six-1.16.0-py3-none-any.whl", b"wheel")
+        installer.ParallelInstaller._verify(
+            [{"name": "six", "wheel": "six-1.16.0-py3-none-any.whl", "sha256": sha256(path)}],
+            [path],
+        )
+
+    def test_hash_mismatch(self):
+        path = self.download("six-1.16.0-py3-none-any.whl", b"tampered")
+        with self.assertRaises(installer.InstallError):
+            installer.ParallelInstaller._verify(
+                [{"name": "six", "wheel": "six-1.16.0-py3-none-any.whl", "sha256": "ab" * 32}],
+                [path],
+            )
+
+    def test_sdist_for_hashed_package(self):
+        path = self.download("six-1.16.0.tar.gz", b"sdist")
+        with self.assertRaises(installer.InstallError):
+            installer.ParallelInstaller._verify(
+                [{"name": "six", "wheel": "six-1.16.0-py3-none-any.whl", "sha256": "ab" * 32}],
+                [path],
+            )
+
+    def test_unhashed_package(self):
+        path = self.download("six-1.16.0.tar.gz", b"sdist")
+        installer.ParallelInstaller._verify(
+            [{"name": "six", "wheel": None, "sha256": None}], [path]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
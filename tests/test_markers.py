@@ -0,0 +1,117 @@
+# encoding: utf-8
+
+import os
+import subprocess
+import sys
+import unittest
+
+from lib import markers
+
+
+ENVIRONMENT = {
+    "python_version": "3.8",
+    "python_full_version": "3.8.10",
+    "sys_platform": "linux",
+    "os_name": "posix",
+    "platform_system": "Linux",
+    "implementation_name": "cpython",
+}
+
+
+class TestVersionMatches(unittest.TestCase):
+
+    def assertMatches(self, version, specifier, expected=True):
+        self.assertEqual(
+            markers.version_matches(version, specifier), expected,
+            "{} {}".format(version, specifier),
+        )
+
+    def test_comparisons(self):
+        self.assertMatches("1.5", ">=1.0,<2")
+        self.assertMatches("2.0", ">=1.0,<2", False)
+        self.assertMatches("1.0.post1", ">1.0")
+        self.assertMatches("1.0", "!=1.0", False)
+        self.assertMatches("1.10", ">1.9")
+
+    def test_compatible_release(self):
+        self.assertMatches("1.4", "~=1.4")
+        self.assertMatches("1.9.3", "~=1.4")
+        self.assertMatches("2.0", "~=1.4", False)
+        self.assertMatches("1.4.5", "~=1.4.2")
+        self.assertMatches("1.5.0", "~=1.4.2", False)
+        self.assertMatches("1.4.1", "~=1.4.2", False)
+
+    def test_prefix_match(self):
+        self.assertMatches("1.0", "==1.0.*")
+        self.assertMatches("1", "==1.0.*")
+        self.assertMatches("1.0.3", "==1.0.*")
+        self.assertMatches("1.1", "==1.0.*", False)
+        self.assertMatches("1.10", "==1.1.*", False)
+        self.assertMatches("2.0.1", "!=2.0.*", False)
+        self.assertMatches("2.1", "!=2.0.*")
+
+    def test_arbitrary_equality(self):
+        self.assertMatches("1.0", "===1.0")
+        self.assertMatches("1.0.0", "===1.0", False)
+
+    def test_invalid(self):
+        for specifier in ("<1.0.*", "~=1", ">=", "==1.0 garbage", "=>1.0"):
+            with self.assertRaises(markers.MarkerError, msg=specifier):
+                markers.version_matches("1.0", specifier)
+
+
+class TestEvaluate(unittest.TestCase):
+
+    def test_versions(self):
+        self.assertTrue(markers.evaluate('python_version >= "3.6"', ENVIRONMENT))
+        self.assertFalse(markers.evaluate('python_version < "3"', ENVIRONMENT))
+        self.assertTrue(markers.evaluate('python_version >= "3.10"', dict(
+            ENVIRONMENT, python_version="3.10"
+        )))
+        self.assertTrue(markers.evaluate('python_full_version ~= "3.8.0"', ENVIRONMENT))
+
+    def test_boolean_operators(self):
+        marker = 'sys_platform == "win32" or (os_name == "posix" and python_version > "3.6")'
+        self.assertTrue(markers.evaluate(marker, ENVIRONMENT))
+        marker = 'sys_platform == "win32" and python_version > "3.6"'
+        self.assertFalse(markers.evaluate(marker, ENVIRONMENT))
+
+    def test_extra(self):
+        self.assertFalse(markers.evaluate('extra == "test"', ENVIRONMENT))
+        self.assertTrue(markers.evaluate('extra == "Test_Extra"', ENVIRONMENT, "test-extra"))
+
+    def test_in(self):
+        self.assertTrue(markers.evaluate('"linux" in sys_platform', ENVIRONMENT))
+        self.assertTrue(markers.evaluate('platform_system not in "Windows Darwin"', ENVIRONMENT))
+
+    def test_invalid(self):
+        for marker in ('python_version >=', 'python_version ~ "3"', '(os_name == "posix"',
+                       'unknown_variable == "1"'):
+            with self.assertRaises(markers.MarkerError, msg=marker):
+                markers.evaluate(marker, ENVIRONMENT)
+
+    def test_does_not_load_pkg_resources(self):
+        # Comparing versions must not pay for building the master working set
+        script = (
+            "import sys; from lib import markers; "
+            "environment = {'python_version': '3.10'}; "
+            "assert not markers.evaluate('python_version < \"3.8\"', environment); "
+            "assert markers.version_matches('2.0rc1', '<2.0'); "
+            "sys.exit('lib.pkg_resources' in sys.modules)"
+        )
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(subprocess.call([sys.executable, "-c", script], cwd=root), 0)
+
+    def test_default_environment(self):
+        environment = markers.default_environment()
+        self.assertEqual(sorted(environment), sorted([
+            "implementation_name", "implementation_version", "os_name",
+            "platform_machine", "platform_python_implementation", "platform_release",
+            "platform_system", "platform_version", "python_full_version",
+            "python_version", "sys_platform",
+        ]))
+        self.assertTrue(markers.evaluate('python_version >= "3"', environment))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+# encoding: utf-8
+
+import sys
+import threading
+import unittest
+
+from lib import pip_worker
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = pip_worker.WorkerPool(sys.executable)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_run(self):
+        lines = []
+        returncode, stdout, _ = self.pool.run(
+            ["--version"], on_line=lambda stream, line: lines.append((stream, line))
+        )
+        self.assertEqual(returncode, 0)
+        self.assertTrue(stdout.startswith(b"pip "))
+        self.assertEqual(lines, [("stdout", stdout.decode("utf-8").rstrip("\n"))])
+
+    def test_failure(self):
+        returncode, _, stderr = self.pool.run(["no-such-command"])
+        self.assertNotEqual(returncode, 0)
+        self.assertIn(b"ERROR", stderr)
+
+    def test_reuses_idle_worker(self):
+        self.pool.run(["--version"])
+        worker = self.pool._idle[0]
+        self.pool.run(["--version"])
+        self.assertEqual(self.pool._idle, [worker])
+
+    def test_concurrent_runs(self):
+        self.pool.size = 2
+        started, release = threading.Barrier(2), threading.Event()
+        results = []
+
+        def on_line(stream, line):
+            # Both runs only get here if they do not wait for each other
+            started.wait(30)
+            release.wait(30)
+
+        def run():
+            results.append(self.pool.run(["--version"], on_line=on_line)[0])
+
+        threads = [threading.Thread(target=run) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(60)
+
+        self.assertEqual(results, [0, 0])
+        self.assertEqual(len(self.pool._idle), 2)
+
+    def test_size(self):
+        busy, release = threading.Event(), threading.Event()
+        results = []
+
+        def on_line(stream, line):
+            busy.set()
+            release.wait(30)
+
+        thread = threading.Thread(
+            target=lambda: results.append(self.pool.run(["--version"], on_line=on_line)[0])
+        )
+        thread.start()
+        self.assertTrue(busy.wait(30))
+        waiting = threading.Thread(
+            target=lambda: results.append(self.pool.run(["--version"])[0])
+        )
+        waiting.start()
+        waiting.join(1)
+        self.assertTrue(waiting.is_alive())
+
+        release.set()
+        thread.join(60)
+        waiting.join(60)
+        self.assertEqual(results, [0, 0])
+        self.assertEqual(len(self.pool._idle), 1)
+
+    def test_reap_idle_workers(self):
+        self.pool.size = 3
+        workers = [self.pool._acquire() for _ in range(3)]
+        for worker in workers:
+            self.pool._release(worker)
+        for worker in workers[:2]:
+            worker.idle_since -= self.pool.idle_timeout
+
+        self.pool._reap()
+        self.assertEqual(self.pool._idle, [workers[2]])
+        self.assertEqual(self.pool._count, 1)
+
+    def test_close_while_busy(self):
+        busy, release = threading.Event(), threading.Event()
+        workers = []
+
+        def on_line(stream, line):
+            busy.set()
+            release.wait(30)
+
+        acquire = self.pool._acquire
+        self.pool._acquire = lambda: workers.append(acquire()) or workers[-1]
+        thread = threading.Thread(target=self.pool.run, args=(["--version"],),
+                                  kwargs={"on_line": on_line})
+        thread.start()
+        self.assertTrue(busy.wait(30))
+        self.pool.close()
+        release.set()
+        thread.join(60)
+
+        self.assertEqual(self.pool._idle, [])
+        self.assertIsNone(workers[0]._proc)
+        with self.assertRaises(pip_worker.WorkerError):
+            self.pool.run(["--version"])
+
+
+if __name__ == "__main__":
+    unittest.main()
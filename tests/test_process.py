@@ -0,0 +1,53 @@
+# encoding: utf-8
+
+import contextlib
+import os
+import sys
+import unittest
+
+from lib import process
+
+
+SCRIPT = "import sys\nfor i in range(3):\n    print(i)\nsys.stderr.write('done\\n')"
+
+
+class TestRun(unittest.TestCase):
+
+    def test_streams_lines(self):
+        lines = []
+        result = process.run(
+            [sys.executable, "-c", SCRIPT], on_line=lambda *line: lines.append(line)
+        )
+        self.assertEqual(result, (0, b"0\n1\n2\n", b"done\n"))
+        self.assertEqual(sorted(lines), [
+            ("stderr", "done"), ("stdout", "0"), ("stdout", "1"), ("stdout", "2"),
+        ])
+
+    def test_tail(self):
+        result = process.run([sys.executable, "-c", SCRIPT], max_lines=1)
+        self.assertEqual(result.stdout, b"2\n")
+
+    def test_failing_callback(self):
+        calls = []
+
+        def on_line(stream, line):
+            calls.append(line)
+            raise RuntimeError("callback failed")
+
+        # The traceback of the callback is printed once
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+            result = process.run([sys.executable, "-c", SCRIPT], on_line=on_line)
+        self.assertEqual(result, (0, b"0\n1\n2\n", b"done\n"))
+        self.assertEqual(len(calls), 1)
+
+    def test_timeout(self):
+        result = process.run(
+            [sys.executable, "-c", "import time; time.sleep(30)"],
+            limits=process.Limits(timeout=0.5),
+        )
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn(b"Timed out", result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+# encoding: utf-8
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from lib import core
+from lib import installer
+from lib import inventory
+from lib import sync
+
+from .util import make_dist
+
+
+ENVIRONMENT = {"python_version": "3.8", "sys_platform": "linux"}
+
+
+class TestRequirementsPlan(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.lib_path = os.path.join(self.root, "lib")
+        make_dist(self.lib_path, "alpha_pkg", "1.4.2", ["beta (>=1.0)"])
+        make_dist(self.lib_path, "beta", "1.0.3")
+        make_dist(self.lib_path, "gamma", "2.0")
+        make_dist(self.lib_path, "unused", "0.1")
+        self.dists = inventory.Inventory(self.lib_path).refresh()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def plan(self, *lines):
+        path = os.path.join(self.root, "requirements.txt")
+        with open(path, "w") as stream:
+            stream.write("\n".join(lines) + "\n")
+        return sync.requirements_plan(
+            self.lib_path, sync.read_requirements(path), self.dists, ENVIRONMENT
+        )
+
+    def removed(self, plan):
+        return [dist.project_name for dist in plan.remove]
+
+    def test_pep440_operators(self):
+        plan = self.plan("Alpha_Pkg~=1.4", "gamma===2.0", "beta==1.0.*")
+        self.assertEqual(plan.install, [])
+        self.assertEqual(self.removed(plan), ["unused"])
+
+    def test_unsatisfied(self):
+        plan = self.plan("alpha-pkg~=1.5", "gamma==2.*")
+        self.assertEqual(plan.install, ["alpha-pkg~=1.5"])
+        self.assertEqual(self.removed(plan), ["unused"])
+        self.assertEqual([dist.project_name for dist in plan.replace], ["alpha-pkg"])
+        self.assertEqual(plan.constraints, ["beta==1.0.3", "gamma==2.0"])
+        self.assertEqual(plan.fallback, ["gamma==2.*"])
+
+    def test_kept_packages_constrain_the_fallback(self):
+        # A new requirement may need a newer version of an installed
+        # dependency, as long as the kept packages still accept it
+        plan = self.plan("alpha-pkg", "delta")
+        self.assertEqual(plan.install, ["delta"])
+        self.assertEqual(plan.replace, [])
+        self.assertEqual(plan.constraints, ["alpha-pkg==1.4.2", "beta==1.0.3"])
+        self.assertEqual(plan.fallback, ["beta>=1.0"])
+
+    def test_requested(self):
+        plan = self.plan("alpha_pkg>=1", 'delta; python_version < "3"', "gamma")
+        self.assertEqual(plan.requested, ["alpha-pkg", "gamma"])
+
+    def test_dependencies_are_kept(self):
+        plan = self.plan("alpha_pkg")
+        self.assertEqual(sorted(self.removed(plan)), ["gamma", "unused"])
+
+    def test_markers(self):
+        plan = self.plan('delta; python_version < "3"', 'gamma; sys_platform == "linux"')
+        self.assertEqual(plan.install, [])
+        self.assertEqual(sorted(self.removed(plan)), ["alpha-pkg", "beta", "unused"])
+
+    def test_invalid_specifier(self):
+        with self.assertRaises(sync.SyncError):
+            self.plan("gamma<2.*")
+
+    def test_unsupported_lines(self):
+        with self.assertRaises(sync.SyncError):
+            self.plan("-e .")
+
+
+class FailingEngine(object):
+
+    def __init__(self, lib_path):
+        self.lib_path = lib_path
+        self.version = None
+
+    def install(self, args, replace_changed=False):
+        raise installer.InstallError("No matching distribution")
+
+
+class ConflictingEngine(FailingEngine):
+    """
+    Fails to resolve while `beta` is pinned
+    """
+
+    def __init__(self, lib_path):
+        super(ConflictingEngine, self).__init__(lib_path)
+        self.constraints = []
+
+    def install(self, args, replace_changed=False):
+        with open(args[args.index("-c") + 1]) as stream:
+            self.constraints.append(stream.read().split())
+        if "beta==1.0" in self.constraints[-1]:
+            raise installer.InstallError("ResolutionImpossible")
+        return [("beta", "2.0"), ("gamma", "1.0")], []
+
+
+class TestApplyPlan(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.lib_path = os.path.join(self.root, "3.8", "lib")
+        make_dist(self.lib_path, "alpha", "1.0", files={"alpha/__init__.py": "x = 1\n"})
+        make_dist(self.lib_path, "beta", "1.0")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def listing(self):
+        return sorted(
+            os.path.relpath(os.path.join(root, name), self.lib_path)
+            for root, _, names in os.walk(self.lib_path) for name in names
+        )
+
+    def test_failed_install_restores_removed(self):
+        before = self.listing()
+        dists = inventory.Inventory(self.lib_path).refresh()
+        removed = [dist for dist in dists if dist.project_name == "alpha"]
+        plan = sync.Plan(["gamma"], removed, [], [], [], [])
+
+        with self.assertRaises(installer.InstallError):
+            core.apply_plan(plan, FailingEngine(self.lib_path))
+        self.assertEqual(self.listing(), before)
+
+    def test_remove(self):
+        dists = inventory.Inventory(self.lib_path).refresh()
+        removed = [dist for dist in dists if dist.project_name == "alpha"]
+        plan = sync.Plan([], removed, [], [], [], [])
+
+        removed, installed = core.apply_plan(plan, FailingEngine(self.lib_path))
+        self.assertEqual([dist.project_name for dist in removed], ["alpha"])
+        self.assertFalse([
+            name for name in os.listdir(os.path.dirname(self.lib_path))
+            if name.startswith(".pypackages-backup-")
+        ])
+        self.assertEqual(sorted(os.listdir(self.lib_path)), ["beta-1.0.dist-info", "beta.py"])
+
+    def test_fallback_constraints(self):
+        plan = sync.Plan(["gamma"], [], [], ["beta==1.0"], ["beta>=1.0"], [])
+        engine = ConflictingEngine(self.lib_path)
+
+        removed, installed = core.apply_plan(plan, engine)
+        self.assertEqual(installed, [("beta", "2.0"), ("gamma", "1.0")])
+        self.assertEqual(engine.constraints, [["beta==1.0"], ["beta>=1.0"]])
+
+    def test_kept_requirements_are_requested(self):
+        plan = sync.Plan([], [], [], [], [], ["beta"])
+
+        core.apply_plan(plan, FailingEngine(self.lib_path))
+        self.assertTrue(os.path.exists(
+            os.path.join(self.lib_path, "beta-1.0.dist-info", "REQUESTED")
+        ))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.lib_path, "alpha-1.0.dist-info", "REQUESTED")
+        ))
+
+
+if __name__ == "__main__":
+    unittest.main()
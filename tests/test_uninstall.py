@@ -0,0 +1,135 @@
+# encoding: utf-8
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from lib import uninstall
+
+from .util import make_dist
+
+
+def listing(lib_path):
+    return sorted(
+        os.path.relpath(os.path.join(root, name), lib_path)
+        for root, _, names in os.walk(lib_path) for name in names
+    )
+
+
+class TestUninstall(unittest.TestCase):
+
+    def setUp(self):
+        self.lib_path = tempfile.mkdtemp()
+        self.backup = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.lib_path)
+        shutil.rmtree(self.backup)
+
+    def test_record(self):
+        entry = make_dist(self.lib_path, "alpha", "1.0", files={
+            "alpha/__init__.py": "", "alpha/data/file.txt": "",
+        })
+        make_dist(self.lib_path, "beta", "1.0")
+
+        removed = uninstall.uninstall(self.lib_path, [entry])
+        self.assertIn("alpha/data/file.txt", removed[entry])
+        self.assertEqual(listing(self.lib_path), [
+            "beta-1.0.dist-info/METADATA", "beta-1.0.dist-info/RECORD", "beta.py",
+        ])
+
+    def test_bytecode(self):
+        entry = make_dist(self.lib_path, "alpha", "1.0")
+        os.makedirs(os.path.join(self.lib_path, "__pycache__"))
+        open(os.path.join(self.lib_path, "__pycache__", "alpha.cpython-38.pyc"), "w").close()
+        open(os.path.join(self.lib_path, "__pycache__", "alphabet.cpython-38.pyc"), "w").close()
+
+        uninstall.uninstall(self.lib_path, [entry])
+        self.assertEqual(listing(self.lib_path), ["__pycache__/alphabet.cpython-38.pyc"])
+
+    def test_target_prefix_paths(self):
+        entry = make_dist(self.lib_path, "alpha", "1.0", files={"bin/alpha": ""})
+        with open(os.path.join(self.lib_path, entry, "RECORD"), "a") as stream:
+            stream.write("../../bin/alpha,,\n../../../outside.txt,,\n")
+        os.remove(os.path.join(self.lib_path, "bin", "alpha"))
+        open(os.path.join(self.lib_path, "bin", "alpha"), "w").close()
+
+        uninstall.uninstall(self.lib_path, [entry])
+        self.assertEqual(listing(self.lib_path), [])
+
+    def test_missing_record(self):
+        entry = make_dist(self.lib_path, "alpha", "1.0")
+        os.remove(os.path.join(self.lib_path, entry, "RECORD"))
+        with self.assertRaises(uninstall.UninstallError):
+            uninstall.uninstall(self.lib_path, [entry])
+        self.assertIn("alpha.py", listing(self.lib_path))
+
+    def test_egg_info(self):
+        entry = "gamma-2.0-py3.8.egg-info"
+        os.makedirs(os.path.join(self.lib_path, entry))
+        os.makedirs(os.path.join(self.lib_path, "gamma"))
+        open(os.path.join(self.lib_path, "gamma", "__init__.py"), "w").close()
+        with open(os.path.join(self.lib_path, entry, "installed-files.txt"), "w") as stream:
+            stream.write("../gamma/__init__.py\nPKG-INFO\n")
+        open(os.path.join(self.lib_path, entry, "PKG-INFO"), "w").close()
+
+        removed = uninstall.uninstall(self.lib_path, [entry])
+        self.assertEqual(removed[entry], sorted([
+            os.path.join("gamma", "__init__.py"), os.path.join(entry, "PKG-INFO"),
+        ]))
+        self.assertEqual(listing(self.lib_path), [])
+
+    def test_shared_directories(self):
+        # Namespace packages share directories, only emptied ones are pruned
+        alpha = make_dist(self.lib_path, "alpha", "1.0", files={"ns/alpha/__init__.py": ""})
+        beta = make_dist(self.lib_path, "beta", "1.0", files={"ns/beta/__init__.py": ""})
+        gamma = make_dist(self.lib_path, "gamma", "1.0")
+
+        removed = uninstall.uninstall(self.lib_path, [alpha, gamma], jobs=4)
+        self.assertEqual(sorted(removed), [alpha, gamma])
+        self.assertFalse(os.path.exists(os.path.join(self.lib_path, "ns", "alpha")))
+        self.assertEqual(listing(self.lib_path), [
+            beta + "/METADATA", beta + "/RECORD", "beta.py", "ns/beta/__init__.py",
+        ])
+
+    def test_paths_outside_are_kept(self):
+        outside = os.path.join(self.backup, "outside.txt")
+        open(outside, "w").close()
+        entry = make_dist(self.lib_path, "alpha", "1.0")
+        with open(os.path.join(self.lib_path, entry, "RECORD"), "a") as stream:
+            stream.write("{},,\n../{}/outside.txt,,\n".format(
+                outside, os.path.basename(self.backup)
+            ))
+
+        uninstall.uninstall(self.lib_path, [entry])
+        self.assertTrue(os.path.exists(outside))
+        self.assertEqual(listing(self.lib_path), [])
+
+
+class TestBackup(unittest.TestCase):
+
+    def setUp(self):
+        self.lib_path = tempfile.mkdtemp()
+        self.backup = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.lib_path)
+        shutil.rmtree(self.backup)
+
+    def test_backup_and_restore(self):
+        entry = make_dist(self.lib_path, "alpha", "1.0", files={"alpha/__init__.py": ""})
+        with open(os.path.join(self.lib_path, entry, "INSTALLER"), "w") as stream:
+            stream.write("pip\n")
+        before = listing(self.lib_path)
+
+        uninstall.uninstall(self.lib_path, [entry], backup=self.backup)
+        self.assertEqual(listing(self.lib_path), [])
+        self.assertEqual(listing(self.backup), before)
+
+        uninstall.restore(self.lib_path, self.backup)
+        self.assertEqual(listing(self.lib_path), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+# encoding: utf-8
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from lib import watcher
+
+
+class TestWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.lib_path = os.path.join(self.root, "lib")
+        os.makedirs(self.lib_path)
+        self.calls = []
+        self.called = threading.Event()
+        self.watchers = []
+        self.created = 0
+
+    def tearDown(self):
+        for instance in self.watchers:
+            instance.stop()
+        shutil.rmtree(self.root)
+
+    def callback(self, path):
+        self.calls.append(path)
+        self.called.set()
+
+    def watch(self, callback=None, **kwds):
+        instance = watcher.Watcher(
+            self.lib_path, callback or self.callback, debounce=0.3, poll_interval=0.1, **kwds
+        )
+        self.watchers.append(instance)
+        instance.start()
+        # Let the thread set up its watch before anything changes
+        time.sleep(0.2)
+        return instance
+
+    def burst(self, count=5):
+        for _ in range(count):
+            self.created += 1
+            os.makedirs(os.path.join(self.lib_path, "pkg{}-1.0.dist-info".format(self.created)))
+            time.sleep(0.02)
+
+    def settle(self):
+        self.assertTrue(self.called.wait(5))
+        time.sleep(0.6)
+
+    def test_debounce(self):
+        self.watch()
+        self.burst()
+        self.settle()
+        self.assertEqual(self.calls, [self.lib_path])
+
+    def test_debounce_polling(self):
+        with mock.patch.object(watcher, "_inotify", return_value=None):
+            self.watch()
+            self.burst()
+            self.settle()
+        self.assertEqual(self.calls, [self.lib_path])
+
+    def test_callback_errors(self):
+        errors = []
+
+        def callback(path):
+            self.callback(path)
+            raise ValueError("broken")
+
+        self.watch(callback, on_error=errors.append)
+        self.burst(1)
+        self.settle()
+        self.called.clear()
+        self.burst(1)
+        self.settle()
+
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual([str(error) for error in errors], ["broken", "broken"])
+
+    def test_stop(self):
+        self.watch().stop()
+        self.burst(1)
+        self.assertFalse(self.called.wait(1))
+
+
+if __name__ == "__main__":
+    unittest.main()
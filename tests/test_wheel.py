@@ -0,0 +1,96 @@
+# encoding: utf-8
+
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+
+from lib import wheel
+
+from .util import make_wheel
+
+
+ENTRY_POINTS = """
+[console_scripts]
+tool-cli = tool.main:run [extra]
+"""
+
+
+class TestUnpack(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.lib_path = os.path.join(self.root, "lib")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def path(self, *parts):
+        return os.path.join(self.lib_path, *parts)
+
+    def read(self, *parts):
+        with open(self.path(*parts)) as stream:
+            return stream.read()
+
+    def test_parse_filename(self):
+        self.assertEqual(
+            wheel.parse_filename("/tmp/zope.interface-5.4.0-1-cp38-cp38-linux_x86_64.whl"),
+            ("zope.interface", "5.4.0", "cp38-cp38-linux_x86_64"),
+        )
+        with self.assertRaises(wheel.WheelError):
+            wheel.parse_filename("tool-1.0.tar.gz")
+
+    def test_layout(self):
+        path = make_wheel(self.root, "tool", "1.0", {
+            "tool/__init__.py": "",
+            "tool-1.0.data/purelib/tool_extra.py": "",
+            "tool-1.0.data/data/share/tool.txt": "data",
+            "tool-1.0.data/scripts/tool-run": "#!python\nprint(1)\n",
+            "tool-1.0.data/unknown/ignored.txt": "",
+        }, entry_points=ENTRY_POINTS)
+
+        installed = wheel.unpack(path, self.lib_path, "/usr/bin/python3")
+
+        self.assertTrue(os.path.isfile(self.path("tool", "__init__.py")))
+        self.assertTrue(os.path.isfile(self.path("tool_extra.py")))
+        self.assertEqual(self.read("share", "tool.txt"), "data")
+        self.assertFalse(os.path.exists(self.path("ignored.txt")))
+        self.assertFalse(os.path.exists(self.path("tool-1.0.data")))
+        self.assertEqual(self.read("bin", "tool-run"), "#!/usr/bin/python3\nprint(1)\n")
+        self.assertTrue(os.access(self.path("bin", "tool-run"), os.X_OK))
+        self.assertEqual(self.read("tool-1.0.dist-info", "INSTALLER"), "pypackages\n")
+        if os.name != "nt":
+            script = self.read("bin", "tool-cli")
+            self.assertTrue(script.startswith("#!/usr/bin/python3\n"))
+            self.assertIn("from tool.main import run", script)
+
+        with open(self.path("tool-1.0.dist-info", "RECORD")) as stream:
+            rows = dict((row[0], row[1:]) for row in csv.reader(stream))
+        self.assertEqual(sorted(rows), sorted(installed))
+        # Moved files keep the hash of their original RECORD row
+        self.assertEqual(rows["bin/tool-run"], ["sha256=x", "18"])
+        self.assertEqual(rows["share/tool.txt"], ["sha256=x", "4"])
+        self.assertEqual(rows["tool-1.0.dist-info/RECORD"], ["", ""])
+
+    def test_refuses_paths_outside(self):
+        path = make_wheel(self.root, "evil", "1.0", {"../evil.py": ""})
+        with self.assertRaises(wheel.WheelError):
+            wheel.unpack(path, self.lib_path)
+        self.assertFalse(os.path.exists(os.path.join(self.root, "evil.py")))
+
+    def test_does_not_write_through_links(self):
+        shared = os.path.join(self.root, "shared.py")
+        with open(shared, "w") as stream:
+            stream.write("shared = True\n")
+        os.makedirs(self.lib_path)
+        os.link(shared, self.path("tool.py"))
+
+        wheel.unpack(make_wheel(self.root, "tool", "1.0"), self.lib_path)
+        with open(shared) as stream:
+            self.assertEqual(stream.read(), "shared = True\n")
+        self.assertEqual(self.read("tool.py"), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+# encoding: utf-8
+
+"""
+Helpers to build lib directories with installed distributions and wheels
+"""
+
+import os
+import zipfile
+
+
+def make_dist(lib_path, name, version, requires=(), files=None):
+    """
+    Create a `.dist-info` entry of `name` with a module `<name>.py`
+
+    Returns the entry name. `files` maps additional paths, relative to the
+    lib directory, to their content; all of them are listed in `RECORD`.
+    """
+    entry = "{}-{}.dist-info".format(name, version)
+    files = dict(files or {})
+    files.setdefault(name + ".py", "")
+
+    os.makedirs(os.path.join(lib_path, entry))
+    with open(os.path.join(lib_path, entry, "METADATA"), "w") as stream:
+        stream.write("Metadata-Version: 2.1\nName: {}\nVersion: {}\n".format(name, version))
+        for requirement in requires:
+            stream.write("Requires-Dist: {}\n".format(requirement))
+        stream.write("\n")
+
+    for path, content in files.items():
+        path = os.path.join(lib_path, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "w") as stream:
+            stream.write(content)
+
+    with open(os.path.join(lib_path, entry, "RECORD"), "w") as stream:
+        for path in sorted(files) + [entry + "/METADATA", entry + "/RECORD"]:
+            stream.write("{},,\n".format(path))
+    return entry
+
+def make_wheel(directory, name, version, files=None, entry_points=None, requires=()):
+    """
+    Build the wheel `<name>-<version>-py3-none-any.whl` in `directory`
+
+    Returns its path. `files` maps paths inside the wheel, including any
+    `<name>-<version>.data/...` paths, to their content; all of them are
+    listed in `RECORD` together with the `.dist-info` files. `requires` are
+    the `Requires-Dist` lines of its metadata.
+    """
+    dist_info = "{}-{}.dist-info".format(name, version)
+    files = dict(files or {"{}.py".format(name): ""})
+    files[dist_info + "/METADATA"] = "Metadata-Version: 2.1\nName: {}\nVersion: {}\n{}\n".format(
+        name, version, "".join("Requires-Dist: {}\n".format(line) for line in requires)
+    )
+    files[dist_info + "/WHEEL"] = "Wheel-Version: 1.0\nRoot-Is-Purelib: true\nTag: py3-none-any\n"
+    if entry_points:
+        files[dist_info + "/entry_points.txt"] = entry_points
+
+    path = os.path.join(directory, "{}-{}-py3-none-any.whl".format(name, version))
+    with zipfile.ZipFile(path, "w") as archive:
+        for member, content in sorted(files.items()):
+            archive.writestr(member, content)
+        archive.writestr(dist_info + "/RECORD", "".join(
+            "{},sha256=x,{}\n".format(member, len(content))
+            for member, content in sorted(files.items())
+        ) + dist_info + "/RECORD,,\n")
+    return path